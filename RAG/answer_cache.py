@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .lazy import LazyModule
+from .reranker import tokenize
+
+
+faiss = LazyModule("faiss", "faiss-cpu")
+
+
+class AnswerCache:
+    """In-memory cache of LLM answers with exact and semantic matching.
+
+    Entries are keyed by a ``scope`` (anything hashable that identifies the
+    corpus version and answer settings, e.g. ``(corpus_version, filter,
+    model)``) plus the query. ``lookup`` first tries an exact match on the
+    normalised query text; given a query embedding it then looks for a
+    previous query in the same scope whose cosine similarity is at least
+    ``threshold``, using a small dedicated inner-product index.
+
+    Entries expire after ``ttl`` seconds and the least recently used ones
+    are dropped beyond ``max_entries``.
+    """
+
+    def __init__(self, ttl=3600, max_entries=1000, threshold=0.95):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._exact = {}
+        self._index = None
+        self._next_id = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def clear(self):
+        """Drop every entry, e.g. after the corpus changed.
+
+        Hit and miss counters cover the cache's lifetime and are kept; ids
+        keep increasing so a concurrent ``put`` cannot reuse one.
+        """
+        with self._lock:
+            self._entries = OrderedDict()
+            self._exact = {}
+            self._index = None
+
+    @staticmethod
+    def normalize(query):
+        return " ".join(tokenize(query))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        self._exact.pop((entry["scope"], entry["key"]), None)
+        if self._index is not None and entry["embedding"] is not None:
+            self._index.remove_ids(np.array([entry_id], dtype="int64"))
+
+    def _alive(self, entry_id, now):
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return None
+        if now - entry["created"] > self.ttl:
+            self._remove(entry_id)
+            return None
+        return entry
+
+    def _hit(self, entry_id, entry, semantic):
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        self.semantic_hits += int(semantic)
+        self.saved_seconds += entry["seconds"]
+        return entry
+
+    def lookup(self, scope, query, embedding=None):
+        """Return the cached entry dict for ``query`` or None.
+
+        Without ``embedding`` only exact repeats match; a miss is only
+        counted when an embedding is supplied (the final lookup attempt).
+        """
+        now = time.time()
+        with self._lock:
+            entry_id = self._exact.get((scope, self.normalize(query)))
+            if entry_id is not None:
+                entry = self._alive(entry_id, now)
+                if entry is not None:
+                    return self._hit(entry_id, entry, semantic=False)
+
+            if embedding is None:
+                return None
+            if self._index is not None and self._index.ntotal:
+                vec = self._unit(embedding)
+                if vec.shape[1] == self._index.d:
+                    sims, ids = self._index.search(vec, min(8, self._index.ntotal))
+                    for sim, entry_id in zip(sims[0], ids[0]):
+                        if entry_id < 0 or sim < self.threshold:
+                            break
+                        entry = self._alive(int(entry_id), now)
+                        if entry is not None and entry["scope"] == scope:
+                            return self._hit(int(entry_id), entry, semantic=True)
+            self.misses += 1
+            return None
+
+    @staticmethod
+    def _unit(embedding):
+        vec = np.asarray(embedding, dtype="float32").reshape(1, -1).copy()
+        faiss.normalize_L2(vec)
+        return vec
+
+    def put(self, scope, query, answer, embedding=None, seconds=0.0, **extra):
+        """Store an answer. ``seconds`` is what answering cost, credited on hits."""
+        with self._lock:
+            key = self.normalize(query)
+            old = self._exact.get((scope, key))
+            if old is not None:
+                self._remove(old)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            vec = None
+            if embedding is not None:
+                vec = self._unit(embedding)
+                if self._index is None or self._index.d != vec.shape[1]:
+                    self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vec.shape[1]))
+                    for entry in self._entries.values():
+                        entry["embedding"] = None
+                self._index.add_with_ids(vec, np.array([entry_id], dtype="int64"))
+
+            self._entries[entry_id] = dict(extra, scope=scope, key=key, query=query, answer=answer,
+                                           embedding=vec, seconds=seconds, created=time.time())
+            self._exact[(scope, key)] = entry_id
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
@@ -0,0 +1,225 @@
+"""Answer many questions against the indexed corpus from the command line.
+
+Input is JSONL, one question per line: either a JSON string or an object
+with ``question`` and optional ``id`` and ``filter_type``. Output is JSONL
+with one record per question, written as answers complete::
+
+    {"index", "id", "question", "answer", "chunk_ids", "timings", "error"}
+
+``index`` is the input line number (blank lines excluded) so the output
+can be re-sorted. ``timings`` holds ``embed_batch`` and ``search_batch``
+(wall time of the batch the question travelled in), ``llm`` and
+``total`` (seconds from the start of its batch to its answer). A line
+that is not a valid question gets a record whose ``error`` names the line
+number; the rest of the run goes on.
+
+Questions are embedded ``--batch-size`` at a time and each batch is
+searched in one FAISS call. Up to ``--concurrency`` LLM calls are in
+flight while the next batches are embedded and searched. All calls run at
+bulk priority, so an interactive app sharing the process and its rate
+limits stays responsive. Keys come from ``JINA_API_KEY`` and
+``GROQ_API_KEY``.
+
+Run with ``python -m RAG.bulk questions.jsonl -o answers.jsonl --config "config (1).py"``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .llm import ask_llm
+from .providers import embed_texts
+from .scheduler import BULK, priority
+from .service import RAGService
+from .settings import load_config
+
+
+def read_questions(lines):
+    """Parse JSONL ``lines`` into ``{"index", "id", "question", "filter_type"}`` dicts.
+
+    Lines that are not valid JSON or have no ``question`` are kept with an
+    ``error`` naming their line number, so they are reported, not fatal.
+    """
+    questions = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        index = len(questions)
+        error = None
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            item, error = {}, f"line {number}: invalid JSON: {e}"
+        if isinstance(item, str):
+            item = {"question": item}
+        if not isinstance(item, dict):
+            item, error = {}, f"line {number}: expected a JSON string or object"
+        elif error is None and not isinstance(item.get("question"), str):
+            error = f"line {number}: missing \"question\""
+        question = {"index": index, "id": item.get("id", index), "question": item.get("question"),
+                    "filter_type": item.get("filter_type")}
+        if error is not None:
+            question["error"] = error
+        questions.append(question)
+    return questions
+
+
+async def _prepare(service, questions, jina_key, model, batch_size, queue):
+    # embed and search batch by batch, handing questions to the LLM workers
+    provider = service.embedding_provider(jina_key)
+    for i in range(0, len(questions), batch_size):
+        batch = questions[i:i + batch_size]
+        batch_start = time.perf_counter()
+        for item in batch:
+            item["start"] = batch_start
+            if "error" in item:
+                # unreadable input lines are reported as they are
+                await queue.put(item)
+        batch = [item for item in batch if "error" not in item]
+        if not batch:
+            continue
+        try:
+            embeddings = await asyncio.to_thread(
+                embed_texts, [item["question"] for item in batch], provider, service.embedding_cache)
+        except Exception as e:
+            for item in batch:
+                item["error"] = f"embedding failed: {e}"
+                await queue.put(item)
+            continue
+        embed_seconds = time.perf_counter() - batch_start
+
+        search_start = time.perf_counter()
+        groups = {}
+        for row, item in enumerate(batch):
+            groups.setdefault(item["filter_type"], []).append(row)
+        for filter_type, rows in groups.items():
+            try:
+                results = await asyncio.to_thread(
+                    service.retrieve_batch, [batch[r]["question"] for r in rows], embeddings[rows], model,
+                    filter_type)
+            except Exception as e:
+                for r in rows:
+                    batch[r]["error"] = f"retrieval failed: {e}"
+                continue
+            for r, (context, ranked) in zip(rows, results):
+                batch[r]["context"] = context
+                batch[r]["ranked"] = ranked
+        search_seconds = time.perf_counter() - search_start
+
+        for item in batch:
+            item["timings"] = {"embed_batch": embed_seconds, "search_batch": search_seconds}
+            await queue.put(item)
+
+
+def _ask(context, question, groq_key, model):
+    # executor threads do not inherit the caller's context
+    with priority(BULK):
+        return ask_llm(context, question, groq_key, model)
+
+
+async def _answer(queue, groq_key, model, write, executor):
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        timings = item.get("timings", {})
+        answer = None
+        error = item.get("error")
+        if error is None:
+            llm_start = time.perf_counter()
+            try:
+                answer = await loop.run_in_executor(executor, _ask, item["context"], item["question"],
+                                                    groq_key, model)
+            except Exception as e:
+                error = f"LLM call failed: {e}"
+            timings["llm"] = time.perf_counter() - llm_start
+        timings["total"] = time.perf_counter() - item["start"]
+        write({
+            "index": item["index"],
+            "id": item["id"],
+            "question": item["question"],
+            "answer": answer,
+            "chunk_ids": [r["id"] for r in item.get("ranked", [])],
+            "timings": timings,
+            "error": error,
+        })
+
+
+async def answer_questions(service, questions, jina_key, groq_key, model, write, concurrency=8, batch_size=64):
+    """Answer ``questions`` (from ``read_questions``), calling ``write(record)`` per answer.
+
+    Failures are recorded in the record's ``error`` rather than raised.
+    Returns a summary dict with counts, ``seconds`` and ``questions_per_minute``.
+    """
+    start = time.perf_counter()
+    errors = 0
+
+    def _write(record):
+        nonlocal errors
+        errors += record["error"] is not None
+        write(record)
+
+    # bounded so embedding runs at most a couple of batches ahead of the LLM
+    queue = asyncio.Queue(maxsize=max(batch_size, concurrency) * 2)
+    # a pool of its own so the default executor's size does not cap LLM concurrency
+    with priority(BULK), ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk-llm") as executor:
+        async with asyncio.TaskGroup() as tg:
+            workers = [tg.create_task(_answer(queue, groq_key, model, _write, executor))
+                       for _ in range(concurrency)]
+            await _prepare(service, questions, jina_key, model, batch_size, queue)
+            for _ in workers:
+                await queue.put(None)
+
+    seconds = time.perf_counter() - start
+    return {"questions": len(questions), "errors": errors, "seconds": seconds,
+            "questions_per_minute": 60 * len(questions) / seconds if seconds > 0 else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions against the indexed corpus.")
+    parser.add_argument("input", help="JSONL questions file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL answers file (default: stdout)")
+    parser.add_argument("--config", help="path to a config file such as 'config (1).py'")
+    parser.add_argument("--model", help="Groq model (default: GROQ_MODEL from the config)")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM calls in flight")
+    parser.add_argument("--batch-size", type=int, default=64, help="questions per embedding/search batch")
+    args = parser.parse_args(argv)
+
+    service = RAGService(load_config(args.config) if args.config else None)
+    jina_key = os.environ.get("JINA_API_KEY")
+    groq_key = os.environ.get("GROQ_API_KEY")
+    if service.requires_jina_key and not jina_key:
+        parser.error("set JINA_API_KEY (or configure a local EMBEDDING_PROVIDER)")
+    if not groq_key:
+        parser.error("set GROQ_API_KEY")
+
+    if args.input == "-":
+        questions = read_questions(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            questions = read_questions(f)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+        summary = asyncio.run(answer_questions(
+            service, questions, jina_key, groq_key, args.model or service.config.GROQ_MODEL, write,
+            concurrency=args.concurrency, batch_size=args.batch_size,
+        ))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{summary['questions']} questions in {summary['seconds']:.1f}s "
+          f"({summary['questions_per_minute']:.0f}/min), {summary['errors']} errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,126 @@
-def chunk_text(text, chunk_size=400, overlap=80):
-    words = text.split()
-    chunks = []
-    start = 0
+import re
+import time
+from collections import deque
+
+from .metrics import observe
+
+
+WORD_RE = re.compile(r"\S+")
+TRAILING_WORD_RE = re.compile(r"\S*$")
+
+
+def count_tokens(text):
+    """Cheap token estimate: ~4 characters per token, at least one per word."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def _read_blocks(stream, block_size):
+    # yield blocks that end on whitespace so no word is split between them
+    carry = ""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        block = carry + block
+        cut = TRAILING_WORD_RE.search(block).start()
+        carry = block[cut:]
+        if cut:
+            yield block[:cut]
+    if carry:
+        yield carry
+
+
+def _iter_words(source, page_separator, block_size):
+    """Yield ``(word, start, end, page)`` with offsets into the whole document."""
+    if isinstance(source, str):
+        source = [source]
+    offset = 0
+    if hasattr(source, "read"):
+        for block in _read_blocks(source, block_size):
+            for m in WORD_RE.finditer(block):
+                yield m.group(), offset + m.start(), offset + m.end(), 1
+            offset += len(block)
+        return
+    for page_no, page in enumerate(source, start=1):
+        for m in WORD_RE.finditer(page or ""):
+            yield m.group(), offset + m.start(), offset + m.end(), page_no
+        offset += len(page or "") + len(page_separator)
+
 
-    while start < len(words):
-        end = start + chunk_size
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        start += chunk_size - overlap
+def _make_chunk(window, word_start):
+    return {
+        "text": " ".join(w for w, _, _, _, _ in window),
+        "start": window[0][1],
+        "end": window[-1][2],
+        "word_start": word_start,
+        "word_end": word_start + len(window),
+        "pages": sorted({p for _, _, _, p, _ in window}),
+    }
 
-    return chunks
+
+def iter_chunks(source, chunk_size=400, overlap=80, count=None, page_separator="\n", block_size=1 << 16):
+    """Yield overlapping chunks from a document without loading it whole.
+
+    ``source`` is a string, an iterable of page texts, or a text stream
+    with ``read()``. Each chunk is a dict with ``text``, character offsets
+    ``start``/``end`` into the document (pages joined by
+    ``page_separator``), word offsets ``word_start``/``word_end`` and the
+    1-based ``pages`` it spans.
+
+    Sizes are in words, or in tokens when ``count`` (a callable returning
+    the token count of one word, e.g. ``count_tokens``) is given. Only the
+    current window is held in memory.
+
+    A ``chunk`` span is recorded at the end covering only the time spent in
+    this generator (including reading ``source``), not in the consumer.
+    """
+    if overlap >= chunk_size:
+        raise ValueError(f"overlap ({overlap}) must be smaller than chunk_size ({chunk_size})")
+
+    window = deque()
+    size = 0
+    word_start = 0
+    fresh = False
+    chunks = 0
+    busy = 0.0
+    resumed = time.perf_counter()
+    for word, start, end, page in _iter_words(source, page_separator, block_size):
+        n = 1 if count is None else count(word)
+        window.append((word, start, end, page, n))
+        size += n
+        fresh = True
+        if size >= chunk_size:
+            chunk = _make_chunk(window, word_start)
+            chunks += 1
+            busy += time.perf_counter() - resumed
+            yield chunk
+            resumed = time.perf_counter()
+            fresh = False
+            while window and size - window[0][4] >= overlap:
+                size -= window.popleft()[4]
+                word_start += 1
+
+    # skip a tail made only of overlap already emitted with the last chunk
+    if window and fresh:
+        chunks += 1
+        busy += time.perf_counter() - resumed
+        yield _make_chunk(window, word_start)
+    else:
+        busy += time.perf_counter() - resumed
+    observe("chunk", busy, items=chunks)
+
+
+def iter_batches(iterable, size):
+    """Group an iterable into lists of at most ``size`` items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def chunk_text(text, chunk_size=400, overlap=80):
+    return [c["text"] for c in iter_chunks(text, chunk_size=chunk_size, overlap=overlap)]
@@ -0,0 +1,29 @@
+import threading
+
+
+_groq_clients = {}
+_groq_lock = threading.Lock()
+
+
+def get_groq_client(api_key, **kwargs):
+    """Return a long-lived Groq client for ``api_key``, created once per process.
+
+    Reusing the client keeps its HTTP connection pool warm, so only the
+    first call pays for connection setup. The Groq client is imported
+    lazily so the package can be imported even when the optional `groq`
+    package is not installed.
+    """
+    try:
+        from groq import Groq
+    except ModuleNotFoundError as e:
+        raise ModuleNotFoundError(
+            "Missing dependency 'groq'. Install it with: pip install groq-python-client"
+        ) from e
+
+    key = (api_key, tuple(sorted(kwargs.items())))
+    with _groq_lock:
+        client = _groq_clients.get(key)
+        if client is None:
+            client = Groq(api_key=api_key, **kwargs)
+            _groq_clients[key] = client
+    return client
@@ -0,0 +1,126 @@
+import numpy as np
+
+from .chunking import count_tokens
+from .reranker import tokenize
+from .settings import default_config
+
+
+# Tokens of retrieved context for models without a CONTEXT_TOKEN_BUDGETS entry.
+DEFAULT_CONTEXT_TOKENS = 3000
+
+
+def context_budget(model, budgets=None):
+    """Context tokens for ``model`` from ``budgets`` (default: the config's CONTEXT_TOKEN_BUDGETS)."""
+    if budgets is None:
+        budgets = getattr(default_config(), "CONTEXT_TOKEN_BUDGETS", None) or {}
+    return budgets.get(model, DEFAULT_CONTEXT_TOKENS)
+
+
+def merge_overlapping(chunks):
+    """Merge chunks of the same document whose word ranges overlap or touch.
+
+    Chunks are dicts as stored in the retriever metadata; those with
+    ``doc_id``/``word_start``/``word_end`` are merged back into one
+    passage per contiguous run (overlap words appear once), keeping the
+    best ``score`` and the list of source ``ids``. Others pass through.
+    """
+    merged = []
+    runs = {}
+    for chunk in chunks:
+        if "word_start" not in chunk or "doc_id" not in chunk:
+            merged.append(dict(chunk, ids=[chunk.get("id")]))
+            continue
+        runs.setdefault(chunk["doc_id"], []).append(chunk)
+
+    for doc_chunks in runs.values():
+        doc_chunks.sort(key=lambda c: c["word_start"])
+        current = None
+        for chunk in doc_chunks:
+            if current is not None and chunk["word_start"] <= current["word_end"]:
+                if chunk["word_end"] > current["word_end"]:
+                    words = chunk["text"].split()
+                    tail = words[current["word_end"] - chunk["word_start"]:]
+                    current["text"] = current["text"] + " " + " ".join(tail)
+                    current["word_end"] = chunk["word_end"]
+                    current["end"] = chunk.get("end", current.get("end"))
+                current["score"] = max(current.get("score", 0.0), chunk.get("score", 0.0))
+                current["ids"].append(chunk.get("id"))
+                continue
+            if current is not None:
+                merged.append(current)
+            current = dict(chunk, ids=[chunk.get("id")])
+        merged.append(current)
+    return merged
+
+
+def _jaccard_matrix(texts):
+    sets = [set(tokenize(t)) for t in texts]
+    n = len(sets)
+    sim = np.eye(n, dtype=np.float32)
+    for i in range(n):
+        for j in range(i + 1, n):
+            union = len(sets[i] | sets[j])
+            sim[i, j] = sim[j, i] = len(sets[i] & sets[j]) / union if union else 0.0
+    return sim
+
+
+def mmr_order(relevance, similarity, lambda_=0.7, duplicate_threshold=0.9):
+    """Order candidates by maximal marginal relevance.
+
+    ``relevance`` is a vector of scores and ``similarity`` a square matrix
+    between candidates. Candidates at least ``duplicate_threshold`` similar
+    to one already picked are dropped.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    if len(relevance) == 0:
+        return []
+    span = relevance.max() - relevance.min()
+    rel = (relevance - relevance.min()) / span if span > 0 else np.ones_like(relevance)
+
+    remaining = list(range(len(rel)))
+    order = []
+    while remaining:
+        if order:
+            redundancy = similarity[np.ix_(remaining, order)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        best = int(np.argmax(lambda_ * rel[remaining] - (1 - lambda_) * redundancy))
+        pick = remaining.pop(best)
+        if order and redundancy[best] >= duplicate_threshold:
+            continue
+        order.append(pick)
+    return order
+
+
+def assemble_context(chunks, budget_tokens=DEFAULT_CONTEXT_TOKENS, lambda_=0.7,
+                     duplicate_threshold=0.9, count=count_tokens, separator="\n\n"):
+    """Build the prompt context from reranked chunks within a token budget.
+
+    ``chunks`` are metadata dicts with ``text`` and a relevance ``score``
+    (e.g. the fused rerank score), best first. Overlapping neighbours are
+    merged, near-duplicates removed and the rest ordered by MMR, then
+    passages are packed until ``budget_tokens`` (estimated with ``count``)
+    is reached. Returns ``(context, passages)``.
+    """
+    passages = merge_overlapping(chunks)
+    if not passages:
+        return "", []
+
+    similarity = _jaccard_matrix([p["text"] for p in passages])
+    relevance = [p.get("score", 0.0) for p in passages]
+    used = []
+    spent = 0
+    for i in mmr_order(relevance, similarity, lambda_, duplicate_threshold):
+        passage = passages[i]
+        cost = count(passage["text"])
+        if spent + cost > budget_tokens:
+            if used:
+                continue
+            # always keep something: trim the best passage to fit
+            words = passage["text"].split()
+            keep = max(1, int(len(words) * budget_tokens / max(cost, 1)))
+            passage = dict(passage, text=" ".join(words[:keep]))
+            cost = count(passage["text"])
+        used.append(passage)
+        spent += cost
+    return separator.join(p["text"] for p in used), used
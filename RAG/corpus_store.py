@@ -0,0 +1,499 @@
+import json
+import mmap
+import os
+from collections.abc import MutableMapping
+
+import numpy as np
+
+
+CHUNKS_FILE = "chunks.npy"
+TEXTS_FILE = "texts.bin"
+VECTORS_FILE = "vectors.f32"
+STORE_FILE = "chunks.json"
+
+# One fixed-size row per chunk; -1 marks an absent field.
+ROW_DTYPE = np.dtype([
+    ("id", "<i8"),
+    ("alive", "?"),
+    ("type", "u1"),
+    ("doc", "<i4"),
+    ("page_first", "<i4"),
+    ("page_last", "<i4"),
+    ("start", "<i8"),
+    ("end", "<i8"),
+    ("word_start", "<i8"),
+    ("word_end", "<i8"),
+    ("text_offset", "<i8"),
+    ("text_length", "<i4"),
+])
+OFFSET_FIELDS = ("start", "end", "word_start", "word_end")
+COLUMN_KEYS = {"type", "text", "doc_id", "pages"} | set(OFFSET_FIELDS)
+
+
+class ChunkStore(MutableMapping):
+    """Column store for chunk metadata, used as ``FAISSRetriever.metadata``.
+
+    Behaves like the ``{id: {"type", "text", "doc_id", "pages", ...}}``
+    dict it replaces. Each chunk is one ~66 byte row in a NumPy structured
+    array (type and document are small integer codes), and the UTF-8 text
+    of all chunks lives in a single blob addressed by offset. After
+    ``save`` and ``load`` both are memory-mapped, so opening a large corpus
+    costs almost nothing and only the pages touched by a query are read.
+    Keys outside the fixed columns are kept in a small per-id side table.
+
+    The store can also keep each chunk's original float32 vector, one row
+    per chunk in a raw file appended to on ``save`` like the texts, so a
+    lossy index can be rebuilt from exact vectors. Either every chunk has a
+    vector or none does (see ``set_vectors``).
+
+    Ids must be added in increasing order (as the retriever assigns them);
+    deleted rows are tombstoned and dropped when ``save`` compacts.
+    """
+
+    def __init__(self, capacity=1024):
+        self._rows = np.zeros(capacity, dtype=ROW_DTYPE)
+        self._n = 0
+        self._alive = 0
+        self._writable = True
+        self._dirty = True
+        self.types = []
+        self.docs = []
+        self._type_codes = {}
+        self._doc_codes = {}
+        self._extras = {}
+        self._blob = None
+        self._blob_file = None
+        self._blob_size = 0
+        self._tail = bytearray()
+        self._path = None
+        self.vector_dim = None
+        self._saved_vectors = None
+        self._vector_tail = []
+        self._vectors_rewrite = False
+
+    # -- mapping interface -------------------------------------------------
+
+    def __len__(self):
+        return self._alive
+
+    def __iter__(self):
+        return iter(self.ids().tolist())
+
+    def __contains__(self, chunk_id):
+        return self._position(chunk_id) is not None
+
+    def __getitem__(self, chunk_id):
+        pos = self._position(chunk_id)
+        if pos is None:
+            raise KeyError(chunk_id)
+        return self._row_dict(pos)
+
+    def __setitem__(self, chunk_id, meta):
+        self.extend([chunk_id], [meta])
+
+    def __delitem__(self, chunk_id):
+        if not self.discard([chunk_id]):
+            raise KeyError(chunk_id)
+
+    def pop(self, chunk_id, *default):
+        # avoid decoding the text when the value is not wanted
+        if default and chunk_id not in self:
+            return default[0]
+        meta = self[chunk_id]
+        self.discard([chunk_id])
+        return meta
+
+    # -- vectorised access -------------------------------------------------
+
+    @property
+    def _live(self):
+        rows = self._rows[:self._n]
+        return rows[rows["alive"]]
+
+    def _position(self, chunk_id):
+        ids = self._rows["id"][:self._n]
+        pos = int(np.searchsorted(ids, chunk_id))
+        if pos < self._n and ids[pos] == chunk_id and self._rows["alive"][pos]:
+            return pos
+        return None
+
+    def ids(self):
+        """Ids of all live chunks as an int64 array, in insertion order."""
+        return np.array(self._live["id"], dtype="int64")
+
+    def ids_of_type(self, chunk_type):
+        code = self._type_codes.get(chunk_type)
+        if code is None:
+            return np.zeros(0, dtype="int64")
+        live = self._live
+        return np.array(live["id"][live["type"] == code], dtype="int64")
+
+    def documents(self):
+        """``{doc_id: ids}`` for every document with live chunks."""
+        live = self._live
+        live = live[live["doc"] >= 0]
+        order = np.argsort(live["doc"], kind="stable")
+        docs = live["doc"][order]
+        ids = np.array(live["id"][order], dtype="int64")
+        bounds = np.flatnonzero(np.diff(docs)) + 1
+        return {self.docs[group_docs[0]]: group
+                for group_docs, group in zip(np.split(docs, bounds), np.split(ids, bounds)) if len(group)}
+
+    def doc_ids(self, doc_id):
+        code = self._doc_codes.get(doc_id)
+        if code is None:
+            return np.zeros(0, dtype="int64")
+        live = self._live
+        return np.array(live["id"][live["doc"] == code], dtype="int64")
+
+    def _live_positions(self, ids):
+        # row positions of ``ids`` in input order; KeyError if one is missing
+        ids = np.asarray(ids, dtype="int64")
+        positions = np.searchsorted(self._rows["id"][:self._n], ids)
+        found = positions < self._n
+        found[found] = self._rows["id"][positions[found]] == ids[found]
+        found[found] = self._rows["alive"][positions[found]]
+        if not found.all():
+            raise KeyError(int(ids[~found][0]))
+        return positions
+
+    @property
+    def has_vectors(self):
+        return self.vector_dim is not None
+
+    def vectors(self, ids):
+        """Original vectors of ``ids`` as a float32 array (requires ``has_vectors``)."""
+        if not self.has_vectors:
+            raise ValueError("This store does not keep vectors")
+        return self._vectors_at(self._live_positions(ids))
+
+    def _vectors_at(self, positions):
+        out = np.empty((len(positions), self.vector_dim), dtype="float32")
+        saved = 0 if self._saved_vectors is None else len(self._saved_vectors)
+        old = positions < saved
+        if old.any():
+            out[old] = self._saved_vectors[positions[old]]
+        if not old.all():
+            tail = np.concatenate(self._vector_tail)
+            out[~old] = tail[positions[~old] - saved]
+        return out
+
+    def set_vectors(self, vectors):
+        """Store ``vectors`` for all live chunks (in ``ids()`` order), or drop them with None."""
+        if vectors is None:
+            self.vector_dim = None
+            self._saved_vectors = None
+            self._vector_tail = []
+        else:
+            vectors = np.asarray(vectors, dtype="float32")
+            if len(vectors) != self._alive:
+                raise ValueError(f"Got {len(vectors)} vectors for {self._alive} chunks")
+            rows = np.zeros((self._n, vectors.shape[1]), dtype="float32")
+            rows[self._rows["alive"][:self._n]] = vectors
+            self.vector_dim = vectors.shape[1]
+            self._saved_vectors = None
+            self._vector_tail = [rows]
+        self._vectors_rewrite = True
+        self._dirty = True
+
+    def text(self, chunk_id):
+        pos = self._position(chunk_id)
+        if pos is None:
+            raise KeyError(chunk_id)
+        return self._text(pos)
+
+    def _text(self, pos):
+        offset = int(self._rows["text_offset"][pos])
+        length = int(self._rows["text_length"][pos])
+        if length < 0:
+            return None
+        if offset >= self._blob_size:
+            start = offset - self._blob_size
+            return self._tail[start:start + length].decode("utf-8")
+        return self._blob[offset:offset + length].decode("utf-8")
+
+    def _row_dict(self, pos):
+        row = self._rows[pos]
+        meta = {"type": self.types[row["type"]]}
+        text = self._text(pos)
+        if text is not None:
+            meta["text"] = text
+        if row["doc"] >= 0:
+            meta["doc_id"] = self.docs[row["doc"]]
+        for field in OFFSET_FIELDS:
+            if row[field] >= 0:
+                meta[field] = int(row[field])
+        if row["page_first"] >= 0:
+            meta["pages"] = list(range(int(row["page_first"]), int(row["page_last"]) + 1))
+        extra = self._extras.get(int(row["id"]))
+        if extra:
+            meta.update(extra)
+        return meta
+
+    # -- mutation ----------------------------------------------------------
+
+    def _code(self, value, values, codes):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _make_writable(self, needed):
+        capacity = len(self._rows) if self._writable else 0
+        if needed <= capacity:
+            return
+        rows = np.zeros(max(needed, 2 * capacity, 1024), dtype=ROW_DTYPE)
+        rows[:self._n] = self._rows[:self._n]
+        self._rows = rows
+        self._writable = True
+
+    def _fill_source(self, row, meta):
+        # document, offsets and pages; returns a page list the columns cannot hold
+        doc = meta.get("doc_id")
+        row["doc"] = -1 if doc is None else self._code(doc, self.docs, self._doc_codes)
+        for field in OFFSET_FIELDS:
+            row[field] = meta.get(field, -1)
+        pages = meta.get("pages")
+        row["page_first"] = row["page_last"] = -1
+        if pages:
+            row["page_first"], row["page_last"] = pages[0], pages[-1]
+            if list(pages) != list(range(pages[0], pages[-1] + 1)):
+                return {"pages": list(pages)}
+        return {}
+
+    def extend(self, ids, metas, vectors=None):
+        """Append chunks ``ids`` (increasing, above every stored id) with their metadata.
+
+        ``vectors`` must be given exactly when the store keeps vectors; the
+        first call on an empty store decides.
+        """
+        ids = np.asarray(ids, dtype="int64")
+        metas = list(metas)
+        if len(ids) == 0:
+            return
+        if (self._n and ids[0] <= self._rows["id"][self._n - 1]) or (np.diff(ids) <= 0).any():
+            raise ValueError("ChunkStore ids must be added in increasing order")
+        if vectors is not None:
+            vectors = np.asarray(vectors, dtype="float32")
+            if self.vector_dim is None and self._n:
+                raise ValueError("Stored chunks have no vectors; call set_vectors first")
+            if len(vectors) != len(ids) or (self.vector_dim is not None and vectors.shape[1] != self.vector_dim):
+                raise ValueError(f"Got vectors of shape {vectors.shape} for {len(ids)} chunks")
+            self.vector_dim = vectors.shape[1]
+            self._vector_tail.append(vectors.copy())
+        elif self.vector_dim is not None:
+            raise ValueError("This store keeps vectors; pass them to extend")
+
+        self._make_writable(self._n + len(ids))
+        rows = self._rows[self._n:self._n + len(ids)]
+        rows["id"] = ids
+        rows["alive"] = True
+        offset = self._blob_size + len(self._tail)
+        for row, chunk_id, meta in zip(rows, ids.tolist(), metas):
+            row["type"] = self._code(meta.get("type", "text"), self.types, self._type_codes)
+            extra = self._fill_source(row, meta)
+            extra.update((k, v) for k, v in meta.items() if k not in COLUMN_KEYS)
+            text = meta.get("text")
+            if text is None:
+                row["text_offset"], row["text_length"] = offset, -1
+            else:
+                data = text.encode("utf-8")
+                row["text_offset"], row["text_length"] = offset, len(data)
+                self._tail += data
+                offset += len(data)
+            if extra:
+                self._extras[chunk_id] = extra
+        self._n += len(ids)
+        self._alive += len(ids)
+        self._dirty = True
+
+    def discard(self, ids):
+        """Remove every chunk in ``ids`` that exists; returns how many were removed."""
+        ids = np.asarray(ids, dtype="int64")
+        if len(ids) == 0 or self._n == 0:
+            return 0
+        positions = np.searchsorted(self._rows["id"][:self._n], ids)
+        found = positions < self._n
+        positions, ids = positions[found], ids[found]
+        positions = positions[self._rows["id"][positions] == ids]
+        positions = np.unique(positions[self._rows["alive"][positions]])
+        if len(positions) == 0:
+            return 0
+        self._make_writable(self._n)
+        self._rows["alive"][positions] = False
+        for chunk_id in self._rows["id"][positions].tolist():
+            self._extras.pop(chunk_id, None)
+        self._alive -= len(positions)
+        self._dirty = True
+        return len(positions)
+
+    def set_extra(self, chunk_id, key, value):
+        """Set (or, with None, remove) a non-column key of a stored chunk."""
+        if chunk_id not in self:
+            raise KeyError(chunk_id)
+        extra = self._extras.setdefault(chunk_id, {})
+        if value is None:
+            extra.pop(key, None)
+        else:
+            extra[key] = value
+        if not extra:
+            del self._extras[chunk_id]
+        self._dirty = True
+
+    def extras(self, key):
+        """``(id, value)`` for every chunk with the non-column ``key`` set."""
+        return [(i, extra[key]) for i, extra in self._extras.items() if key in extra]
+
+    def move(self, chunk_id, source):
+        """Point a chunk at another ``doc_id``/``pages``/offsets, keeping its text and type."""
+        pos = self._position(chunk_id)
+        if pos is None:
+            raise KeyError(chunk_id)
+        self._make_writable(self._n)
+        row = self._rows[pos]
+        extra = self._extras.setdefault(chunk_id, {})
+        extra.pop("pages", None)
+        extra.update(self._fill_source(row, source))
+        if not extra:
+            del self._extras[chunk_id]
+        self._dirty = True
+
+    def nbytes(self):
+        """In-memory (not memory-mapped) bytes held by the store."""
+        rows = self._rows.nbytes if self._writable else 0
+        return rows + len(self._tail) + sum(v.nbytes for v in self._vector_tail)
+
+    # -- persistence -------------------------------------------------------
+
+    def _close_blob(self):
+        if self._blob is not None:
+            self._blob.close()
+            self._blob_file.close()
+        self._blob = self._blob_file = None
+
+    def _open_blob(self, path):
+        self._close_blob()
+        self._blob_size = os.path.getsize(path) if os.path.exists(path) else 0
+        if self._blob_size:
+            self._blob_file = open(path, "rb")
+            self._blob = mmap.mmap(self._blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def save(self, path):
+        """Write rows, texts and codes into directory ``path``.
+
+        New texts and vectors are appended to their files; once more than
+        half the rows are deleted (or when saving somewhere new) both are
+        rewritten without them.
+        """
+        os.makedirs(path, exist_ok=True)
+        texts_path = os.path.join(path, TEXTS_FILE)
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        if 2 * (self._n - self._alive) > self._n or path != self._path:
+            # rewrite everything live into a fresh blob
+            live_positions = np.flatnonzero(self._rows["alive"][:self._n])
+            self._write_vectors(vectors_path, live_positions)
+            tmp = texts_path + ".tmp"
+            rows = np.array(self._rows[live_positions])
+            with open(tmp, "wb") as f:
+                offset = 0
+                for i, pos in enumerate(live_positions.tolist()):
+                    text = self._raw_text(pos)
+                    rows["text_offset"][i] = offset
+                    f.write(text)
+                    offset += len(text)
+            self._close_blob()
+            os.replace(tmp, texts_path)
+            self._rows, self._n, self._writable, self._tail = rows, len(rows), True, bytearray()
+            self._dirty = True
+        else:
+            if self._tail:
+                with open(texts_path, "ab") as f:
+                    f.write(self._tail)
+                self._tail = bytearray()
+            if self._vectors_rewrite:
+                self._write_vectors(vectors_path, np.arange(self._n))
+            elif self._vector_tail:
+                saved = 0 if self._saved_vectors is None else len(self._saved_vectors)
+                with open(vectors_path, "ab") as f:
+                    # drop rows a crashed save appended past the saved rows
+                    f.truncate(saved * self.vector_dim * 4)
+                    for vectors in self._vector_tail:
+                        f.write(vectors.tobytes())
+        self._open_blob(texts_path)
+        self._open_vectors(vectors_path)
+
+        if self._dirty:
+            tmp = os.path.join(path, CHUNKS_FILE + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, self._rows[:self._n])
+            os.replace(tmp, os.path.join(path, CHUNKS_FILE))
+            state = {"types": self.types, "docs": self.docs, "vector_dim": self.vector_dim,
+                     "extras": [[i, extra] for i, extra in self._extras.items()]}
+            tmp = os.path.join(path, STORE_FILE + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, os.path.join(path, STORE_FILE))
+            self._dirty = False
+        self._path = path
+
+    def _write_vectors(self, path, positions, block=65536):
+        # rewrite the vector file with the rows at ``positions``
+        if not self.has_vectors:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            for start in range(0, len(positions), block):
+                f.write(self._vectors_at(positions[start:start + block]).tobytes())
+        os.replace(tmp, path)
+
+    def _open_vectors(self, path):
+        self._vector_tail = []
+        self._vectors_rewrite = False
+        self._saved_vectors = None
+        if self.has_vectors and self._n:
+            self._saved_vectors = np.memmap(path, dtype="float32", mode="r", shape=(self._n, self.vector_dim))
+
+    def _raw_text(self, pos):
+        offset = int(self._rows["text_offset"][pos])
+        length = max(0, int(self._rows["text_length"][pos]))
+        if offset >= self._blob_size:
+            start = offset - self._blob_size
+            return bytes(self._tail[start:start + length])
+        return self._blob[offset:offset + length]
+
+    @classmethod
+    def load(cls, path, mmap_rows=True):
+        """Open a store saved with ``save``; rows are memory-mapped read-only until modified."""
+        store = cls(capacity=0)
+        rows = np.load(os.path.join(path, CHUNKS_FILE), mmap_mode="r" if mmap_rows else None)
+        store._rows, store._n = rows, len(rows)
+        store._alive = int(rows["alive"].sum())
+        store._writable = not mmap_rows
+        with open(os.path.join(path, STORE_FILE), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        store.types = state["types"]
+        store.docs = state["docs"]
+        store._type_codes = {v: i for i, v in enumerate(store.types)}
+        store._doc_codes = {v: i for i, v in enumerate(store.docs)}
+        store._extras = {i: extra for i, extra in state["extras"]}
+        store.vector_dim = state.get("vector_dim")
+        store._open_blob(os.path.join(path, TEXTS_FILE))
+        store._open_vectors(os.path.join(path, VECTORS_FILE))
+        store._path = path
+        store._dirty = False
+        return store
+
+    @classmethod
+    def from_items(cls, items):
+        """Build a store from ``(id, metadata_dict)`` pairs, e.g. an old JSON corpus."""
+        items = sorted(items, key=lambda item: item[0])
+        store = cls(capacity=max(1024, len(items)))
+        store.extend([i for i, _ in items], [meta for _, meta in items])
+        return store
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, CHUNKS_FILE))
@@ -0,0 +1,150 @@
+import threading
+import zlib
+
+import numpy as np
+
+from .reranker import tokenize
+
+
+_PRIME = (1 << 31) - 1
+
+
+def shingle_hashes(text, size=5):
+    """CRC32 hashes of the word ``size``-grams of ``text`` (the whole text if shorter)."""
+    tokens = tokenize(text)
+    if len(tokens) <= size:
+        return np.array([zlib.crc32(" ".join(tokens).encode("utf-8"))], dtype=np.uint64)
+    grams = (" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64)
+
+
+class Deduplicator:
+    """Near-duplicate detection with MinHash signatures and an LSH index.
+
+    Each text becomes ``num_perm`` min-hashes over its word shingles; the
+    fraction of equal positions estimates the Jaccard similarity of two
+    shingle sets. Signatures are cut into ``bands`` bands and only texts
+    sharing a whole band are compared, so a lookup touches a handful of
+    candidates instead of every stored text. ``find`` returns the stored
+    key whose estimated similarity is highest and at least ``threshold``.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, shingle_size=5, seed=0):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._signatures = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def spawn(self):
+        """An empty index with the same hash functions (signatures stay comparable)."""
+        other = Deduplicator(self.threshold, self.num_perm, self.bands, self.shingle_size)
+        other._a, other._b = self._a, self._b
+        return other
+
+    def signatures(self, texts):
+        """``(len(texts), num_perm)`` uint32 MinHash signatures."""
+        hashes = [shingle_hashes(t, self.shingle_size) for t in texts]
+        if not hashes:
+            return np.zeros((0, self.num_perm), dtype=np.uint32)
+        flat = np.concatenate(hashes) % _PRIME
+        starts = np.cumsum([0] + [len(h) for h in hashes[:-1]])
+        out = np.empty((len(hashes), self.num_perm), dtype=np.uint32)
+        permuted = np.empty_like(flat)
+        # one permutation at a time: temporaries stay one row of shingles
+        for p in range(self.num_perm):
+            np.multiply(flat, self._a[p], out=permuted)
+            permuted += self._b[p]
+            permuted %= _PRIME
+            out[:, p] = np.minimum.reduceat(permuted, starts)
+        return out
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def find(self, signature, exclude=()):
+        """Key (not in ``exclude``) of the most similar stored text at or above ``threshold``, else None."""
+        with self._lock:
+            candidates = set()
+            for bucket, band in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(band, ()))
+            candidates.difference_update(exclude)
+            best, best_score = None, self.threshold
+            for key in candidates:
+                score = float(np.mean(self._signatures[key] == signature))
+                if score >= best_score:
+                    best, best_score = key, score
+            return best
+
+    def add(self, key, signature):
+        with self._lock:
+            self._signatures[key] = signature
+            for bucket, band in zip(self._buckets, self._band_keys(signature)):
+                bucket.setdefault(band, []).append(key)
+
+    def remove(self, keys):
+        with self._lock:
+            for key in keys:
+                signature = self._signatures.pop(key, None)
+                if signature is None:
+                    continue
+                for bucket, band in zip(self._buckets, self._band_keys(signature)):
+                    members = bucket.get(band)
+                    if members is not None:
+                        members.remove(key)
+                        if not members:
+                            del bucket[band]
+
+    @classmethod
+    def from_metadata(cls, metadata, **kwargs):
+        """Index the text chunks of a retriever's metadata, keyed by chunk id."""
+        dedup = cls(**kwargs)
+        items = [(i, meta["text"]) for i, meta in metadata.items()
+                 if meta.get("type") == "text" and "text" in meta]
+        for start in range(0, len(items), 1024):
+            batch = items[start:start + 1024]
+            for (i, _), signature in zip(batch, dedup.signatures([t for _, t in batch])):
+                dedup.add(i, signature)
+        return dedup
+
+
+def source_of(meta):
+    """The back-reference stored for a chunk folded into a representative."""
+    return {k: meta[k] for k in ("doc_id", "pages", "start", "end") if k in meta}
+
+
+def dedup_chunks(chunks, dedup, local, offset, exclude=()):
+    """Split one batch of chunk dicts into unique chunks and duplicates.
+
+    ``dedup`` holds chunks already in the index (keyed by chunk id; ids in
+    ``exclude`` are ignored), ``local`` the unique chunks seen earlier in this document (keyed by
+    their position, starting at ``offset`` for this batch). Unique chunks
+    are added to ``local``. Returns ``(unique, signatures, duplicates)``
+    where each duplicate is ``{"of": ("id", chunk_id) or ("local",
+    position), "source": chunk}``.
+    """
+    unique, kept, duplicates = [], [], []
+    for chunk, signature in zip(chunks, dedup.signatures([c["text"] for c in chunks])):
+        match = dedup.find(signature, exclude)
+        if match is not None:
+            duplicates.append({"of": ("id", match), "source": chunk})
+            continue
+        match = local.find(signature)
+        if match is not None:
+            duplicates.append({"of": ("local", match), "source": chunk})
+            continue
+        local.add(offset + len(unique), signature)
+        unique.append(chunk)
+        kept.append(signature)
+    return unique, kept, duplicates
@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# One index log record: SHA-256 of the text and its row; an all-zero key
+# marks the row as free.
+_RECORD = np.dtype([("key", "V32"), ("slot", "<i8")])
+_FREED = bytes(32)
+
+
+@contextmanager
+def _file_lock(f, exclusive):
+    # advisory lock between processes; Windows only has exclusive locks
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class EmbeddingCache:
+    """Persistent, content-addressed cache of embedding vectors for one model.
+
+    Vectors live in a memory-mapped float32 file under ``directory/<model>``.
+    An append-only log of ``(SHA-256 of text, row)`` records maps texts to
+    rows, so a put costs a few appended bytes; the log is rewritten once it
+    is mostly stale. When ``max_entries`` is reached the least recently used
+    row is reused, after a record freeing it is logged, so a crash never
+    leaves a key pointing at another text's vector.
+
+    Processes may share the directory (e.g. the app and the server): a lock
+    file serialises writers, and every call first reads the records other
+    processes appended.
+    """
+
+    def __init__(self, directory, model, max_entries=200_000, initial_capacity=1024):
+        self.model = model
+        self.max_entries = max_entries
+        self.path = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", model))
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._log_path = os.path.join(self.path, "index.log")
+        self._meta_path = os.path.join(self.path, "meta.json")
+
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(self.path, "lock"), "a+b")
+        self._slots = OrderedDict()
+        self._slot_keys = {}
+        self._free = set()
+        self.dim = None
+        self.capacity = 0
+        self._vectors = None
+        self._initial_capacity = initial_capacity
+        self._log_ino = None
+        self._log_offset = 0
+        self._log_records = 0
+        self.hits = 0
+        self.misses = 0
+        with self._lock, _file_lock(self._lock_file, exclusive=True):
+            self._migrate()
+            self._sync(repair=True)
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._lock_file.close()
+
+    # -- on-disk state (call with the file lock held) ------------------------
+
+    def _migrate(self):
+        # convert the JSON index written by earlier versions
+        legacy = os.path.join(self.path, "index.json")
+        if not os.path.exists(legacy) or os.path.exists(self._log_path):
+            return
+        with open(legacy, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self._write_meta(index["dim"])
+        self._write_log([(bytes.fromhex(k), s) for k, s in index["slots"]], self._log_path + ".tmp")
+        os.replace(self._log_path + ".tmp", self._log_path)
+        os.remove(legacy)
+
+    def _write_meta(self, dim):
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": dim}, f)
+        os.replace(tmp, self._meta_path)
+
+    @staticmethod
+    def _write_log(entries, path, mode="wb"):
+        records = np.empty(len(entries), dtype=_RECORD)
+        for i, (key, slot) in enumerate(entries):
+            records[i] = (key, slot)
+        with open(path, mode) as f:
+            f.write(records.tobytes())
+        return len(records)
+
+    def _sync(self, repair=False):
+        """Pick up rows and records written by other processes (or a previous run)."""
+        if self.dim is None:
+            if not os.path.exists(self._meta_path):
+                return
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        try:
+            st = os.stat(self._log_path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and st.st_ino != self._log_ino:
+            # first load, or another process compacted the log
+            self._slots.clear()
+            self._slot_keys.clear()
+            self._free = set(range(self.capacity))
+            self._log_ino, self._log_offset, self._log_records = st.st_ino, 0, 0
+        self._map_vectors()
+        if st is None:
+            return
+        end = st.st_size - st.st_size % _RECORD.itemsize
+        if repair and end != st.st_size:
+            # drop a record torn by a crash
+            with open(self._log_path, "r+b") as f:
+                f.truncate(end)
+        if end > self._log_offset:
+            with open(self._log_path, "rb") as f:
+                f.seek(self._log_offset)
+                self._replay(np.frombuffer(f.read(end - self._log_offset), dtype=_RECORD))
+            self._log_offset = end
+
+    def _replay(self, records):
+        for key, slot in zip(records["key"], records["slot"].tolist()):
+            old = self._slot_keys.pop(slot, None)
+            if old is not None:
+                del self._slots[old]
+            key = key.tobytes()
+            if key == _FREED:
+                self._free.add(slot)
+                continue
+            key = key.hex()
+            previous = self._slots.pop(key, None)
+            if previous is not None:
+                del self._slot_keys[previous]
+                self._free.add(previous)
+            self._slots[key] = slot
+            self._slot_keys[slot] = key
+            self._free.discard(slot)
+        self._log_records += len(records)
+
+    def _append(self, entries):
+        self._log_records += self._write_log(entries, self._log_path, mode="ab")
+        st = os.stat(self._log_path)
+        self._log_ino, self._log_offset = st.st_ino, st.st_size
+
+    def _compact(self):
+        # rewrite the log with only live entries, oldest use first
+        if self._log_records <= 2 * len(self._slots) + 1024:
+            return
+        self._vectors.flush()
+        tmp = self._log_path + ".tmp"
+        self._log_records = self._write_log([(bytes.fromhex(k), s) for k, s in self._slots.items()], tmp)
+        os.replace(tmp, self._log_path)
+        st = os.stat(self._log_path)
+        self._log_ino, self._log_offset = st.st_ino, st.st_size
+
+    def _map_vectors(self):
+        if self.dim is None or not os.path.exists(self._vectors_path):
+            return
+        capacity = os.path.getsize(self._vectors_path) // (self.dim * 4)
+        if capacity <= self.capacity:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._free.update(range(self.capacity, capacity))
+        self.capacity = capacity
+        self._vectors = np.memmap(self._vectors_path, dtype="float32", mode="r+",
+                                  shape=(self.capacity, self.dim))
+
+    def _grow(self, needed):
+        capacity = max(self.capacity, self._initial_capacity)
+        while capacity < needed:
+            capacity *= 2
+        capacity = min(capacity, self.max_entries)
+        if capacity <= self.capacity:
+            return
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._map_vectors()
+
+    # -- lookups -------------------------------------------------------------
+
+    def get_many(self, keys):
+        """Look up a batch of keys.
+
+        Returns ``(vectors, hits)`` where ``hits`` is a boolean mask and
+        ``vectors`` holds the cached rows (rows for misses are undefined).
+        ``vectors`` is None when the cache is still empty.
+        """
+        hits = np.zeros(len(keys), dtype=bool)
+        with self._lock, _file_lock(self._lock_file, exclusive=False):
+            self._sync()
+            if self._vectors is None:
+                self.misses += len(keys)
+                return None, hits
+            rows = np.empty(len(keys), dtype=np.int64)
+            for i, k in enumerate(keys):
+                slot = self._slots.get(k)
+                if slot is not None:
+                    self._slots.move_to_end(k)
+                    rows[i] = slot
+                    hits[i] = True
+            vectors = np.empty((len(keys), self.dim), dtype="float32")
+            vectors[hits] = self._vectors[rows[hits]]
+            n_hits = int(hits.sum())
+            self.hits += n_hits
+            self.misses += len(keys) - n_hits
+        return vectors, hits
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype="float32")
+        with self._lock, _file_lock(self._lock_file, exclusive=True):
+            self._sync()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._write_meta(self.dim)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cache dimension {self.dim}")
+
+            new = sum(1 for k in dict.fromkeys(keys) if k not in self._slots)
+            if len(self._slots) + new > self.capacity:
+                self._grow(len(self._slots) + new)
+
+            rows = []
+            added = []
+            freed = []
+            for k in keys:
+                slot = self._slots.get(k)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                        del self._slot_keys[slot]
+                        freed.append((_FREED, slot))
+                    self._slot_keys[slot] = k
+                    added.append((bytes.fromhex(k), slot))
+                self._slots[k] = slot
+                self._slots.move_to_end(k)
+                rows.append(slot)
+            # free reused rows before overwriting them, and only point keys
+            # at rows once their vectors are written
+            if freed:
+                self._append(freed)
+            self._vectors[rows] = vectors
+            if added:
+                self._append(added)
+            self._compact()
+
+
+def cached_embeddings(texts, embed, cache):
+    """Embed ``texts`` through ``cache``; only misses are passed to ``embed``.
+
+    ``embed`` takes a list of texts and returns a float32 array. Repeated
+    texts within the batch are embedded once.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, 0), dtype="float32")
+
+    keys = [cache.key(t) for t in texts]
+    vectors, hits = cache.get_many(keys)
+    if hits.all():
+        return vectors
+
+    missing = OrderedDict()
+    for i in np.flatnonzero(~hits):
+        missing.setdefault(keys[i], []).append(i)
+    fresh = embed([texts[rows[0]] for rows in missing.values()])
+    cache.put_many(list(missing), fresh)
+
+    if vectors is None:
+        vectors = np.empty((len(texts), fresh.shape[1]), dtype="float32")
+    for vec, rows in zip(fresh, missing.values()):
+        vectors[rows] = vec
+    return vectors
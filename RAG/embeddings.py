@@ -1,30 +1,153 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 import numpy as np
+from requests.adapters import HTTPAdapter
+
+from .chunking import count_tokens
+from .embedding_cache import cached_embeddings
+from .metrics import span
+from .scheduler import RETRY_STATUSES, RetryableError, current_priority, get_limiter, key_id
+from .settings import default_config
+
+
+# Defaults come from the config file; these are used when it is missing.
+_config = default_config()
+JINA_EMBEDDING_URL = getattr(_config, "JINA_EMBEDDING_URL", "https://api.jina.ai/v1/embeddings")
+JINA_MODEL = getattr(_config, "JINA_MODEL", "jina-embeddings-v4")
+
 
+class JinaEmbeddingClient:
+    """Batched, concurrent client for the Jina embeddings endpoint.
 
-def get_jina_embeddings(texts, api_key):
-    url = "https://api.jina.ai/v1/embeddings"
+    Inputs are split into batches bounded by item count and total characters,
+    posted concurrently over one pooled keep-alive session, and reassembled
+    into a single float32 array in input order. Every request goes through
+    the shared ``"jina"`` rate limiter for this key (see ``RAG.scheduler``),
+    which paces, prioritises, retries and merges identical in-flight
+    batches. ``url`` can
+    point at a local stand-in server for testing.
+    """
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    def __init__(self, api_key, model=JINA_MODEL, url=JINA_EMBEDDING_URL,
+                 batch_size=64, max_batch_chars=100_000, max_workers=4, timeout=30):
+        self.model = model
+        self.url = url
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self.timeout = timeout
+        self.limiter = get_limiter("jina", model, api_key)
+        self._key_id = key_id(api_key)
 
-    payload = {
-        "model": "jina-embeddings-v4",
-        "input": texts
-    }
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jina")
 
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as e:
+    def batches(self, texts):
+        """Yield ``(offset, batch)`` pairs bounded by batch_size and max_batch_chars."""
+        start = 0
+        batch = []
+        chars = 0
+        for i, text in enumerate(texts):
+            if batch and (len(batch) >= self.batch_size or chars + len(text) > self.max_batch_chars):
+                yield start, batch
+                start, batch, chars = i, [], 0
+            batch.append(text)
+            chars += len(text)
+        if batch:
+            yield start, batch
+
+    def embed(self, texts):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+
+        with span("embed", items=len(texts), nbytes=sum(len(t.encode("utf-8")) for t in texts)):
+            batches = list(self.batches(texts))
+            # worker threads do not inherit the caller's context
+            priority = current_priority()
+            if len(batches) == 1:
+                results = [self._post(batches[0][1], priority)]
+            else:
+                results = self._executor.map(self._post, [b for _, b in batches], [priority] * len(batches))
+
+            out = None
+            for (offset, batch), vectors in zip(batches, results):
+                if out is None:
+                    out = np.empty((len(texts), vectors.shape[1]), dtype="float32")
+                out[offset:offset + len(batch)] = vectors
+            return out
+
+    def _send(self, payload):
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        if response.ok:
+            return response, response.json()
         # bubble up with clearer context for the caller
-        status = getattr(e.response, 'status_code', None)
-        msg = f"Jina embeddings request failed with status {status}: {e.response.text if e.response is not None else ''}"
-        raise requests.exceptions.HTTPError(msg) from e
-    except requests.exceptions.RequestException as e:
-        raise
-
-    vectors = [item["embedding"] for item in response.json()["data"]]
-    return np.array(vectors).astype("float32")
+        msg = f"Jina embeddings request failed with status {response.status_code}: {response.text}"
+        if response.status_code in RETRY_STATUSES:
+            try:
+                retry_after = float(response.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                retry_after = None
+            raise RetryableError(msg, status=response.status_code, retry_after=retry_after)
+        raise requests.exceptions.HTTPError(msg, response=response)
+
+    def _post(self, batch, priority=None):
+        payload = {
+            "model": self.model,
+            "input": batch
+        }
+
+        with span("embed.request", items=len(batch)) as s:
+            response, body = self.limiter.call(
+                self._send, payload,
+                tokens=sum(count_tokens(t) for t in batch),
+                key=(self._key_id, self.url, tuple(batch)),
+                priority=priority,
+                usage=lambda result: (result[1].get("usage") or {}).get("total_tokens", 0),
+            )
+            s.nbytes = len(response.content)
+            s.tokens = (body.get("usage") or {}).get("total_tokens", 0)
+
+        data = body["data"]
+        if data and "index" in data[0]:
+            data = sorted(data, key=lambda item: item["index"])
+        return np.asarray([item["embedding"] for item in data], dtype="float32")
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_jina_client(api_key, model=JINA_MODEL, url=JINA_EMBEDDING_URL, **kwargs):
+    """Return a process-wide client for these arguments, creating it once.
+
+    Calls with different ``kwargs`` (batch sizes, workers, timeout) get
+    clients of their own.
+    """
+    key = (api_key, model, url, tuple(sorted(kwargs.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = JinaEmbeddingClient(api_key, model=model, url=url, **kwargs)
+            _clients[key] = client
+    return client
+
+
+def get_jina_embeddings(texts, api_key, model=JINA_MODEL, url=JINA_EMBEDDING_URL, cache=None):
+    """Embed ``texts`` with Jina; with an ``EmbeddingCache`` only misses hit the API."""
+    client = get_jina_client(api_key, model=model, url=url)
+    if cache is None:
+        return client.embed(texts)
+    return cached_embeddings(texts, client.embed, cache)
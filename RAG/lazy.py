@@ -0,0 +1,32 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    ``faiss = LazyModule("faiss")`` keeps the rest of a file unchanged while
+    moving the import cost (and any missing-package error, with
+    ``install`` as the hint) from import time to first use.
+    """
+
+    def __init__(self, name, install=None):
+        self._name = name
+        self._install = install or name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                try:
+                    self._module = importlib.import_module(self._name)
+                except ModuleNotFoundError as e:
+                    raise ModuleNotFoundError(
+                        f"Missing dependency '{self._name}'. Install it with: pip install {self._install}"
+                    ) from e
+        return self._module
+
+    def __getattr__(self, attr):
+        module = self._module if self._module is not None else self._load()
+        return getattr(module, attr)
@@ -1,21 +1,18 @@
-def ask_llm(context, question, api_key, model):
-    """Call Groq LLM to generate an answer.
+import time
 
-    This function imports the Groq client lazily so the module can be
-    imported even if the `groq` package is not installed. When the
-    package is missing, we raise a clear error message that the caller
-    (the app) can surface to the user instead of failing at import time.
-    """
-    try:
-        from groq import Groq
-    except ModuleNotFoundError as e:
-        raise ModuleNotFoundError(
-            "Missing dependency 'groq'. Install it with: pip install groq-python-client"
-        ) from e
+from .chunking import count_tokens
+from .clients import get_groq_client
+from .metrics import observe, span
+from .scheduler import get_limiter, key_id
+
+
+# Completion tokens reserved up front; the bucket is corrected from the
+# usage the API reports.
+EXPECTED_COMPLETION_TOKENS = 256
 
-    client = Groq(api_key=api_key)
 
-    prompt = f"""
+def build_prompt(context, question):
+    return f"""
 Answer only using the context below.
 If the answer is not present, respond with: "Not enough information in the provided context."
 
@@ -27,10 +24,84 @@ Question: {question}
 Answer:
 """
 
-    response = client.chat.completions.create(
+
+def ask_llm(context, question, api_key, model):
+    """Call Groq LLM to generate an answer.
+
+    The client comes from ``get_groq_client``, which imports Groq lazily
+    and raises a clear ModuleNotFoundError the caller (the app) can surface
+    when the `groq` package is missing. The request is paced and retried by
+    the ``"groq"`` rate limiter for ``model`` and ``api_key``; identical
+    prompts in flight at the same time under the same key share one
+    request.
+    """
+    client = get_groq_client(api_key, max_retries=0)
+    prompt = build_prompt(context, question)
+
+    with span("llm") as s:
+        response = get_limiter("groq", model, api_key).call(
+            client.chat.completions.create,
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            tokens=count_tokens(prompt) + EXPECTED_COMPLETION_TOKENS,
+            key=(key_id(api_key), model, prompt),
+            usage=lambda r: getattr(getattr(r, "usage", None), "total_tokens", None),
+        )
+        usage = getattr(response, "usage", None)
+        s.tokens = getattr(usage, "completion_tokens", None) or 0
+
+    return response.choices[0].message.content.strip()
+
+
+def stream_llm(context, question, api_key, model, metrics=None):
+    """Stream the answer from Groq, yielding text deltas as they arrive.
+
+    If a ``metrics`` dict is given it is filled with ``ttft`` (seconds to
+    the first token), ``total`` (seconds), ``tokens`` (completion tokens,
+    from the API usage report when available) and ``tokens_per_sec``
+    (generation rate after the first token).
+    """
+    metrics = metrics if metrics is not None else {}
+    client = get_groq_client(api_key, max_retries=0)
+    limiter = get_limiter("groq", model, api_key)
+    prompt = build_prompt(context, question)
+    estimate = count_tokens(prompt) + EXPECTED_COMPLETION_TOKENS
+    start = time.perf_counter()
+
+    stream = limiter.call(
+        client.chat.completions.create,
         model=model,
         messages=[{"role": "user", "content": prompt}],
-        temperature=0
+        temperature=0,
+        stream=True,
+        tokens=estimate,
     )
 
-    return response.choices[0].message.content.strip()
+    first = None
+    tokens = 0
+    usage = None
+    for chunk in stream:
+        x_groq = getattr(chunk, "x_groq", None)
+        if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+            usage = x_groq.usage
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if not delta:
+            continue
+        if first is None:
+            first = time.perf_counter()
+            metrics["ttft"] = first - start
+        tokens += 1
+        yield delta
+
+    end = time.perf_counter()
+    if usage is not None and getattr(usage, "completion_tokens", None):
+        tokens = usage.completion_tokens
+        limiter.settle(estimate, getattr(usage, "total_tokens", None))
+    metrics["total"] = end - start
+    metrics["tokens"] = tokens
+    metrics.setdefault("ttft", metrics["total"])
+    generating = end - first if first is not None else 0.0
+    metrics["tokens_per_sec"] = tokens / generating if generating > 0 else 0.0
+    observe("llm.ttft", metrics["ttft"])
+    observe("llm.stream", metrics["total"], tokens=tokens)
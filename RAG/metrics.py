@@ -0,0 +1,167 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Spans recorded while a ``trace()`` block is active in this context.
+_trace = contextvars.ContextVar("rag_trace", default=None)
+
+
+class _StageStats:
+    def __init__(self, window):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.items = 0
+        self.bytes = 0
+        self.tokens = 0
+        self.samples = deque(maxlen=window)
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms and item/byte/token counters.
+
+    Percentiles are computed over the last ``window`` samples of each
+    stage; counts and totals cover the whole process lifetime.
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def observe(self, stage, seconds, items=0, nbytes=0, tokens=0, error=False):
+        """Record one span; it is also appended to the active ``trace()``."""
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = _StageStats(self.window)
+            stats.count += 1
+            stats.errors += int(error)
+            stats.seconds += seconds
+            stats.items += items
+            stats.bytes += nbytes
+            stats.tokens += tokens
+            stats.samples.append(seconds)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append({"stage": stage, "seconds": seconds, "items": items, "bytes": nbytes,
+                          "tokens": tokens, "error": error})
+
+    def snapshot(self):
+        """Return one dict per stage with counts, total/mean and p50/p95/p99 seconds."""
+        with self._lock:
+            stages = [(name, stats, np.asarray(stats.samples, dtype=np.float64))
+                      for name, stats in sorted(self._stages.items())]
+        rows = []
+        for name, stats, samples in stages:
+            quantiles = np.quantile(samples, QUANTILES) if len(samples) else np.zeros(len(QUANTILES))
+            row = {"stage": name, "count": stats.count, "errors": stats.errors, "total": stats.seconds,
+                   "mean": stats.seconds / stats.count if stats.count else 0.0}
+            row.update({f"p{round(q * 100)}": float(v) for q, v in zip(QUANTILES, quantiles)})
+            row.update(items=stats.items, bytes=stats.bytes, tokens=stats.tokens)
+            rows.append(row)
+        return rows
+
+    def render_prometheus(self, prefix="rag"):
+        """Render all stages in the Prometheus text exposition format."""
+        rows = self.snapshot()
+        lines = [f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.",
+                 f"# TYPE {prefix}_stage_seconds summary"]
+        for row in rows:
+            label = f'stage="{row["stage"]}"'
+            for q in QUANTILES:
+                lines.append(f'{prefix}_stage_seconds{{{label},quantile="{q}"}} {row[f"p{round(q * 100)}"]:.6f}')
+            lines.append(f"{prefix}_stage_seconds_sum{{{label}}} {row['total']:.6f}")
+            lines.append(f"{prefix}_stage_seconds_count{{{label}}} {row['count']}")
+        for field, help_text in (("errors", "Spans that raised."), ("items", "Items processed."),
+                                 ("bytes", "Bytes processed."), ("tokens", "Tokens processed.")):
+            lines.append(f"# HELP {prefix}_stage_{field}_total {help_text}")
+            lines.append(f"# TYPE {prefix}_stage_{field}_total counter")
+            for row in rows:
+                lines.append(f'{prefix}_stage_{field}_total{{stage="{row["stage"]}"}} {row[field]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path, prefix="rag"):
+        """Write ``render_prometheus`` output to ``path`` (e.g. for node_exporter's textfile collector)."""
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus(prefix))
+        os.replace(tmp, path)
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Span:
+    """Mutable counters of an open span; set ``items``/``nbytes``/``tokens`` before it closes."""
+
+    __slots__ = ("stage", "items", "nbytes", "tokens")
+
+    def __init__(self, stage, items=0, nbytes=0, tokens=0):
+        self.stage = stage
+        self.items = items
+        self.nbytes = nbytes
+        self.tokens = tokens
+
+
+@contextmanager
+def span(stage, items=0, nbytes=0, tokens=0, registry=None):
+    """Time the block as ``stage`` and record it in ``registry`` (default ``REGISTRY``)."""
+    registry = registry if registry is not None else REGISTRY
+    s = Span(stage, items, nbytes, tokens)
+    error = False
+    start = time.perf_counter()
+    try:
+        yield s
+    except GeneratorExit:
+        # a consumer stopped iterating early; not a failure
+        raise
+    except BaseException:
+        error = True
+        raise
+    finally:
+        registry.observe(stage, time.perf_counter() - start, s.items, s.nbytes, s.tokens, error)
+
+
+def observe(stage, seconds, items=0, nbytes=0, tokens=0, error=False):
+    REGISTRY.observe(stage, seconds, items, nbytes, tokens, error)
+
+
+@contextmanager
+def trace():
+    """Collect the spans recorded in this context.
+
+    Yields the list the span dicts are appended to, so a request can show
+    where its own time went. Work handed to ``asyncio.to_thread`` inherits
+    the trace; plain thread pools do not.
+    """
+    spans = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        try:
+            _trace.reset(token)
+        except ValueError:
+            # closed from another context (e.g. an abandoned generator)
+            pass
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+def render_prometheus(prefix="rag"):
+    return REGISTRY.render_prometheus(prefix)
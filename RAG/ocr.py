@@ -1,9 +1,120 @@
-import easyocr
+import io
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
+from PIL import Image
 
-def extract_text_from_image(image_path):
-    reader = easyocr.Reader(["en"])
-    result = reader.readtext(image_path)
+from .lazy import LazyModule
+from .metrics import span
+
+
+easyocr = LazyModule("easyocr")
+
+
+def load_image(image, max_side=None):
+    """Return an RGB array for a path, raw bytes, PIL image or array.
+
+    When ``max_side`` is set, images larger than that on their longest side
+    are downscaled first, which cuts detection time roughly quadratically.
+    """
+    if isinstance(image, np.ndarray) and max_side is None:
+        return image
+    if isinstance(image, np.ndarray):
+        img = Image.fromarray(image)
+    elif isinstance(image, Image.Image):
+        img = image
+    elif isinstance(image, (bytes, bytearray)):
+        img = Image.open(io.BytesIO(image))
+    else:
+        img = Image.open(image)
+    img = img.convert("RGB")
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side))
+    return np.asarray(img)
+
+
+class OCREngine:
+    """EasyOCR reader loaded once and reused for every image.
+
+    Building ``easyocr.Reader`` loads the detection and recognition models,
+    which takes seconds; an engine pays that once (plus one ``warmup`` run)
+    and then only pays per-image inference.
+    """
+
+    def __init__(self, languages=("en",), gpu=False, max_side=1600):
+        self.languages = list(languages)
+        self.max_side = max_side
+        self.reader = easyocr.Reader(self.languages, gpu=gpu)
+        # the underlying torch models are not safe to share across threads
+        self._lock = threading.Lock()
+
+    def warmup(self):
+        self.read(np.full((64, 256, 3), 255, dtype=np.uint8))
+        return self
+
+    def read(self, image):
+        with span("ocr", items=1) as s:
+            pixels = load_image(image, self.max_side)
+            s.nbytes = pixels.nbytes
+            with self._lock:
+                result = self.reader.readtext(pixels)
+        return " ".join([t for (_, t, _) in result]).strip()
+
+    def read_batch(self, images):
+        """OCR several images; returns ``[{"text": ..., "seconds": ...}, ...]``."""
+        results = []
+        for image in images:
+            start = time.perf_counter()
+            text = self.read(image)
+            results.append({"text": text, "seconds": time.perf_counter() - start})
+        return results
+
+
+# Engine owned by each OCRPool worker process.
+_worker_engine = None
 
-    text = " ".join([t for (_, t, _) in result])
-    return text.strip()
+
+def _init_worker(languages, max_side):
+    global _worker_engine
+    _worker_engine = OCREngine(languages, gpu=False, max_side=max_side).warmup()
+
+
+def _read_in_worker(image):
+    return _worker_engine.read_batch([image])[0]
+
+
+class OCRPool:
+    """A pool of worker processes, each holding its own warmed-up OCREngine."""
+
+    def __init__(self, workers=None, languages=("en",), max_side=1600):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(list(languages), max_side))
+
+    def read_batch(self, images):
+        return list(self._pool.map(_read_in_worker, images))
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_ocr_engine(languages=("en",), gpu=False, max_side=1600):
+    """Return a process-wide, warmed-up engine for these settings."""
+    key = (tuple(languages), gpu, max_side)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = OCREngine(languages, gpu=gpu, max_side=max_side).warmup()
+            _engines[key] = engine
+    return engine
+
+
+def extract_text_from_image(image_path):
+    return get_ocr_engine().read(image_path)
@@ -0,0 +1,81 @@
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .lazy import LazyModule
+from .metrics import observe
+
+
+pypdf = LazyModule("pypdf")
+
+
+# One parsed document per worker process, set up by _init_worker.
+_reader = None
+
+
+def _init_worker(data):
+    global _reader
+    _reader = pypdf.PdfReader(io.BytesIO(data))
+
+
+def _extract_range(start, stop):
+    return [_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pdf_pages(data, workers=None, pages_per_task=4, stats=None):
+    """Yield the text of every page of a PDF, in page order.
+
+    ``data`` is the raw PDF bytes. Each page is extracted exactly once;
+    page ranges are spread over a process pool of ``workers`` processes
+    (default: CPU count) and yielded as soon as every earlier page is done,
+    so callers can chunk while later pages are still being parsed. Empty
+    pages yield ``""`` to keep page numbers aligned.
+
+    If a ``stats`` dict is given it is updated with ``pages``, ``seconds``
+    and ``pages_per_sec`` as pages are produced. The whole run is recorded
+    as a ``pdf.parse`` span once the last page has been yielded.
+    """
+    start_time = time.perf_counter()
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    n_pages = len(reader.pages)
+    workers = workers or os.cpu_count() or 1
+    stats = stats if stats is not None else {}
+    stats.update(pages=0, total_pages=n_pages, seconds=0.0, pages_per_sec=0.0)
+
+    def _record(count):
+        stats["pages"] += count
+        stats["seconds"] = time.perf_counter() - start_time
+        stats["pages_per_sec"] = stats["pages"] / max(stats["seconds"], 1e-9)
+
+    if workers <= 1 or n_pages <= pages_per_task:
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            _record(1)
+            yield text
+        observe("pdf.parse", stats["seconds"], items=n_pages, nbytes=len(data))
+        return
+    del reader
+
+    ranges = ((i, min(i + pages_per_task, n_pages)) for i in range(0, n_pages, pages_per_task))
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,))
+    pending = deque()
+
+    def _submit_next():
+        page_range = next(ranges, None)
+        if page_range is not None:
+            pending.append(pool.submit(_extract_range, *page_range))
+
+    try:
+        # keep a bounded number of ranges in flight so memory stays flat
+        for _ in range(workers * 2):
+            _submit_next()
+        while pending:
+            texts = pending.popleft().result()
+            _submit_next()
+            _record(len(texts))
+            yield from texts
+        observe("pdf.parse", stats["seconds"], items=n_pages, nbytes=len(data))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,367 @@
+import asyncio
+import codecs
+import contextvars
+import io
+import threading
+import time
+
+import numpy as np
+
+from .chunking import iter_batches, iter_chunks
+from .context import assemble_context, context_budget, DEFAULT_CONTEXT_TOKENS
+from .dedup import dedup_chunks, source_of
+from .embeddings import JINA_EMBEDDING_URL, JINA_MODEL
+from .llm import ask_llm
+from .metrics import observe
+from .pdf import iter_pdf_pages
+from .providers import JinaProvider, embed_texts
+from .reranker import hybrid_rerank
+
+
+def run(coro):
+    """Run a pipeline coroutine to completion from synchronous code.
+
+    Works from plain scripts and from Streamlit's script thread; if the
+    calling thread already runs an event loop, the coroutine is run on a
+    private loop in a helper thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    # carry the caller's context (e.g. request priority) into the helper thread
+    context = contextvars.copy_context()
+
+    def _target():
+        try:
+            result["value"] = context.run(asyncio.run, coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=_target)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def _open_pages(document, filename, pdf_workers, stats):
+    if filename.lower().endswith(".pdf"):
+        return iter_pdf_pages(document, workers=pdf_workers, stats=stats)
+    return codecs.getreader("utf-8")(io.BytesIO(document))
+
+
+def _first_error(group):
+    # surface the original failure rather than the TaskGroup wrapper
+    while isinstance(group, BaseExceptionGroup):
+        group = group.exceptions[0]
+    return group
+
+
+async def _describe_images(images, describe, embed, label, semaphore, timings):
+    # images are independent of the text path; failures are reported, not raised
+    start = time.perf_counter()
+
+    async def _one(image):
+        async with semaphore:
+            describe_start = time.perf_counter()
+            try:
+                text = await asyncio.to_thread(describe, image)
+            except Exception as e:
+                return None, None, e, time.perf_counter() - describe_start
+            seconds = time.perf_counter() - describe_start
+        if not text:
+            return None, None, None, seconds
+        text = label + text
+        async with semaphore:
+            return text, await asyncio.to_thread(embed, [text]), None, seconds
+
+    results = await asyncio.gather(*(_one(image) for image in images))
+    timings["images"] = time.perf_counter() - start
+    return results
+
+
+async def _embed_text(document, filename, embed, semaphore, timings, chunk_size, overlap,
+                      batch_size, pdf_workers, pdf_stats, dedup, exclude):
+    start = time.perf_counter()
+    pages = _open_pages(document, filename, pdf_workers, pdf_stats)
+    batches = iter_batches(iter_chunks(pages, chunk_size=chunk_size, overlap=overlap), batch_size)
+    local = dedup.spawn() if dedup is not None else None
+
+    async def _embed_batch(texts):
+        async with semaphore:
+            return await asyncio.to_thread(embed, texts)
+
+    # parsing/chunking runs in a worker thread one batch at a time while
+    # earlier batches are already being embedded
+    text_chunks = []
+    signatures = []
+    duplicates = []
+    tasks = []
+    parse_seconds = 0.0
+    dedup_seconds = 0.0
+    async with asyncio.TaskGroup() as tg:
+        while True:
+            parse_start = time.perf_counter()
+            batch = await asyncio.to_thread(next, batches, None)
+            parse_seconds += time.perf_counter() - parse_start
+            if batch is None:
+                break
+            if dedup is not None:
+                # near-duplicates of indexed or earlier chunks are never embedded
+                dedup_start = time.perf_counter()
+                batch, kept, dups = await asyncio.to_thread(
+                    dedup_chunks, batch, dedup, local, len(text_chunks), exclude)
+                dedup_seconds += time.perf_counter() - dedup_start
+                signatures.extend(kept)
+                duplicates.extend(dups)
+                if not batch:
+                    continue
+            text_chunks.extend(batch)
+            tasks.append(tg.create_task(_embed_batch([c["text"] for c in batch])))
+
+    timings["parse"] = parse_seconds
+    if dedup is not None:
+        timings["dedup"] = dedup_seconds
+        observe("dedup", dedup_seconds, items=len(duplicates))
+    timings["text"] = time.perf_counter() - start
+    vectors = [t.result() for t in tasks]
+    return text_chunks, vectors, signatures, duplicates
+
+
+async def embed_document(document, filename, jina_key, images=(), describe=None,
+                         image_label="Image description: ", embedding_cache=None, model=JINA_MODEL,
+                         url=JINA_EMBEDDING_URL, concurrency=4, chunk_size=400, overlap=80,
+                         batch_size=64, pdf_workers=None, provider=None, dedup=None, exclude=()):
+    """Parse, chunk and embed one document and its images without indexing.
+
+    ``document`` is the raw file bytes (PDF if ``filename`` ends in .pdf,
+    UTF-8 text otherwise). Text parsing, embedding batches and the image
+    calls (``describe(image_bytes) -> str``, e.g. a vision or OCR wrapper)
+    all run concurrently with at most ``concurrency`` blocking calls in
+    flight, so wall-clock time approaches the slowest stage. If any text
+    stage fails, the remaining stages are cancelled and the error is
+    raised; image failures are returned in ``errors`` instead.
+
+    Vectors come from ``provider`` (an ``EmbeddingProvider``), by default
+    the Jina API with ``jina_key``/``model``/``url``.
+
+    With a ``dedup.Deduplicator`` of the indexed text chunks, text chunks
+    that nearly repeat an indexed chunk (other than the ids in
+    ``exclude``, normally the previous version of this document) or an
+    earlier chunk of this document are not embedded; they are returned in
+    ``duplicates`` for ``index_document`` to record on the chunk they
+    repeat.
+
+    Returns a dict with ``chunks``, ``metadata``, ``embeddings``,
+    ``signatures`` (``{position: MinHash}`` of the unique text chunks),
+    ``duplicates``, ``errors``, per-stage ``timings`` in seconds, ``pdf``
+    (the ``iter_pdf_pages`` stats with pages/sec, None for text files) and
+    ``image_seconds`` (time spent describing each image, in input order).
+    """
+    start = time.perf_counter()
+    timings = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    pdf_stats = {}
+    provider = provider if provider is not None else JinaProvider(jina_key, model=model, url=url)
+
+    def embed(texts):
+        return embed_texts(texts, provider, embedding_cache)
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            text_task = tg.create_task(_embed_text(document, filename, embed, semaphore, timings,
+                                                   chunk_size, overlap, batch_size, pdf_workers,
+                                                   pdf_stats, dedup, exclude))
+            image_task = None
+            if images and describe is not None:
+                image_task = tg.create_task(_describe_images(list(images), describe, embed, image_label,
+                                                             semaphore, timings))
+    except BaseExceptionGroup as group:
+        raise _first_error(group) from group
+
+    text_chunks, text_vectors, text_signatures, duplicates = text_task.result()
+    chunks = []
+    metadata = []
+    vectors = []
+    errors = []
+    image_seconds = []
+    if image_task is not None:
+        for text, vector, error, seconds in image_task.result():
+            image_seconds.append(seconds)
+            if error is not None:
+                errors.append(error)
+            elif text:
+                chunks.append(text)
+                metadata.append({"type": "image", "text": text})
+                vectors.append(vector)
+    vectors.extend(text_vectors)
+    # positions of text chunks follow the image chunks
+    offset = len(chunks)
+    signatures = {offset + i: signature for i, signature in enumerate(text_signatures)}
+    for dup in duplicates:
+        kind, target = dup["of"]
+        if kind == "local":
+            dup["of"] = (kind, offset + target)
+    for c in text_chunks:
+        chunks.append(c["text"])
+        metadata.append({"type": "text", **c})
+
+    if not chunks and not duplicates:
+        raise ValueError("No text could be extracted from the document.")
+
+    timings["embed_total"] = time.perf_counter() - start
+    embeddings = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype="float32")
+    return {"chunks": chunks, "metadata": metadata, "embeddings": embeddings, "signatures": signatures,
+            "duplicates": duplicates, "errors": errors, "timings": timings, "pdf": pdf_stats or None,
+            "image_seconds": image_seconds}
+
+
+def index_document(filename, prepared, retriever, bm25=None, dedup=None, embed=None):
+    """Add the output of ``embed_document`` to ``retriever`` (and ``bm25``).
+
+    Duplicates are recorded on the chunk they repeat and the new unique
+    chunks are added to ``dedup``. A duplicate whose chunk was removed
+    since ``embed_document`` ran is embedded with ``embed(texts)`` and
+    indexed after all.
+    """
+    start = time.perf_counter()
+    previous = retriever.metadata.doc_ids(filename)
+    ids = retriever.add_document(filename, prepared["embeddings"], prepared["metadata"])
+    # chunks shared with other documents survive the replacement
+    removed = previous[~np.isin(previous, retriever.metadata.ids())]
+    if bm25 is not None:
+        bm25.remove(removed)
+        bm25.add(ids, prepared["chunks"])
+    if dedup is not None:
+        dedup.remove(removed.tolist())
+        for position, signature in prepared["signatures"].items():
+            dedup.add(int(ids[position]), signature)
+
+    references = {}
+    orphans = []
+    for dup in prepared["duplicates"]:
+        kind, target = dup["of"]
+        chunk_id = int(ids[target]) if kind == "local" else target
+        if chunk_id in retriever.metadata:
+            references.setdefault(chunk_id, []).append(source_of(dict(dup["source"], doc_id=filename)))
+        else:
+            orphans.append(dup["source"])
+    retriever.add_duplicates(references)
+    if orphans:
+        texts = [c["text"] for c in orphans]
+        orphan_ids = retriever.add(embed(texts), [{"type": "text", **c} for c in orphans], doc_id=filename)
+        if bm25 is not None:
+            bm25.add(orphan_ids, texts)
+        ids = np.concatenate([ids, orphan_ids])
+    prepared["timings"]["index"] = time.perf_counter() - start
+    return ids
+
+
+async def ingest(document, filename, retriever, jina_key, bm25=None, dedup=None, **kwargs):
+    """Embed a document with ``embed_document`` and add it to the index.
+
+    Keyword arguments are passed to ``embed_document``; with a ``dedup``
+    index near-duplicate chunks are skipped. Returns a dict with ``ids``,
+    ``chunks``, ``duplicates`` (chunks not embedded), ``errors``,
+    per-stage ``timings`` in seconds, ``pdf`` parse stats and
+    ``image_seconds``.
+    """
+    start = time.perf_counter()
+    exclude = set(retriever.metadata.doc_ids(filename).tolist())
+    prepared = await embed_document(document, filename, jina_key, dedup=dedup, exclude=exclude, **kwargs)
+    provider = kwargs.get("provider") or JinaProvider(jina_key, model=kwargs.get("model", JINA_MODEL),
+                                                      url=kwargs.get("url", JINA_EMBEDDING_URL))
+    ids = index_document(filename, prepared, retriever, bm25, dedup,
+                         lambda texts: embed_texts(texts, provider, kwargs.get("embedding_cache")))
+    prepared["timings"]["total"] = time.perf_counter() - start
+    return {"ids": ids, "chunks": prepared["chunks"], "duplicates": len(prepared["duplicates"]),
+            "errors": prepared["errors"], "timings": prepared["timings"], "pdf": prepared["pdf"],
+            "image_seconds": prepared["image_seconds"]}
+
+
+def retrieve(question, query_emb, retriever, bm25=None, filter_type=None, top_k=20,
+             budget_tokens=DEFAULT_CONTEXT_TOKENS):
+    """Search, rerank and pack the prompt context for an embedded question.
+
+    Returns ``(context, ranked)`` where ``ranked`` is the fused candidate
+    list from ``hybrid_rerank`` (dense order only without ``bm25``).
+    """
+    ids, distances = retriever.search(query_emb, top_k=top_k, filter_type=filter_type, return_scores=True)
+    return _rank_and_pack(question, ids, distances, retriever, bm25, budget_tokens)
+
+
+def retrieve_batch(questions, query_embs, retriever, bm25=None, filter_type=None, top_k=20,
+                   budget_tokens=DEFAULT_CONTEXT_TOKENS):
+    """Like ``retrieve`` for many questions, with one FAISS search over all rows.
+
+    Returns a list of ``(context, ranked)`` in question order.
+    """
+    ids, distances = retriever.search_batch(query_embs, top_k, filter_type)
+    results = []
+    for question, row_ids, row_distances in zip(questions, ids, distances):
+        keep = row_ids >= 0
+        results.append(_rank_and_pack(question, row_ids[keep].tolist(), row_distances[keep].tolist(),
+                                      retriever, bm25, budget_tokens))
+    return results
+
+
+def _rank_and_pack(question, ids, distances, retriever, bm25, budget_tokens):
+    if bm25 is not None:
+        ranked = hybrid_rerank(question, ids, distances, bm25)
+    else:
+        ranked = [{"id": i, "score": -d, "distance": d, "bm25": 0.0} for i, d in zip(ids, distances)]
+    candidates = [dict(retriever.metadata[r["id"]], id=r["id"], score=r["score"]) for r in ranked]
+    context, _ = assemble_context(candidates, budget_tokens=budget_tokens)
+    return context, ranked
+
+
+async def query(question, retriever, jina_key, groq_key, model, bm25=None, filter_type=None,
+                answer_cache=None, embedding_cache=None, top_k=20,
+                budget_tokens=None, embedding_model=JINA_MODEL,
+                url=JINA_EMBEDDING_URL, provider=None):
+    """Answer ``question`` against the indexed corpus.
+
+    Runs answer-cache lookup, query embedding, filtered FAISS search,
+    hybrid rerank, context assembly and the LLM call, with blocking steps
+    off the event loop so many queries can be awaited concurrently.
+    Returns a dict with ``answer``, ``context``, ``ranked``, ``cached`` and
+    per-stage ``timings``. ``budget_tokens`` defaults to ``context_budget(model)``.
+    """
+    start = time.perf_counter()
+    timings = {}
+    scope = (retriever.version, filter_type, model)
+    if budget_tokens is None:
+        budget_tokens = context_budget(model)
+    if provider is None:
+        provider = JinaProvider(jina_key, model=embedding_model, url=url)
+
+    cached = answer_cache.lookup(scope, question) if answer_cache is not None else None
+    if cached is None:
+        query_emb = await asyncio.to_thread(embed_texts, [question], provider, embedding_cache)
+        timings["embed"] = time.perf_counter() - start
+        if answer_cache is not None:
+            cached = answer_cache.lookup(scope, question, query_emb[0])
+
+    if cached is not None:
+        timings["total"] = time.perf_counter() - start
+        return {"answer": cached["answer"], "context": cached["context"], "ranked": cached["ranked"],
+                "cached": True, "timings": timings}
+
+    search_start = time.perf_counter()
+    context, ranked = retrieve(question, query_emb, retriever, bm25, filter_type, top_k, budget_tokens)
+    timings["retrieve"] = time.perf_counter() - search_start
+
+    llm_start = time.perf_counter()
+    answer = await asyncio.to_thread(ask_llm, context, question, groq_key, model)
+    timings["llm"] = time.perf_counter() - llm_start
+    timings["total"] = time.perf_counter() - start
+
+    if answer_cache is not None:
+        answer_cache.put(scope, question, answer, query_emb[0], seconds=timings["total"],
+                         context=context, ranked=ranked)
+    return {"answer": answer, "context": context, "ranked": ranked, "cached": False, "timings": timings}
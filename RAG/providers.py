@@ -0,0 +1,215 @@
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from .embedding_cache import cached_embeddings
+from .embeddings import JINA_EMBEDDING_URL, JINA_MODEL, get_jina_client
+from .metrics import span
+from .reranker import tokenize
+
+
+PROVIDERS = ("jina", "hashing", "onnx")
+
+
+class EmbeddingProvider:
+    """Turns texts into float32 vectors.
+
+    ``name`` identifies the embedding space: vectors from providers with
+    different names must not share an index or cache. ``remote`` tells
+    callers whether an API key and network access are needed.
+    """
+
+    name = None
+    remote = False
+
+    def embed(self, texts):
+        """Return a ``(len(texts), dim)`` float32 array in input order."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JinaProvider(EmbeddingProvider):
+    """The Jina embeddings API through the shared, pooled client."""
+
+    remote = True
+
+    def __init__(self, api_key, model=JINA_MODEL, url=JINA_EMBEDDING_URL):
+        self.name = model
+        self._client = get_jina_client(api_key, model=model, url=url)
+
+    def embed(self, texts):
+        return self._client.embed(texts)
+
+
+# token -> CRC32 per process, so repeated words skip hashing; the column
+# and sign are derived per call, as providers may differ in ``dim``
+_feature_cache = {}
+
+
+def _hash_batch(texts, dim, bigrams):
+    hashes = []
+    lengths = []
+    for text in texts:
+        tokens = tokenize(text)
+        if bigrams:
+            tokens = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+        for token in tokens:
+            h = _feature_cache.get(token)
+            if h is None:
+                if len(_feature_cache) > 1_000_000:
+                    _feature_cache.clear()
+                h = _feature_cache[token] = zlib.crc32(token.encode("utf-8"))
+            hashes.append(h)
+        lengths.append(len(tokens))
+
+    hashes = np.asarray(hashes, dtype=np.int64)
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    rows = np.repeat(np.arange(len(texts)), lengths)
+    np.add.at(out, (rows, hashes % dim), signs)
+    # sublinear term frequency, then unit length
+    np.copyto(out, np.sign(out) * np.log1p(np.abs(out)))
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return out / np.maximum(norms, 1e-12)
+
+
+class HashingProvider(EmbeddingProvider):
+    """Local, dependency-free embeddings by signed feature hashing.
+
+    Unigrams (and bigrams) are hashed into ``dim`` buckets with sublinear
+    term frequency and L2 normalisation. The mapping is fixed, so vectors
+    never need re-embedding as the corpus grows, and a query embeds in well
+    under a millisecond. Inputs larger than ``parallel_threshold`` are
+    split into ``batch_size`` batches over a pool of ``workers`` processes.
+    """
+
+    def __init__(self, dim=768, bigrams=True, workers=None, batch_size=256, parallel_threshold=2048):
+        self.dim = dim
+        self.bigrams = bigrams
+        self.name = f"hashing-{dim}{'-bigrams' if bigrams else ''}"
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.parallel_threshold = parallel_threshold
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def embed(self, texts):
+        texts = list(texts)
+        with span("embed.local", items=len(texts)):
+            if len(texts) < self.parallel_threshold or self.workers <= 1:
+                return _hash_batch(texts, self.dim, self.bigrams)
+            batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            results = self._executor().map(_hash_batch, batches, [self.dim] * len(batches),
+                                           [self.bigrams] * len(batches))
+            return np.vstack(list(results))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class OnnxProvider(EmbeddingProvider):
+    """A sentence-embedding model exported to ONNX, run on the CPU.
+
+    ``model_path`` is a directory holding ``model.onnx`` and the Hugging Face
+    ``tokenizer.json`` (e.g. an ``optimum`` export of a MiniLM/BGE model).
+    Token embeddings are mean-pooled over the attention mask and L2
+    normalised. Batches of ``batch_size`` run concurrently on ``workers``
+    threads (ONNX Runtime releases the GIL). Requires ``onnxruntime`` and
+    ``tokenizers``, imported only when this provider is used.
+    """
+
+    def __init__(self, model_path, batch_size=32, workers=None, max_length=512, threads_per_worker=1):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ModuleNotFoundError as e:
+            raise ModuleNotFoundError(
+                "The 'onnx' embedding provider needs onnxruntime and tokenizers. "
+                "Install them with: pip install onnxruntime tokenizers"
+            ) from e
+
+        self.name = "onnx-" + os.path.basename(os.path.normpath(model_path))
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads_per_worker
+        self.session = onnxruntime.InferenceSession(os.path.join(model_path, "model.onnx"), options,
+                                                    providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                            thread_name_prefix="onnx")
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return (pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+
+    def embed(self, texts):
+        texts = list(texts)
+        with span("embed.local", items=len(texts)):
+            batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            if len(batches) == 1:
+                return self._embed_batch(batches[0])
+            return np.vstack(list(self._executor.map(self._embed_batch, batches)))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_local_providers = {}
+_local_lock = threading.Lock()
+
+
+def get_embedding_provider(kind="jina", api_key=None, model=JINA_MODEL, url=JINA_EMBEDDING_URL,
+                           dim=768, model_path=None, workers=None):
+    """Return the provider for ``kind`` (one of ``PROVIDERS``).
+
+    Local providers are created once per process and shared; Jina providers
+    are cheap wrappers over the shared client for ``api_key``.
+    """
+    if kind == "jina":
+        return JinaProvider(api_key, model=model, url=url)
+    if kind not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider {kind!r}; expected one of {PROVIDERS}")
+    if kind == "onnx" and not model_path:
+        raise ValueError("The 'onnx' embedding provider needs a model_path")
+
+    key = (kind, dim, model_path, workers)
+    with _local_lock:
+        provider = _local_providers.get(key)
+        if provider is None:
+            if kind == "hashing":
+                provider = HashingProvider(dim=dim, workers=workers)
+            else:
+                provider = OnnxProvider(model_path, workers=workers)
+            _local_providers[key] = provider
+    return provider
+
+
+def embed_texts(texts, provider, cache=None):
+    """Embed ``texts`` with ``provider``; with an ``EmbeddingCache`` only misses are computed."""
+    if cache is None:
+        return provider.embed(texts)
+    return cached_embeddings(texts, provider.embed, cache)
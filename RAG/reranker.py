@@ -1,9 +1,162 @@
-def simple_rerank(query, docs):
-    scored = []
+import re
+
+import numpy as np
+
+from .metrics import span
+
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index over chunk texts scored with Okapi BM25.
+
+    Documents are tokenized once when added. Postings are compacted into
+    CSR-style NumPy arrays holding precomputed per-posting BM25 weights, so
+    scoring a query is one gather-and-add per query term.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self._docs = {}
+        self._dirty = True
+
+    def __len__(self):
+        return len(self._docs)
+
+    @classmethod
+    def from_metadata(cls, metadata, **kwargs):
+        """Build an index from a retriever's ``{id: {"text": ...}}`` metadata."""
+        index = cls(**kwargs)
+        items = [(i, meta["text"]) for i, meta in metadata.items() if "text" in meta]
+        index.add([i for i, _ in items], [t for _, t in items])
+        return index
+
+    def add(self, ids, texts):
+        with span("bm25.add") as s:
+            for doc_id, text in zip(ids, texts):
+                terms = [self.vocab.setdefault(t, len(self.vocab)) for t in tokenize(text)]
+                term_ids, tf = np.unique(np.asarray(terms, dtype=np.int64), return_counts=True)
+                self._docs[int(doc_id)] = (term_ids, tf.astype(np.float32), len(terms))
+                s.items += 1
+                s.tokens += len(terms)
+        self._dirty = True
+
+    def remove(self, ids):
+        for doc_id in ids:
+            self._docs.pop(int(doc_id), None)
+        self._dirty = True
 
-    for doc in docs:
-        score = sum(1 for w in query.lower().split() if w in doc.lower())
-        scored.append((score, doc))
+    def refresh(self):
+        """Rebuild the compact postings now rather than on the next query."""
+        if self._dirty:
+            self._compact()
 
-    scored.sort(reverse=True, key=lambda x: x[0])
-    return [d for _, d in scored]
+    def _compact(self):
+        doc_ids = np.fromiter(self._docs.keys(), dtype=np.int64, count=len(self._docs))
+        order = np.argsort(doc_ids)
+        self._doc_ids = doc_ids[order]
+        docs = [self._docs[i] for i in self._doc_ids.tolist()]
+
+        lengths = np.array([n for _, _, n in docs], dtype=np.float32)
+        counts = np.array([len(t) for t, _, _ in docs], dtype=np.int64)
+        if len(docs):
+            terms = np.concatenate([t for t, _, _ in docs])
+            tf = np.concatenate([f for _, f, _ in docs])
+        else:
+            terms = np.zeros(0, dtype=np.int64)
+            tf = np.zeros(0, dtype=np.float32)
+        rows = np.repeat(np.arange(len(docs), dtype=np.int64), counts)
+
+        by_term = np.argsort(terms, kind="stable")
+        terms, tf, rows = terms[by_term], tf[by_term], rows[by_term]
+        df = np.bincount(terms, minlength=len(self.vocab)).astype(np.float32)
+        self._indptr = np.concatenate([[0], np.cumsum(df, dtype=np.int64)])
+        self._rows = rows
+
+        n = max(1, len(docs))
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        avg = lengths.mean() if len(docs) else 1.0
+        norm = self.k1 * (1 - self.b + self.b * lengths[rows] / max(avg, 1e-9))
+        self._weights = (idf[terms] * tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+        self._dirty = False
+
+    def scores(self, query, ids=None):
+        """BM25 score of ``query`` for every indexed chunk, or only for ``ids``."""
+        self.refresh()
+        scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            start, end = self._indptr[t], self._indptr[t + 1]
+            scores[self._rows[start:end]] += self._weights[start:end]
+        if ids is None:
+            return scores
+
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.zeros(len(ids), dtype=np.float32)
+        if len(self._doc_ids):
+            pos = np.minimum(np.searchsorted(self._doc_ids, ids), len(self._doc_ids) - 1)
+            found = self._doc_ids[pos] == ids
+            out[found] = scores[pos[found]]
+        return out
+
+    def top_k(self, query, k=10):
+        """Return ``(ids, scores)`` of the ``k`` best lexical matches."""
+        scores = self.scores(query)
+        k = min(k, int((scores > 0).sum()))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return self._doc_ids[best], scores[best]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked id lists into ``{id: score}`` with RRF."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return fused
+
+
+def hybrid_rerank(query, ids, distances, bm25, rrf_k=60):
+    """Rerank dense candidates by fusing FAISS and BM25 rankings.
+
+    ``ids``/``distances`` come from ``FAISSRetriever.search``. Returns a list
+    of dicts sorted by fused score, each with the ``id``, ``score`` and the
+    ``distance``/``bm25`` values that produced it, for debugging.
+    """
+    ids = [int(i) for i in ids]
+    if not ids:
+        return []
+    with span("rerank", items=len(ids)):
+        lexical = bm25.scores(query, ids)
+        dense_ranking = [ids[i] for i in np.argsort(distances, kind="stable")]
+        lexical_ranking = [ids[i] for i in np.argsort(-lexical, kind="stable") if lexical[i] > 0]
+        fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking], k=rrf_k)
+
+        results = [
+            {"id": i, "score": fused[i], "distance": float(d), "bm25": float(s)}
+            for i, d, s in zip(ids, distances, lexical)
+        ]
+        results.sort(key=lambda r: r["score"], reverse=True)
+    return results
+
+
+def simple_rerank(query, docs):
+    """Order ``docs`` by BM25 relevance to ``query`` (whole-word matches only)."""
+    if not docs:
+        return []
+    index = BM25Index()
+    index.add(range(len(docs)), docs)
+    scores = index.scores(query)
+    return [docs[i] for i in np.argsort(-scores, kind="stable")]
@@ -1,22 +1,614 @@
-import faiss
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from .corpus_store import ChunkStore
+from .lazy import LazyModule
+from .metrics import span
+
+
+faiss = LazyModule("faiss", "faiss-cpu")
+
+
+INDEX_FILE = "index.faiss"
+METADATA_FILE = "metadata.json"
+
+INDEX_KINDS = ("flat", "ivf_flat", "hnsw", "ivf_pq", "fp16", "sq8", "ivf_sq8")
+
+# Corpus sizes at which the automatic policy moves off exact search, and
+# beyond which HNSW graphs get too expensive to build.
+FLAT_MAX_VECTORS = 20_000
+HNSW_MAX_VECTORS = 2_000_000
+HNSW_M = 32
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+
+# Kinds that learn centroids or value ranges from the vectors they are
+# built with; they are retrained once the corpus is this many times larger.
+TRAINED_KINDS = ("sq8", "ivf_flat", "ivf_sq8", "ivf_pq")
+RETRAIN_FACTOR = 4
+
+# Kinds whose stored codes only approximate the vectors; the chunk store
+# keeps the originals so rebuilds do not lose quality.
+LOSSY_KINDS = ("fp16", "sq8", "ivf_sq8", "ivf_pq")
+
+# HNSW graphs cannot delete; removed ids are skipped at search time until
+# they make up this fraction of the graph, then it is rebuilt.
+HNSW_REBUILD_FRACTION = 0.25
+
+
+# Training points faiss wants per k-means centroid. IVF needs one centroid
+# per list and IVF-PQ 2**8 per sub-quantizer, so smaller corpora are built
+# with a kind they can train (see ``trainable_kind``).
+MIN_POINTS_PER_CENTROID = 39
+PQ_BITS = 8
+IVF_PQ_MIN_TRAIN = MIN_POINTS_PER_CENTROID * 2 ** PQ_BITS
+
+
+def _default_nlist(n_vectors):
+    # ~4*sqrt(n) lists, but keep at least 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def trainable_kind(kind, n_vectors):
+    """``kind``, or the closest kind that ``n_vectors`` training vectors can train.
+
+    IVF-PQ falls back to IVF-Flat below ``IVF_PQ_MIN_TRAIN`` vectors and
+    the IVF kinds to flat below one list's worth of points.
+    """
+    if kind == "ivf_pq" and n_vectors < IVF_PQ_MIN_TRAIN:
+        kind = "ivf_flat"
+    if kind in ("ivf_flat", "ivf_sq8") and n_vectors < MIN_POINTS_PER_CENTROID:
+        kind = "flat"
+    return kind
+
+
+def _pq_subquantizers(dim):
+    target = max(1, min(64, dim // 4))
+    return max(m for m in range(1, target + 1) if dim % m == 0)
+
+
+def estimate_index_bytes(kind, n_vectors, dim):
+    """Rough resident size in bytes of an index of ``kind``."""
+    ids = n_vectors * 8
+    flat = n_vectors * dim * 4
+    nlist = _default_nlist(n_vectors)
+    if kind == "flat":
+        return flat + ids
+    if kind == "hnsw":
+        return flat + ids + n_vectors * HNSW_M * 2 * 4
+    if kind == "ivf_flat":
+        return flat + ids + nlist * dim * 4
+    if kind == "fp16":
+        return flat // 2 + ids
+    if kind == "sq8":
+        return flat // 4 + ids + 2 * dim * 4
+    if kind == "ivf_sq8":
+        return flat // 4 + ids + nlist * dim * 4 + 2 * dim * 4
+    if kind == "ivf_pq":
+        return n_vectors * _pq_subquantizers(dim) + ids + nlist * dim * 4 + 256 * dim * 4
+    raise ValueError(f"Unknown index kind {kind!r}; expected one of {INDEX_KINDS}")
+
+
+def choose_index_kind(n_vectors, dim, memory_budget=None):
+    """Pick an index backend for ``n_vectors`` vectors of dimension ``dim``.
+
+    Small corpora stay exact, falling back to float16 and then int8 codes
+    when float32 does not fit in ``memory_budget`` bytes. Larger ones use
+    HNSW while it fits, then IVF-Flat, IVF with int8 codes, and finally
+    compressed IVF-PQ. The result is always a kind ``n_vectors`` can train.
+    """
+    budget = float("inf") if memory_budget is None else memory_budget
+    if n_vectors < FLAT_MAX_VECTORS:
+        for kind in ("flat", "fp16"):
+            if estimate_index_bytes(kind, n_vectors, dim) <= budget:
+                return kind
+        return "sq8"
+    if n_vectors <= HNSW_MAX_VECTORS and estimate_index_bytes("hnsw", n_vectors, dim) <= budget:
+        return "hnsw"
+    for kind in ("ivf_flat", "ivf_sq8"):
+        if estimate_index_bytes(kind, n_vectors, dim) <= budget:
+            return trainable_kind(kind, n_vectors)
+    return trainable_kind("ivf_pq", n_vectors)
+
+
+def build_index(kind, dim, train_vectors=None):
+    """Create an empty, trained index of ``kind`` that accepts explicit ids.
+
+    IVF kinds are trained on ``train_vectors`` and keep a hashtable direct
+    map so vectors can be reconstructed and removed by id. Flat, HNSW and
+    the scalar-quantizer kinds are wrapped in ``IndexIDMap2``; ``sq8``
+    learns its per-dimension ranges from ``train_vectors``, so values added
+    later outside that range are clipped until the next ``rebuild``.
+    Raises ValueError when there are too few training vectors for ``kind``.
+    """
+    if kind == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efSearch = DEFAULT_EF_SEARCH
+        return faiss.IndexIDMap2(index)
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind {kind!r}; expected one of {INDEX_KINDS}")
+    if kind == "fp16":
+        return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16))
+    if train_vectors is None or len(train_vectors) == 0:
+        raise ValueError(f"Index kind {kind!r} needs training vectors")
+
+    train_vectors = np.ascontiguousarray(train_vectors, dtype="float32")
+    if kind == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+        index.train(train_vectors)
+        return faiss.IndexIDMap2(index)
+
+    n = len(train_vectors)
+    if trainable_kind(kind, n) != kind:
+        raise ValueError(f"Index kind {kind!r} needs more than {n} training vectors")
+    quantizer = faiss.IndexFlatL2(dim)
+    if kind == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, _default_nlist(n))
+    elif kind == "ivf_sq8":
+        index = faiss.IndexIVFScalarQuantizer(quantizer, dim, _default_nlist(n), faiss.ScalarQuantizer.QT_8bit)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, _default_nlist(n), _pq_subquantizers(dim), PQ_BITS)
+    index.train(train_vectors)
+    index.nprobe = min(index.nlist, DEFAULT_NPROBE)
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
 
 
 class FAISSRetriever:
-    def __init__(self, embeddings, metadata):
-        self.index = faiss.IndexFlatL2(embeddings.shape[1])
-        self.index.add(embeddings)
-        self.metadata = metadata
+    """FAISS index over chunk embeddings with stable integer ids.
+
+    Vectors keep their ids across deletions and reloads. ``metadata`` is a
+    ``ChunkStore`` mapping each id to its metadata dict; chunks added
+    through ``add_document`` also record their ``doc_id`` so a whole
+    document can be removed without rebuilding the index.
+
+    ``version`` increases on every change to the corpus so callers can
+    invalidate anything derived from it.
+
+    ``kind`` selects the backend (see ``INDEX_KINDS``); ``"auto"`` picks one
+    from the size of the first batch with ``choose_index_kind`` and lets
+    ``auto_tune`` switch as the corpus grows, while an explicit kind is
+    kept. A kind the corpus is too small to train is built as the nearest
+    one it can (see ``trainable_kind``) until ``auto_tune`` finds enough
+    vectors. ``nprobe`` (IVF) and ``ef_search`` (HNSW) trade recall for
+    latency.
+    """
+
+    def __init__(self, embeddings=None, metadata=None, dim=None, kind="flat",
+                 memory_budget=None, nprobe=None, ef_search=None):
+        self.index = None
+        self.dim = dim
+        self.kind = kind
+        self.auto = kind == "auto"
+        # the explicit kind asked for; ``kind`` is what was built
+        self.requested_kind = kind
+        self.trained_size = 0
+        self.memory_budget = memory_budget
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.metadata = ChunkStore()
+        self.next_id = 0
+        self.version = 0
+        self._path = None
+        self._mmapped = False
+        # searches fill the selector cache concurrently under a shared lock
+        self._selectors = {}
+        self._selectors_lock = threading.Lock()
+        # ids still in the HNSW graph whose chunks were removed
+        self._deleted = np.zeros(0, dtype="int64")
+
+        if dim is not None and kind in ("flat", "hnsw", "fp16"):
+            self.index = build_index(kind, dim)
+            self._apply_search_params()
+        if embeddings is not None:
+            self.add(embeddings, metadata)
+
+    def __len__(self):
+        return 0 if self.index is None else self.index.ntotal - len(self._deleted)
+
+    @property
+    def documents(self):
+        """``{doc_id: ids}`` of every stored document, including chunks it shares as a duplicate."""
+        documents = self.metadata.documents()
+        for chunk_id, sources in self.metadata.extras("duplicates"):
+            for doc_id in {s.get("doc_id") for s in sources} - {None}:
+                ids = documents.get(doc_id, np.zeros(0, dtype="int64"))
+                if chunk_id not in ids:
+                    documents[doc_id] = np.append(ids, chunk_id)
+        return documents
 
-    def search(self, query_embedding, top_k=5, filter_type=None):
-        _, indices = self.index.search(query_embedding, top_k)
+    def _ensure_writable(self):
+        # memory-mapped indexes are read-only views; load a private copy
+        # before the first mutation
+        if self._mmapped:
+            self.index = faiss.read_index(os.path.join(self._path, INDEX_FILE))
+            self._mmapped = False
+            self._apply_search_params()
 
-        results = []
-        for idx in indices[0]:
-            meta = self.metadata[idx]
+    def _base_index(self):
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return faiss.downcast_index(self.index.index)
+        return self.index
 
-            if filter_type and meta["type"] != filter_type:
-                continue
+    def set_search_params(self, nprobe=None, ef_search=None):
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        self._apply_search_params()
 
-            results.append(idx)
+    def _apply_search_params(self):
+        if self.index is None:
+            return
+        base = self._base_index()
+        if self.nprobe is not None and isinstance(base, faiss.IndexIVF):
+            base.nprobe = self.nprobe
+        if self.ef_search is not None and isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efSearch = self.ef_search
 
+    def add(self, embeddings, metadata, doc_id=None):
+        """Add vectors with their metadata and return the assigned ids."""
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if len(embeddings) != len(metadata):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(metadata)} metadata entries")
+        if self.index is None:
+            self.dim = embeddings.shape[1]
+            if self.kind == "auto":
+                self.kind = choose_index_kind(len(embeddings), self.dim, self.memory_budget)
+            self.kind = trainable_kind(self.kind, len(embeddings))
+            with span("index.build", items=len(embeddings), nbytes=embeddings.nbytes):
+                self.index = build_index(self.kind, self.dim, embeddings)
+            self.trained_size = len(embeddings)
+            self._apply_search_params()
+        self._ensure_writable()
+
+        ids = np.arange(self.next_id, self.next_id + len(embeddings), dtype="int64")
+        with span("index.add", items=len(embeddings), nbytes=embeddings.nbytes):
+            self.index.add_with_ids(embeddings, ids)
+        self.next_id += len(embeddings)
+        self.version += 1
+        self._clear_selectors()
+
+        if doc_id is not None:
+            metadata = [dict(meta, doc_id=doc_id) for meta in metadata]
+        keep = self.kind in LOSSY_KINDS
+        if keep and not self.metadata.has_vectors and len(self.metadata):
+            # an index saved before originals were kept: the codes are the best left
+            self.metadata.set_vectors(self.reconstruct(self.metadata.ids()))
+        self.metadata.extend(ids, metadata, vectors=embeddings if keep else None)
+        return ids
+
+    def add_document(self, doc_id, embeddings, metadata):
+        """Add (or replace) all chunks of one document."""
+        self.remove_document(doc_id)
+        if not len(metadata):
+            return np.zeros(0, dtype="int64")
+        return self.add(embeddings, metadata, doc_id=doc_id)
+
+    def add_duplicates(self, references):
+        """Record ``{chunk_id: [source, ...]}`` near-duplicates folded into stored chunks.
+
+        Each source is ``{"doc_id", "pages", "start", "end"}`` of a chunk that
+        was not embedded because it repeats ``chunk_id``; it is kept in that
+        chunk's ``duplicates`` metadata.
+        """
+        for chunk_id, sources in references.items():
+            existing = self.metadata[chunk_id].get("duplicates", [])
+            self.metadata.set_extra(chunk_id, "duplicates", existing + list(sources))
+        if references:
+            self.version += 1
+
+    def remove_document(self, doc_id):
+        """Delete every vector of ``doc_id``; returns the number removed.
+
+        Chunks that other documents reference as duplicates are not deleted
+        but moved to the first of those documents.
+        """
+        for chunk_id, sources in self.metadata.extras("duplicates"):
+            kept = [s for s in sources if s.get("doc_id") != doc_id]
+            if len(kept) != len(sources):
+                self.metadata.set_extra(chunk_id, "duplicates", kept or None)
+                self.version += 1
+        ids = self.metadata.doc_ids(doc_id)
+        own = set(ids.tolist())
+        shared = [(i, sources) for i, sources in self.metadata.extras("duplicates") if i in own]
+        for chunk_id, sources in shared:
+            self.metadata.move(chunk_id, sources[0])
+            self.metadata.set_extra(chunk_id, "duplicates", sources[1:] or None)
+        if shared:
+            self.version += 1
+            ids = np.setdiff1d(ids, [i for i, _ in shared])
+        if not len(ids):
+            return 0
+        self.metadata.discard(ids)
+        self.version += 1
+        self._clear_selectors()
+
+        if self.kind == "hnsw":
+            # HNSW graphs do not support deletion: hide the ids from searches
+            # and only rebuild once many are dead
+            self._deleted = np.union1d(self._deleted, ids)
+            if len(self._deleted) > HNSW_REBUILD_FRACTION * self.index.ntotal:
+                self.rebuild(kind="hnsw")
+            return len(ids)
+        self._ensure_writable()
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return self.index.remove_ids(ids)
+        # the IVF hashtable direct map only accepts an IDSelectorArray
+        return self.index.remove_ids(faiss.IDSelectorArray(len(ids), faiss.swig_ptr(ids)))
+
+    def reconstruct(self, ids):
+        """Return the stored vectors for ``ids`` (approximate for IVF-PQ)."""
+        ids = np.ascontiguousarray(ids, dtype="int64")
+        if len(ids) == 0:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        return self.index.reconstruct_batch(ids)
+
+    def original_vectors(self, ids):
+        """Exact vectors of ``ids``: kept by the chunk store for lossy kinds, else from the index."""
+        if self.metadata.has_vectors:
+            return self.metadata.vectors(ids)
+        return self.reconstruct(ids)
+
+    def rebuild(self, kind="auto", memory_budget=None):
+        """Rebuild the index as ``kind`` from the original vectors, keeping ids."""
+        memory_budget = memory_budget if memory_budget is not None else self.memory_budget
+        ids = self.metadata.ids()
+        vectors = self.original_vectors(ids)
+        if kind == "auto":
+            kind = choose_index_kind(len(ids), self.dim, memory_budget)
+        elif not self.auto:
+            self.requested_kind = kind
+        kind = trainable_kind(kind, len(ids))
+        self.kind = kind
+        with span("index.build", items=len(ids), nbytes=vectors.nbytes):
+            self.index = build_index(kind, self.dim, vectors)
+            self.trained_size = len(ids)
+            self._mmapped = False
+            self._deleted = np.zeros(0, dtype="int64")
+            self._clear_selectors()
+            self._apply_search_params()
+            if len(ids):
+                self.index.add_with_ids(vectors, ids)
+        if kind in LOSSY_KINDS and not self.metadata.has_vectors:
+            self.metadata.set_vectors(vectors)
+        elif kind not in LOSSY_KINDS and self.metadata.has_vectors:
+            self.metadata.set_vectors(None)
+
+    def auto_tune(self, memory_budget=None):
+        """Switch backend if the corpus has outgrown the current one.
+
+        Only an ``"auto"`` retriever changes kind; an explicit kind built
+        as a fallback (see ``trainable_kind``) moves to the requested one
+        once there are enough vectors to train it. Trained kinds (see
+        ``TRAINED_KINDS``) are retrained once the corpus is
+        ``RETRAIN_FACTOR`` times larger than their training set, so an
+        index first built from a small upload does not stay at a handful
+        of lists. Returns True when the index was rebuilt.
+        """
+        memory_budget = memory_budget if memory_budget is not None else self.memory_budget
+        if self.index is None:
+            return False
+        if self.auto:
+            kind = target = choose_index_kind(len(self), self.dim, memory_budget)
+        else:
+            target = self.requested_kind
+            kind = trainable_kind(target, len(self))
+        if kind != self.kind:
+            self.rebuild(kind=target, memory_budget=memory_budget)
+            return True
+        if self.kind in TRAINED_KINDS and len(self) >= RETRAIN_FACTOR * max(1, self.trained_size):
+            self.rebuild(kind=target, memory_budget=memory_budget)
+            return True
+        return False
+
+    def _selector(self, filter_type):
+        # ids of one chunk type (or, for None, of every live chunk when the
+        # HNSW graph holds removed ones) and a FAISS selector over them,
+        # cached until the corpus changes
+        with self._selectors_lock:
+            cached = self._selectors.get(filter_type)
+            if cached is None:
+                if filter_type is None:
+                    ids = self._deleted
+                    batch = faiss.IDSelectorBatch(ids)
+                    # keep the wrapped selector alive alongside the negation
+                    cached = (ids, (batch, faiss.IDSelectorNot(batch)))
+                else:
+                    ids = self.metadata.ids_of_type(filter_type)
+                    cached = (ids, faiss.IDSelectorBatch(ids))
+                self._selectors[filter_type] = cached
+            return cached
+
+    def _clear_selectors(self):
+        with self._selectors_lock:
+            self._selectors.clear()
+
+    def _search_params(self, selector):
+        base = self._base_index()
+        if isinstance(base, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+        if isinstance(base, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+        return faiss.SearchParameters(sel=selector)
+
+    def search_batch(self, query_embeddings, top_k=5, filter_type=None):
+        """Search many query rows at once.
+
+        Returns ``(ids, scores)`` arrays of shape ``(n_queries, top_k)``;
+        scores are L2 distances (lower is closer) and missing slots are
+        padded with id -1. With ``filter_type`` only chunks of that type are
+        considered, so every row holds up to ``top_k`` matching chunks.
+        """
+        queries = np.ascontiguousarray(np.atleast_2d(query_embeddings), dtype="float32")
+        with span("search", items=len(queries)):
+            if self.index is None or len(self) == 0:
+                return (np.full((len(queries), top_k), -1, dtype="int64"),
+                        np.full((len(queries), top_k), np.finfo("float32").max, dtype="float32"))
+            if not filter_type:
+                if not len(self._deleted):
+                    scores, ids = self.index.search(queries, top_k)
+                else:
+                    _, (_, selector) = self._selector(None)
+                    scores, ids = self.index.search(queries, top_k, params=self._search_params(selector))
+                return ids, scores
+
+            allowed, selector = self._selector(filter_type)
+            scores, ids = self.index.search(queries, top_k, params=self._search_params(selector))
+
+            # approximate indexes can come up short when the filter is selective;
+            # fall back to an exact scan over the matching vectors
+            expected = min(top_k, len(allowed))
+            if expected and ((ids >= 0).sum(axis=1) < expected).any():
+                scores, positions = faiss.knn(queries, self.original_vectors(allowed), expected)
+                ids = np.full((len(queries), top_k), -1, dtype="int64")
+                ids[:, :expected] = allowed[positions]
+                scores = np.pad(scores, ((0, 0), (0, top_k - expected)), constant_values=np.finfo("float32").max)
+            return ids, scores
+
+    def search(self, query_embedding, top_k=5, filter_type=None, return_scores=False):
+        """Return up to ``top_k`` ids for the first query row.
+
+        With ``return_scores=True`` returns ``(ids, scores)`` lists instead.
+        """
+        ids, scores = self.search_batch(query_embedding[:1], top_k, filter_type)
+        keep = ids[0] >= 0
+        results = ids[0][keep].tolist()
+        if return_scores:
+            return results, scores[0][keep].tolist()
         return results
+
+    def save(self, path=None):
+        """Write the index, the chunk store and a small state file into directory ``path``."""
+        path = path or self._path
+        os.makedirs(path, exist_ok=True)
+        if self._mmapped and path != self._path:
+            self._ensure_writable()
+        with span("index.save", items=len(self.metadata)):
+            if self.index is not None and not self._mmapped:
+                faiss.write_index(self.index, os.path.join(path, INDEX_FILE))
+            self.metadata.save(path)
+            state = {
+                "dim": self.dim,
+                "kind": self.kind,
+                "auto": self.auto,
+                "requested_kind": self.requested_kind,
+                "trained_size": self.trained_size,
+                "nprobe": self.nprobe,
+                "ef_search": self.ef_search,
+                "next_id": self.next_id,
+            }
+            tmp = os.path.join(path, METADATA_FILE + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, os.path.join(path, METADATA_FILE))
+        self._path = path
+
+    @classmethod
+    def load(cls, path, mmap=True, kind=None, memory_budget=None, nprobe=None, ef_search=None):
+        """Load a retriever saved with ``save``.
+
+        With ``mmap=True`` the index and the chunk store are memory-mapped
+        read-only and only copied into memory when first modified. Older
+        saves that kept all metadata in ``metadata.json`` are converted on
+        load and written in the new layout by the next ``save``.
+
+        Settings passed here win over the saved ones: an explicit ``kind``
+        other than the saved one rebuilds the index, ``"auto"`` keeps the
+        saved backend but lets ``auto_tune`` change it.
+        """
+        with open(os.path.join(path, METADATA_FILE), "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+        retriever = cls(kind=state.get("kind", "flat"), memory_budget=memory_budget,
+                        nprobe=nprobe if nprobe is not None else state.get("nprobe"),
+                        ef_search=ef_search if ef_search is not None else state.get("ef_search"))
+        retriever.auto = state.get("auto", retriever.auto)
+        retriever.requested_kind = state.get("requested_kind", "auto" if retriever.auto else retriever.kind)
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            flags = faiss.IO_FLAG_MMAP if mmap else 0
+            retriever.index = faiss.read_index(index_path, flags)
+            retriever._mmapped = mmap
+        retriever.dim = state["dim"]
+        retriever.next_id = state["next_id"]
+        if "metadata" in state:
+            retriever.metadata = ChunkStore.from_items(state["metadata"])
+        else:
+            retriever.metadata = ChunkStore.load(path, mmap_rows=mmap)
+        retriever.trained_size = state.get("trained_size", len(retriever.metadata))
+        if retriever.kind == "hnsw" and retriever.index is not None:
+            # graph entries without a live chunk were removed since the last rebuild
+            graph_ids = faiss.vector_to_array(retriever.index.id_map)
+            retriever._deleted = np.setdiff1d(graph_ids, retriever.metadata.ids())
+        retriever._path = path
+        retriever._apply_search_params()
+        if kind is not None:
+            retriever.auto = kind == "auto"
+            retriever.requested_kind = kind
+            if not retriever.auto and trainable_kind(kind, len(retriever)) != retriever.kind:
+                if retriever.index is None:
+                    retriever.kind = kind
+                else:
+                    retriever.rebuild(kind=kind)
+        return retriever
+
+    @classmethod
+    def open(cls, path, mmap=True, **kwargs):
+        """Load the retriever at ``path`` if one was saved there, else start empty.
+
+        ``kwargs`` are the constructor settings; on load they override the saved ones.
+        """
+        if os.path.exists(os.path.join(path, METADATA_FILE)):
+            return cls.load(path, mmap=mmap, **kwargs)
+        retriever = cls(**kwargs)
+        retriever._path = path
+        return retriever
+
+
+def recall_at_k(approx_ids, exact_ids):
+    """Fraction of the exact top-k neighbours found by an approximate search."""
+    hits = sum(len(set(a[a >= 0]) & set(e[e >= 0])) for a, e in zip(approx_ids, exact_ids))
+    return hits / max(1, int((exact_ids >= 0).sum()))
+
+
+def benchmark_index_kinds(vectors, queries, k=10, kinds=INDEX_KINDS, nprobe=None, ef_search=None):
+    """Build each backend over ``vectors`` and report recall@k against flat.
+
+    Returns ``{kind: {"recall": ..., "build_seconds": ..., "query_ms": ...,
+    "bytes": ..., "built": ...}}`` where ``query_ms`` is the mean latency
+    per query and ``built`` the kind actually built (see ``trainable_kind``).
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    metadata = [{"type": "text"}] * len(vectors)
+
+    exact = None
+    report = {}
+    for kind in ("flat",) + tuple(kd for kd in kinds if kd != "flat"):
+        start = time.perf_counter()
+        retriever = FAISSRetriever(vectors, metadata, kind=kind, nprobe=nprobe, ef_search=ef_search)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, ids = retriever.index.search(queries, k)
+        query_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+
+        if exact is None:
+            exact = ids
+        if kind in kinds:
+            report[kind] = {
+                "recall": recall_at_k(ids, exact),
+                "build_seconds": build_seconds,
+                "query_ms": query_ms,
+                "bytes": estimate_index_bytes(retriever.kind, len(vectors), vectors.shape[1]),
+                "built": retriever.kind,
+            }
+    return report
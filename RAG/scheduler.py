@@ -0,0 +1,300 @@
+import hashlib
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .metrics import observe
+
+
+# Request priorities; lower runs first.
+INTERACTIVE = 0
+BULK = 1
+
+# Status codes worth retrying: rate limiting and transient server errors.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_priority = ContextVar("rag_priority", default=INTERACTIVE)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextmanager
+def priority(level):
+    """Run outbound calls made in this context (and tasks started from it) at ``level``."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RetryableError(Exception):
+    """Raised by a scheduled call to have the scheduler retry it.
+
+    ``status`` is the HTTP status (429 pauses the whole provider) and
+    ``retry_after`` the server's ``Retry-After`` in seconds, if any.
+    """
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc):
+    """Return ``(status, retry_after)`` if ``exc`` is worth retrying, else None.
+
+    Understands ``RetryableError``, SDK errors carrying ``status_code`` and
+    ``response.headers`` (Groq) and connection errors/timeouts by name.
+    """
+    if isinstance(exc, RetryableError):
+        return exc.status, exc.retry_after
+    status = getattr(exc, "status_code", None)
+    if status in RETRY_STATUSES:
+        headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+        return status, _parse_retry_after(headers.get("retry-after"))
+    name = type(exc).__name__
+    if name in ("ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout",
+                "APIConnectionError", "APITimeoutError"):
+        return None, None
+    return None
+
+
+class TokenBucket:
+    """``per_minute`` units per minute, bursting up to ``capacity`` (default one minute's worth)."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def resize(self, per_minute, capacity=None):
+        """Change rate and capacity, keeping what is left (capped at the new capacity)."""
+        self._refill(time.monotonic())
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.level = min(self.level, self.capacity)
+
+    def delay(self, amount, now):
+        """Seconds until ``amount`` units are available."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        # correct an estimate once the real usage is known; may go into debt
+        self.level = min(self.capacity, self.level - amount)
+
+
+class RateLimiter:
+    """Admission control for one provider (and model).
+
+    Calls wait until both the request and the token bucket can cover them,
+    strictly by priority and then arrival. A 429 pauses every caller of the
+    provider until its ``Retry-After`` has passed (plus jitter), so a burst
+    of clients backs off together instead of retrying into the limit. Calls
+    that share a ``key`` while one is in flight get that call's result.
+    Limits of None are unlimited; ``burst`` caps how many requests may go
+    out back to back (default: a minute's worth).
+    """
+
+    def __init__(self, name, requests_per_min=None, tokens_per_min=None, burst=None, max_retries=4,
+                 backoff=0.5, max_backoff=60.0):
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._inflight = {}
+        self._requests = self._tokens = None
+        self.set_limits(requests_per_min, tokens_per_min, burst)
+
+    def set_limits(self, requests_per_min=None, tokens_per_min=None, burst=None):
+        with self._cond:
+            self.requests_per_min = requests_per_min
+            self.tokens_per_min = tokens_per_min
+            self._requests = self._bucket(self._requests, requests_per_min, burst)
+            self._tokens = self._bucket(self._tokens, tokens_per_min)
+            self._cond.notify_all()
+
+    @staticmethod
+    def _bucket(bucket, per_minute, capacity=None):
+        # reconfiguring keeps the current level instead of refilling to full
+        if not per_minute:
+            return None
+        if bucket is None:
+            return TokenBucket(per_minute, capacity)
+        bucket.resize(per_minute, capacity)
+        return bucket
+
+    def _delay(self, tokens, now):
+        delay = self._paused_until - now
+        if self._requests is not None:
+            delay = max(delay, self._requests.delay(1, now))
+        if self._tokens is not None and tokens:
+            delay = max(delay, self._tokens.delay(tokens, now))
+        return delay
+
+    def acquire(self, tokens=0, priority=None):
+        """Block until one request of ``tokens`` estimated tokens may be sent."""
+        ticket = (current_priority() if priority is None else priority, next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        delay = self._delay(tokens, time.monotonic())
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if self._requests is not None:
+                    self._requests.take(1)
+                if self._tokens is not None and tokens:
+                    self._tokens.take(tokens)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+        observe(f"ratelimit.{self.name}", time.monotonic() - start)
+
+    def settle(self, estimated, actual):
+        """Charge the difference between a call's estimated and reported tokens."""
+        if self._tokens is None or not actual:
+            return
+        with self._cond:
+            self._tokens.adjust(actual - estimated)
+
+    def pause(self, seconds):
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt, retry_after):
+        delay = retry_after if retry_after is not None else self.backoff * (2 ** attempt)
+        return min(self.max_backoff, delay) + random.uniform(0, self.backoff)
+
+    def call(self, fn, *args, tokens=0, key=None, priority=None, usage=None, **kwargs):
+        """Run ``fn(*args, **kwargs)`` within the limits, retrying transient failures.
+
+        ``tokens`` is the estimated token cost; ``usage(result)`` may return
+        the real one to settle the bucket. With a hashable ``key``,
+        concurrent calls with the same key share one request.
+        """
+        if key is None:
+            return self._call(fn, args, kwargs, tokens, priority, usage)
+
+        with self._cond:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            observe(f"ratelimit.{self.name}.shared", 0.0)
+            return future.result()
+        try:
+            result = self._call(fn, args, kwargs, tokens, priority, usage)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+
+    def _call(self, fn, args, kwargs, tokens, priority, usage):
+        attempt = 0
+        while True:
+            self.acquire(tokens, priority)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                retry = classify_error(e)
+                if retry is None or attempt >= self.max_retries:
+                    raise
+                status, retry_after = retry
+                delay = self._backoff(attempt, retry_after)
+                attempt += 1
+                if status == 429:
+                    self.pause(delay)
+                else:
+                    time.sleep(delay)
+                continue
+            if usage is not None:
+                self.settle(tokens, usage(result))
+            return result
+
+
+def key_id(api_key):
+    """Short, non-reversible tag of an API key for limiter and merge keys."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+_limits = {}
+_limiters = {}
+_lock = threading.Lock()
+
+
+def configure(limits):
+    """Set limits for ``get_limiter``.
+
+    ``limits`` maps a provider (``"groq"``, ``"jina"``) or ``"provider:model"``
+    to ``{"requests_per_min", "tokens_per_min", "burst"}``; model entries win.
+    Existing limiters pick up the new values.
+    """
+    with _lock:
+        _limits.clear()
+        _limits.update(limits or {})
+        for (provider, model, _), limiter in _limiters.items():
+            limiter.set_limits(**_lookup(provider, model))
+
+
+def _lookup(provider, model):
+    settings = _limits.get(f"{provider}:{model}") or _limits.get(provider) or {}
+    return {"requests_per_min": settings.get("requests_per_min"),
+            "tokens_per_min": settings.get("tokens_per_min"),
+            "burst": settings.get("burst")}
+
+
+def get_limiter(provider, model=None, api_key=None):
+    """Return the process-wide ``RateLimiter`` for ``provider``, ``model`` and ``api_key``.
+
+    Providers enforce quotas per key, so each key is paced, paused and
+    merged on its own; the configured limits apply to every key.
+    """
+    with _lock:
+        key = (provider, model, key_id(api_key))
+        limiter = _limiters.get(key)
+        if limiter is None:
+            name = provider if model is None else f"{provider}.{model}"
+            limiter = _limiters[key] = RateLimiter(name, **_lookup(provider, model))
+    return limiter
@@ -0,0 +1,256 @@
+"""Local HTTP API over a shared ``RAGService``.
+
+Endpoints (JSON in, JSON out):
+
+* ``GET /status`` - corpus and cache statistics.
+* ``GET /metrics`` - per-stage latency summaries in the Prometheus text
+  format; ``GET /metrics.json`` returns the same data as JSON rows.
+* ``POST /ingest`` - ``{"filename", "document", "images": [...], "image_mode"}``
+  with ``document`` and ``images`` base64 encoded.
+* ``POST /query`` - ``{"question", "model", "filter_type", "stream"}``. With
+  ``"stream": true`` the response is newline-delimited JSON events (see
+  ``RAGService.stream_query``).
+
+API keys are read from the ``X-Jina-Key`` / ``X-Groq-Key`` headers, falling
+back to the ``JINA_API_KEY`` / ``GROQ_API_KEY`` environment variables. The
+Jina key is only required when the service embeds with Jina.
+
+Run with ``python -m RAG.server --config "config (1).py" --port 8765``.
+"""
+import argparse
+import base64
+import binascii
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+from .metrics import render_prometheus
+from .service import RAGService
+from .settings import load_config
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, BaseException):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(payload):
+    return json.dumps(payload, default=_json_default).encode("utf-8")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    """Request handler bound to ``server.service``; one thread per request."""
+
+    server_version = "RAGServer/1.0"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = _dumps(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise BadRequest(f"Invalid JSON body: {e}")
+        if not isinstance(payload, dict):
+            raise BadRequest("Request body must be a JSON object.")
+        return payload
+
+    def _key(self, header, env, required=True):
+        key = self.headers.get(header) or os.environ.get(env)
+        if not key and required:
+            raise BadRequest(f"Missing API key: send the {header} header or set {env}.")
+        return key
+
+    @staticmethod
+    def _decode(value, field):
+        try:
+            return base64.b64decode(value, validate=True)
+        except (binascii.Error, TypeError) as e:
+            raise BadRequest(f"Field {field!r} must be base64: {e}")
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._send_json(200, self.server.service.status())
+        elif self.path == "/metrics.json":
+            self._send_json(200, self.server.service.metrics())
+        elif self.path == "/metrics":
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        routes = {"/ingest": self._ingest, "/query": self._query}
+        handler = routes.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        try:
+            handler(self._read_json())
+        except BadRequest as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            # upstream (Jina/Groq) and parsing failures
+            self._send_json(502, {"error": str(e)})
+
+    def _ingest(self, payload):
+        if not payload.get("filename") or not payload.get("document"):
+            raise BadRequest("'filename' and 'document' are required.")
+        images = [self._decode(image, "images") for image in payload.get("images") or []]
+        image_mode = payload.get("image_mode", "vision")
+        result = self.server.service.ingest(
+            self._decode(payload["document"], "document"),
+            payload["filename"],
+            self._key("X-Jina-Key", "JINA_API_KEY", self.server.service.requires_jina_key),
+            groq_key=self.headers.get("X-Groq-Key") or os.environ.get("GROQ_API_KEY"),
+            images=images,
+            image_mode=image_mode,
+        )
+        self._send_json(200, result)
+
+    def _query(self, payload):
+        question = payload.get("question")
+        if not question:
+            raise BadRequest("'question' is required.")
+        service = self.server.service
+        args = (question, self._key("X-Jina-Key", "JINA_API_KEY", service.requires_jina_key),
+                self._key("X-Groq-Key", "GROQ_API_KEY"),
+                payload.get("model") or service.config.GROQ_MODEL, payload.get("filter_type"))
+        if not payload.get("stream"):
+            self._send_json(200, service.query(*args))
+            return
+
+        events = service.stream_query(*args)
+        # fail with a plain status code if nothing could be retrieved
+        first = next(events)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(_dumps(first) + b"\n")
+        try:
+            for event in events:
+                self.wfile.write(_dumps(event) + b"\n")
+                self.wfile.flush()
+        except Exception as e:
+            self.wfile.write(_dumps({"event": "error", "error": str(e)}) + b"\n")
+        self.close_connection = True
+
+
+def make_server(service, host="127.0.0.1", port=8765, quiet=False):
+    """Create (but do not start) a threaded HTTP server for ``service``."""
+    server = ThreadingHTTPServer((host, port), RAGRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+class RAGClient:
+    """Client for the HTTP API with the same methods as ``RAGService``."""
+
+    def __init__(self, base_url="http://127.0.0.1:8765", timeout=300):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    @staticmethod
+    def _headers(jina_key=None, groq_key=None):
+        headers = {}
+        if jina_key:
+            headers["X-Jina-Key"] = jina_key
+        if groq_key:
+            headers["X-Groq-Key"] = groq_key
+        return headers
+
+    def _check(self, response):
+        if response.status_code != 200:
+            try:
+                message = response.json()["error"]
+            except (ValueError, KeyError):
+                message = response.text
+            raise RuntimeError(f"RAG server error {response.status_code}: {message}")
+        return response
+
+    def status(self):
+        return self._check(self.session.get(self.base_url + "/status", timeout=self.timeout)).json()
+
+    def metrics(self):
+        return self._check(self.session.get(self.base_url + "/metrics.json", timeout=self.timeout)).json()
+
+    def ingest(self, document, filename, jina_key, groq_key=None, images=(), image_mode="vision"):
+        payload = {
+            "filename": filename,
+            "document": base64.b64encode(document).decode("ascii"),
+            "images": [base64.b64encode(image).decode("ascii") for image in images],
+            "image_mode": image_mode,
+        }
+        response = self.session.post(self.base_url + "/ingest", json=payload,
+                                     headers=self._headers(jina_key, groq_key), timeout=self.timeout)
+        return self._check(response).json()
+
+    def query(self, question, jina_key, groq_key, model, filter_type=None):
+        payload = {"question": question, "model": model, "filter_type": filter_type}
+        response = self.session.post(self.base_url + "/query", json=payload,
+                                     headers=self._headers(jina_key, groq_key), timeout=self.timeout)
+        return self._check(response).json()
+
+    def stream_query(self, question, jina_key, groq_key, model, filter_type=None):
+        payload = {"question": question, "model": model, "filter_type": filter_type, "stream": True}
+        response = self.session.post(self.base_url + "/query", json=payload, stream=True,
+                                     headers=self._headers(jina_key, groq_key), timeout=self.timeout)
+        with self._check(response):
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["event"] == "error":
+                    raise RuntimeError(event["error"])
+                yield event
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the RAG pipeline over HTTP.")
+    parser.add_argument("--config", help="path to a config file such as 'config (1).py'")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    args = parser.parse_args(argv)
+
+    service = RAGService(load_config(args.config) if args.config else None)
+    server = make_server(service, args.host, args.port, quiet=args.quiet)
+    print(f"Serving RAG API on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from .answer_cache import AnswerCache
+from .context import context_budget
+from .dedup import Deduplicator
+from .embedding_cache import EmbeddingCache
+from .embeddings import JINA_EMBEDDING_URL, JINA_MODEL
+from .llm import ask_llm, stream_llm
+from .metrics import REGISTRY, trace
+from .pipeline import embed_document, index_document, retrieve, retrieve_batch, run
+from .providers import embed_texts, get_embedding_provider
+from .reranker import BM25Index
+from .retriever import FAISSRetriever
+from .scheduler import BULK, configure as configure_rate_limits, priority
+
+
+INGESTED_FILE = "ingested.json"
+
+# Settings used when the config module does not define them; names match
+# "config (1).py".
+DEFAULTS = {
+    "GROQ_MODEL": "llama-3.1-8b-instant",
+    "JINA_MODEL": JINA_MODEL,
+    "JINA_EMBEDDING_URL": JINA_EMBEDDING_URL,
+    "EMBEDDING_PROVIDER": "jina",
+    "EMBEDDING_DIM": 768,
+    "EMBEDDING_MODEL_PATH": None,
+    "EMBEDDING_WORKERS": None,
+    "CACHE_DIR": ".rag_cache",
+    "EMBEDDING_CACHE_MAX_ENTRIES": 200_000,
+    "INDEX_KIND": "auto",
+    "INDEX_MEMORY_BUDGET": None,
+    "IVF_NPROBE": 16,
+    "HNSW_EF_SEARCH": 64,
+    "RERANK_CANDIDATES": 20,
+    "CHUNK_SIZE": 400,
+    "CHUNK_OVERLAP": 80,
+    "EMBED_BATCH_SIZE": 64,
+    "PDF_WORKERS": None,
+    "OCR_MAX_SIDE": 1600,
+    "VISION_MAX_SIDE": 1024,
+    "ANSWER_CACHE_TTL": 3600,
+    "ANSWER_CACHE_MAX_ENTRIES": 1000,
+    "ANSWER_CACHE_SIMILARITY": 0.95,
+    "CONTEXT_TOKEN_BUDGETS": None,
+    "PIPELINE_CONCURRENCY": 4,
+    "DEDUP_THRESHOLD": 0.8,
+    "RATE_LIMITS": None,
+}
+
+
+def content_digest(document, images=(), image_mode="vision"):
+    """Hash identifying an upload: the document, its images and how images are read."""
+    digest = hashlib.sha256(document)
+    for image in images:
+        digest.update(hashlib.sha256(image).digest())
+    if images:
+        digest.update(image_mode.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _ReadWriteLock:
+    """Many concurrent readers or one writer."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._writing = True
+            while self._readers:
+                self._cond.wait()
+
+    def release_write(self):
+        with self._cond:
+            self._writing = False
+            self._cond.notify_all()
+
+
+class RAGService:
+    """One shared corpus (index, BM25, caches) serving many clients.
+
+    The Streamlit app and the HTTP server in ``RAG.server`` both drive a
+    single instance per process, so memory stays flat as sessions are
+    added. Queries search concurrently under a shared read lock; ingestion
+    parses and embeds without any lock and only takes the write lock to
+    add the vectors, persist the index and invalidate cached answers.
+
+    ``config`` is a module or object with the settings in ``DEFAULTS``
+    (e.g. from ``load_config``); missing ones fall back to the defaults.
+    ``EMBEDDING_PROVIDER`` selects the embedding backend; each embedding
+    space gets its own index and embedding cache under ``CACHE_DIR``.
+    """
+
+    def __init__(self, config=None):
+        settings = dict(DEFAULTS)
+        if config is not None:
+            settings.update({name: getattr(config, name) for name in DEFAULTS if hasattr(config, name)})
+        self.config = SimpleNamespace(**settings)
+        self._lock = _ReadWriteLock()
+        if self.config.RATE_LIMITS is not None:
+            configure_rate_limits(self.config.RATE_LIMITS)
+
+        cfg = self.config
+        self.requires_jina_key = cfg.EMBEDDING_PROVIDER == "jina"
+        self._local_provider = None
+        if self.requires_jina_key:
+            self.embedding_space = cfg.JINA_MODEL
+            index_dir = "index"
+        else:
+            self._local_provider = get_embedding_provider(
+                cfg.EMBEDDING_PROVIDER, dim=cfg.EMBEDDING_DIM, model_path=cfg.EMBEDDING_MODEL_PATH,
+                workers=cfg.EMBEDDING_WORKERS,
+            )
+            self.embedding_space = self._local_provider.name
+            index_dir = "index-" + self.embedding_space
+
+        self.embedding_cache = EmbeddingCache(
+            os.path.join(cfg.CACHE_DIR, "embeddings"), self.embedding_space,
+            max_entries=cfg.EMBEDDING_CACHE_MAX_ENTRIES,
+        )
+        self._index_path = os.path.join(cfg.CACHE_DIR, index_dir)
+        self.retriever = FAISSRetriever.open(
+            self._index_path,
+            kind=cfg.INDEX_KIND,
+            memory_budget=cfg.INDEX_MEMORY_BUDGET,
+            nprobe=cfg.IVF_NPROBE,
+            ef_search=cfg.HNSW_EF_SEARCH,
+        )
+        self.bm25 = BM25Index.from_metadata(self.retriever.metadata)
+        self.bm25.refresh()
+        self.answer_cache = AnswerCache(
+            ttl=cfg.ANSWER_CACHE_TTL,
+            max_entries=cfg.ANSWER_CACHE_MAX_ENTRIES,
+            threshold=cfg.ANSWER_CACHE_SIMILARITY,
+        )
+        self._description_cache = None
+        self._dedup = None
+        self._dedup_lock = threading.Lock()
+        # filename -> [content digest, chunks] of what the corpus holds
+        self._ingested = {}
+        ingested_path = os.path.join(self._index_path, INGESTED_FILE)
+        if os.path.exists(ingested_path):
+            with open(ingested_path, "r", encoding="utf-8") as f:
+                self._ingested = json.load(f)
+
+    def embedding_provider(self, jina_key=None):
+        """The configured provider; ``jina_key`` is only used by the Jina backend."""
+        if self._local_provider is not None:
+            return self._local_provider
+        return get_embedding_provider("jina", api_key=jina_key, model=self.config.JINA_MODEL,
+                                      url=self.config.JINA_EMBEDDING_URL)
+
+    def describer(self, image_mode, groq_key=None):
+        """Return ``(describe, label)`` for ``"vision"`` or ``"ocr"`` image handling."""
+        if image_mode == "ocr":
+            from .ocr import get_ocr_engine
+            return get_ocr_engine(max_side=self.config.OCR_MAX_SIDE).read, "Image text: "
+
+        from .vision import DescriptionCache, describe_image
+        if self._description_cache is None:
+            self._description_cache = DescriptionCache(os.path.join(self.config.CACHE_DIR, "vision"))
+
+        def describe(image_bytes):
+            return describe_image(image_bytes, groq_key, cache=self._description_cache,
+                                  max_side=self.config.VISION_MAX_SIDE)
+        return describe, "Image description: "
+
+    def deduplicator(self):
+        """MinHash/LSH index of the indexed text chunks, built on first use; None if disabled."""
+        if self.config.DEDUP_THRESHOLD is None:
+            return None
+        with self._dedup_lock:
+            if self._dedup is None:
+                self._lock.acquire_read()
+                try:
+                    self._dedup = Deduplicator.from_metadata(self.retriever.metadata,
+                                                             threshold=self.config.DEDUP_THRESHOLD)
+                finally:
+                    self._lock.release_read()
+        return self._dedup
+
+    def ingest(self, document, filename, jina_key, groq_key=None, images=(), image_mode="vision"):
+        """Add (or replace) a document and its images in the shared corpus.
+
+        Returns a dict with ``chunks`` (count), ``duplicates`` (near-duplicate
+        chunks that were not embedded), ``errors`` (image failures),
+        per-stage ``timings``, ``pdf`` (pages and pages/sec, None for text),
+        ``image_seconds`` (per image) and the metric ``spans`` recorded on
+        the way; text failures raise. The image describer (vision or OCR)
+        is only created when there are images. Outbound calls run at bulk priority, behind
+        interactive queries.
+
+        Content already in the corpus under ``filename`` (same document
+        bytes, images and ``image_mode``) is not processed again; the
+        result then has ``skipped`` set.
+        """
+        digest = content_digest(document, images, image_mode)
+        done = self._ingested.get(filename)
+        if done is not None and done[0] == digest:
+            return {"chunks": done[1], "duplicates": 0, "errors": [], "timings": {}, "pdf": None,
+                    "image_seconds": [], "spans": [], "skipped": True}
+
+        with trace() as spans, priority(BULK):
+            result = self._ingest(document, filename, jina_key, groq_key, images, image_mode, digest)
+        result["spans"] = spans
+        return result
+
+    def _ingest(self, document, filename, jina_key, groq_key, images, image_mode, digest):
+        start = time.perf_counter()
+        cfg = self.config
+        describe, label = self.describer(image_mode, groq_key) if images else (None, "")
+        provider = self.embedding_provider(jina_key)
+        dedup = self.deduplicator()
+        self._lock.acquire_read()
+        try:
+            # the previous version of this document is replaced, not matched against
+            exclude = set(self.retriever.metadata.doc_ids(filename).tolist())
+        finally:
+            self._lock.release_read()
+        prepared = run(embed_document(
+            document,
+            filename,
+            jina_key,
+            images=images,
+            describe=describe,
+            image_label=label,
+            embedding_cache=self.embedding_cache,
+            model=cfg.JINA_MODEL,
+            url=cfg.JINA_EMBEDDING_URL,
+            concurrency=cfg.PIPELINE_CONCURRENCY,
+            chunk_size=cfg.CHUNK_SIZE,
+            overlap=cfg.CHUNK_OVERLAP,
+            batch_size=cfg.EMBED_BATCH_SIZE,
+            pdf_workers=cfg.PDF_WORKERS,
+            provider=provider,
+            dedup=dedup,
+            exclude=exclude,
+        ))
+
+        self._lock.acquire_write()
+        try:
+            index_document(filename, prepared, self.retriever, self.bm25, dedup,
+                           lambda texts: embed_texts(texts, provider, self.embedding_cache))
+            # compact BM25 now so concurrent readers never mutate it
+            self.bm25.refresh()
+            self.retriever.auto_tune()
+            self.retriever.save()
+            # cached answers were grounded in the previous corpus
+            self.answer_cache.clear()
+            # uploads with failed images are retried next time
+            if prepared["errors"]:
+                self._ingested.pop(filename, None)
+            else:
+                self._ingested[filename] = [digest, len(prepared["chunks"])]
+            self._save_ingested()
+        finally:
+            self._lock.release_write()
+
+        prepared["timings"]["total"] = time.perf_counter() - start
+        return {"chunks": len(prepared["chunks"]), "duplicates": len(prepared["duplicates"]),
+                "errors": prepared["errors"], "timings": prepared["timings"], "pdf": prepared["pdf"],
+                "image_seconds": prepared["image_seconds"], "skipped": False}
+
+    def _save_ingested(self):
+        path = os.path.join(self._index_path, INGESTED_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._ingested, f)
+        os.replace(tmp, path)
+
+    def _retrieve(self, question, jina_key, model, filter_type, timings):
+        # returns (scope, embedding, cached entry, context, ranked)
+        self._lock.acquire_read()
+        try:
+            scope = (self.retriever.version, filter_type, model)
+        finally:
+            self._lock.release_read()
+        cached = self.answer_cache.lookup(scope, question)
+        if cached is not None:
+            return scope, None, cached, cached["context"], cached["ranked"]
+
+        start = time.perf_counter()
+        query_emb = embed_texts([question], self.embedding_provider(jina_key), self.embedding_cache)
+        timings["embed"] = time.perf_counter() - start
+        cached = self.answer_cache.lookup(scope, question, query_emb[0])
+        if cached is not None:
+            return scope, query_emb, cached, cached["context"], cached["ranked"]
+
+        start = time.perf_counter()
+        self._lock.acquire_read()
+        try:
+            # the corpus may have changed while the question was embedded
+            scope = (self.retriever.version, filter_type, model)
+            context, ranked = retrieve(
+                question, query_emb, self.retriever, self.bm25, filter_type,
+                top_k=self.config.RERANK_CANDIDATES,
+                budget_tokens=context_budget(model, self.config.CONTEXT_TOKEN_BUDGETS),
+            )
+        finally:
+            self._lock.release_read()
+        timings["retrieve"] = time.perf_counter() - start
+        return scope, query_emb, None, context, ranked
+
+    def retrieve_batch(self, questions, query_embs, model, filter_type=None):
+        """Contexts for many embedded questions from one batched search.
+
+        Returns a list of ``(context, ranked)``; the answer cache is not
+        consulted. Used by the bulk runner (``RAG.bulk``).
+        """
+        self._lock.acquire_read()
+        try:
+            return retrieve_batch(
+                questions, query_embs, self.retriever, self.bm25, filter_type,
+                top_k=self.config.RERANK_CANDIDATES,
+                budget_tokens=context_budget(model, self.config.CONTEXT_TOKEN_BUDGETS),
+            )
+        finally:
+            self._lock.release_read()
+
+    def query(self, question, jina_key, groq_key, model, filter_type=None):
+        """Answer ``question``.
+
+        Returns ``answer``, ``context``, ``ranked``, ``cached``, ``timings``
+        and the metric ``spans`` recorded for this request.
+        """
+        with trace() as spans:
+            result = self._query(question, jina_key, groq_key, model, filter_type)
+        result["spans"] = spans
+        return result
+
+    def _query(self, question, jina_key, groq_key, model, filter_type):
+        start = time.perf_counter()
+        timings = {}
+        scope, query_emb, cached, context, ranked = self._retrieve(question, jina_key, model, filter_type, timings)
+        if cached is not None:
+            answer = cached["answer"]
+        else:
+            llm_start = time.perf_counter()
+            answer = ask_llm(context, question, groq_key, model)
+            timings["llm"] = time.perf_counter() - llm_start
+            self.answer_cache.put(scope, question, answer, query_emb[0], seconds=time.perf_counter() - start,
+                                  context=context, ranked=ranked)
+        timings["total"] = time.perf_counter() - start
+        return {"answer": answer, "context": context, "ranked": ranked, "cached": cached is not None,
+                "timings": timings}
+
+    def stream_query(self, question, jina_key, groq_key, model, filter_type=None):
+        """Answer ``question`` as a stream of event dicts.
+
+        Yields ``{"event": "context", "context", "ranked", "cached"}`` once
+        retrieval is done, then ``{"event": "delta", "text"}`` per answer
+        fragment and finally ``{"event": "done", "answer", "cached",
+        "timings", "llm", "spans"}`` where ``llm`` holds the ``stream_llm``
+        metrics and ``spans`` the metric spans of this request. Errors
+        propagate as exceptions.
+        """
+        with trace() as spans:
+            for event in self._stream_query(question, jina_key, groq_key, model, filter_type):
+                if event["event"] == "done":
+                    event["spans"] = spans
+                yield event
+
+    def _stream_query(self, question, jina_key, groq_key, model, filter_type):
+        start = time.perf_counter()
+        timings = {}
+        scope, query_emb, cached, context, ranked = self._retrieve(question, jina_key, model, filter_type, timings)
+        yield {"event": "context", "context": context, "ranked": ranked, "cached": cached is not None}
+
+        llm_metrics = {}
+        if cached is not None:
+            answer = cached["answer"]
+            yield {"event": "delta", "text": answer}
+        else:
+            parts = []
+            for delta in stream_llm(context, question, groq_key, model, metrics=llm_metrics):
+                parts.append(delta)
+                yield {"event": "delta", "text": delta}
+            answer = "".join(parts).strip()
+            timings["llm"] = llm_metrics.get("total", 0.0)
+            self.answer_cache.put(scope, question, answer, query_emb[0], seconds=time.perf_counter() - start,
+                                  context=context, ranked=ranked)
+        timings["total"] = time.perf_counter() - start
+        yield {"event": "done", "answer": answer, "cached": cached is not None, "timings": timings,
+               "llm": llm_metrics}
+
+    @staticmethod
+    def metrics():
+        """Per-stage latency percentiles and counters for this process."""
+        return REGISTRY.snapshot()
+
+    def status(self):
+        self._lock.acquire_read()
+        try:
+            retriever = self.retriever
+            index = {"kind": retriever.kind, "dim": retriever.dim, "vectors": len(retriever),
+                     "version": retriever.version}
+            documents = sorted(retriever.documents)
+            chunks = len(retriever.metadata)
+        finally:
+            self._lock.release_read()
+        return {
+            "embedding_provider": self.embedding_space,
+            "requires_jina_key": self.requires_jina_key,
+            "documents": documents,
+            "chunks": chunks,
+            "index": index,
+            "embedding_cache": {"entries": len(self.embedding_cache), "hits": self.embedding_cache.hits,
+                                "misses": self.embedding_cache.misses},
+            "answer_cache": self.answer_cache.stats(),
+        }
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_service(config=None):
+    """Return the process-wide service for this config's cache directory."""
+    cache_dir = getattr(config, "CACHE_DIR", DEFAULTS["CACHE_DIR"])
+    with _services_lock:
+        service = _services.get(cache_dir)
+        if service is None:
+            service = RAGService(config)
+            _services[cache_dir] = service
+    return service
@@ -0,0 +1,23 @@
+import functools
+import importlib.util
+import os
+
+
+# The config file shipped next to the app.
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config (1).py")
+
+
+def load_config(path):
+    """Load a config file by path (``"config (1).py"`` is not importable by name)."""
+    spec = importlib.util.spec_from_file_location("config", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@functools.lru_cache(maxsize=None)
+def default_config():
+    """``CONFIG_PATH`` loaded once, or None if it is missing."""
+    if not os.path.exists(CONFIG_PATH):
+        return None
+    return load_config(CONFIG_PATH)
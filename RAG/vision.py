@@ -1,39 +1,135 @@
 import base64
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 
+from PIL import Image
 
-def describe_image(image_bytes, api_key):
+from .chunking import count_tokens
+from .clients import get_groq_client
+from .metrics import span
+from .scheduler import get_limiter, key_id
+
+
+VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+VISION_PROMPT = "Describe this image clearly."
+# Tokens reserved per image before the call; corrected from reported usage.
+IMAGE_TOKENS_ESTIMATE = 1500
+
+
+def prepare_image(image_bytes, max_side=1024, max_bytes=1_000_000, quality=85):
+    """Shrink an image for upload and return ``(bytes, mime_type)``.
+
+    Images already within ``max_side`` and ``max_bytes`` in a format the API
+    accepts are sent unchanged with their real MIME type; anything else is
+    downscaled to ``max_side`` and re-encoded as JPEG, lowering the quality
+    until it fits in ``max_bytes``.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    fmt = (img.format or "").upper()
+    if fmt in ("JPEG", "PNG", "WEBP") and max(img.size) <= max_side and len(image_bytes) <= max_bytes:
+        return image_bytes, Image.MIME[fmt]
+
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    else:
+        img = img.convert("RGB")
+    img.thumbnail((max_side, max_side))
+
+    while True:
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+        if out.tell() <= max_bytes or quality <= 40:
+            return out.getvalue(), "image/jpeg"
+        quality -= 15
+
+
+class DescriptionCache:
+    """On-disk cache of image descriptions keyed by image content and model."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(image_bytes, model=VISION_MODEL):
+        return hashlib.sha256(model.encode("utf-8") + b"\0" + image_bytes).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)["description"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, description):
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"description": description}, f)
+        os.replace(tmp, self._path(key))
+
+
+def describe_image(image_bytes, api_key, cache=None, model=VISION_MODEL, max_side=1024):
     """Describe an image using Groq Vision.
 
-    The Groq client is imported lazily so the module can be imported even
-    when the optional `groq` package is not installed. If the package is
-    missing, a ModuleNotFoundError with a helpful message is raised.
+    The image is downscaled and re-encoded with ``prepare_image`` before
+    upload. With a ``DescriptionCache``, images seen before are answered
+    from disk without calling the API.
     """
-    try:
-        from groq import Groq
-    except ModuleNotFoundError as e:
-        raise ModuleNotFoundError(
-            "Missing dependency 'groq'. Install it with: pip install groq-python-client"
-        ) from e
-
-    client = Groq(api_key=api_key)
-
-    b64 = base64.b64encode(image_bytes).decode("utf-8")
-
-    response = client.chat.completions.create(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "Describe this image clearly."},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{b64}"}
-                    }
-                ]
-            }
-        ],
-        temperature=0
-    )
-
-    return response.choices[0].message.content.strip()
+    key = DescriptionCache.key(image_bytes, model)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    client = get_groq_client(api_key, max_retries=0)
+
+    with span("vision.prepare", items=1, nbytes=len(image_bytes)):
+        data, mime = prepare_image(image_bytes, max_side=max_side)
+    b64 = base64.b64encode(data).decode("utf-8")
+
+    with span("vision", items=1, nbytes=len(data)) as s:
+        response = get_limiter("groq", model, api_key).call(
+            client.chat.completions.create,
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": VISION_PROMPT},
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": f"data:{mime};base64,{b64}"}
+                        }
+                    ]
+                }
+            ],
+            temperature=0,
+            tokens=count_tokens(VISION_PROMPT) + IMAGE_TOKENS_ESTIMATE,
+            key=(key_id(api_key), key),
+            usage=lambda r: getattr(getattr(r, "usage", None), "total_tokens", None),
+        )
+        usage = getattr(response, "usage", None)
+        s.tokens = getattr(usage, "total_tokens", None) or 0
+
+    description = response.choices[0].message.content.strip()
+    if cache is not None:
+        cache.put(key, description)
+    return description
+
+
+def describe_images(images, api_key, cache=None, max_workers=4, **kwargs):
+    """Describe several images concurrently; results keep input order."""
+    images = list(images)
+    if len(images) <= 1:
+        return [describe_image(img, api_key, cache=cache, **kwargs) for img in images]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as pool:
+        return list(pool.map(lambda img: describe_image(img, api_key, cache=cache, **kwargs), images))
@@ -1,6 +1,5 @@
 import streamlit as st
 import time
-from pypdf import PdfReader
 import os
 import sys
 import html
@@ -8,12 +7,12 @@ import html
 # Ensure local package directory is on sys.path so imports from the local RAG package work
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-from RAG.embeddings import get_jina_embeddings
-from RAG.vision import describe_image
-from RAG.chunking import chunk_text
-from RAG.retriever import FAISSRetriever
-from RAG.reranker import simple_rerank
-from RAG.llm import ask_llm
+# the rest of the RAG package (numpy, faiss, pypdf, ...) is imported on
+# first use, after the page has been drawn
+from RAG.settings import load_config
+
+# "config (1).py" is not a valid module name, so load it from its path
+config = load_config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config (1).py"))
 
 
 st.set_page_config(page_title="Multimodal RAG Assistant", page_icon="🤖", layout="wide")
@@ -96,6 +95,17 @@ body, #root, .appview-container {
 st.markdown(f"<style>{CSS}</style>", unsafe_allow_html=True)
 
 
+@st.cache_resource
+def _service():
+    # one shared index and cache set for every session in this process, or
+    # a client for a separately running RAG API
+    if config.RAG_SERVICE_URL:
+        from RAG.server import RAGClient
+        return RAGClient(config.RAG_SERVICE_URL)
+    from RAG.service import get_service
+    return get_service(config)
+
+
 def _ensure_history():
     if "history" not in st.session_state:
         st.session_state.history = []
@@ -132,11 +142,14 @@ with right:
     st.markdown("<div class='panel'>", unsafe_allow_html=True)
     st.header("Configuration")
     groq_key = st.text_input("Groq API Key", type="password")
-    jina_key = st.text_input("Jina API Key", type="password")
+    jina_key = st.text_input("Jina API Key", type="password",
+                             help=None if config.EMBEDDING_PROVIDER == "jina"
+                             else f"Not needed: embeddings run locally ({config.EMBEDDING_PROVIDER}).")
 
     model = st.selectbox("LLM Model", ["llama-3.1-8b-instant", "openai/gpt-oss-120b"])
     filter_type = st.radio("Retrieval Scope", ["all", "text", "image"], horizontal=True)
-    st.markdown("<div class='small'>Tip: Use <strong>image</strong> scope to test visual grounding.</div>", unsafe_allow_html=True)
+    image_mode = st.radio("Image Understanding", ["vision", "ocr"], horizontal=True)
+    st.markdown("<div class='small'>Tip: Use <strong>image</strong> scope to test visual grounding. <strong>ocr</strong> reads text-heavy images locally, without a vision call.</div>", unsafe_allow_html=True)
     st.divider()
     st.markdown("<div class='small'>Recent Uploads</div>", unsafe_allow_html=True)
     if "last_upload" in st.session_state:
@@ -204,16 +217,25 @@ def _typing_placeholder():
     return t
 
 
-system_ready = bool(txt_file and groq_key and jina_key)
+# local embedding providers run without a Jina key
+needs_jina_key = config.EMBEDDING_PROVIDER == "jina"
+system_ready = bool(txt_file and groq_key and (jina_key or not needs_jina_key))
 
 if not system_ready:
     st.warning("Provide document and API keys to enable retrieval.")
 
 
-if txt_file and groq_key and jina_key:
+if system_ready:
+
+    from RAG.service import content_digest
 
-    # Process uploads only once — keep logic identical but show progress
-    if "processed" not in st.session_state or st.session_state.get("doc_name") != getattr(txt_file, "name", None):
+    # Process uploads only when their content changes: the key covers the
+    # document, the image and the image mode, and the service itself skips
+    # content any session has already indexed
+    document = txt_file.getvalue()
+    images = [img_file.getvalue()] if img_file else []
+    upload_key = (txt_file.name, content_digest(document, images, image_mode))
+    if st.session_state.get("upload_key") != upload_key:
         processing = st.empty()
         with processing.container():
             st.info("Processing knowledge sources…")
@@ -221,51 +243,47 @@ if txt_file and groq_key and jina_key:
             time.sleep(0.15)
             progress.progress(20)
 
-            if txt_file.name.endswith('.pdf'):
-                reader = PdfReader(txt_file)
-                raw_text = "\n".join([p.extract_text() for p in reader.pages if p.extract_text()])
-            else:
-                raw_text = txt_file.read().decode('utf-8')
-
-            progress.progress(50)
-            chunks = chunk_text(raw_text)
-            metadata = [{"type": "text"} for _ in chunks]
-
-            if img_file:
-                image_bytes = img_file.read()
-                try:
-                    vision_text = describe_image(image_bytes, groq_key)
-                except Exception as e:
-                    # describe_image may raise an authentication error from the
-                    # Groq client or a generic network/error. Surface a friendly
-                    # message without assuming the `groq` module is present.
-                    msg = str(e).lower()
-                    if 'authentication' in msg or '401' in msg or 'unauthorized' in msg:
-                        st.error("Authentication failed for Groq API. Please verify your Groq API key in Configuration.")
-                    else:
-                        st.error("Image understanding failed: " + str(e))
-                    vision_text = None
-
-                if vision_text:
-                    chunks.append("Image description: " + vision_text)
-                    metadata.append({"type": "image"})
-
-            progress.progress(75)
             try:
-                embeddings = get_jina_embeddings(chunks, jina_key)
+                # text parsing, embedding batches and the image call run concurrently
+                result = _service().ingest(
+                    document,
+                    txt_file.name,
+                    jina_key,
+                    groq_key=groq_key,
+                    images=images,
+                    image_mode=image_mode,
+                )
             except Exception as e:
                 # Catch HTTP/auth errors from Jina and show a friendly message
                 st.error("Failed to create embeddings: " + str(e))
                 processing.error("Embedding failure — check your Jina API key and network.")
                 st.stop()
 
-            retriever = FAISSRetriever(embeddings, metadata)
+            for e in result["errors"]:
+                # describe_image may raise an authentication error from the
+                # Groq client or a generic network/error. Surface a friendly
+                # message without assuming the `groq` module is present.
+                msg = str(e).lower()
+                if 'authentication' in msg or '401' in msg or 'unauthorized' in msg:
+                    st.error("Authentication failed for Groq API. Please verify your Groq API key in Configuration.")
+                else:
+                    st.error("Image understanding failed: " + str(e))
 
-            st.session_state['chunks'] = chunks
-            st.session_state['metadata'] = metadata
-            st.session_state['retriever'] = retriever
-            st.session_state['processed'] = True
-            st.session_state['doc_name'] = txt_file.name
+            progress.progress(75)
+            if result.get("skipped"):
+                st.caption("Already indexed; reusing the existing embeddings.")
+            else:
+                st.caption(" · ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["timings"].items()))
+                pdf_stats = result.get("pdf")
+                if pdf_stats:
+                    st.caption(f"Parsed {pdf_stats['pages']} pages at {pdf_stats['pages_per_sec']:.1f} pages/s")
+                for seconds in result.get("image_seconds", []):
+                    st.caption(f"{'OCR' if image_mode == 'ocr' else 'Image description'} took {seconds:.2f}s")
+                if result.get("duplicates"):
+                    st.caption(f"{result['duplicates']} near-duplicate chunks were not embedded again.")
+
+            st.session_state['upload_key'] = upload_key
+            st.session_state['ingest_spans'] = result["spans"]
 
             progress.progress(100)
             processing.success("Processing complete")
@@ -276,27 +294,46 @@ if txt_file and groq_key and jina_key:
         typing = _typing_placeholder()
         start = time.time()
 
+        f = None if filter_type == 'all' else filter_type
+        # retrieval, the answer cache and the LLM call all run in the shared
+        # service; this session only renders its events
+        events = _service().stream_query(query, jina_key, groq_key, model, filter_type=f)
         try:
-            query_emb = get_jina_embeddings([query], jina_key)
+            retrieval = next(events)
         except Exception as e:
             st.error("Failed to compute query embedding: " + str(e))
             typing.empty()
             st.stop()
-        f = None if filter_type == 'all' else filter_type
-        # Retrieve more chunks (top 10) to ensure relevant content is found
-        ids = st.session_state['retriever'].search(query_emb, top_k=10, filter_type=f)
-        retrieved_docs = [st.session_state['chunks'][i] for i in ids]
-        reranked = simple_rerank(query, retrieved_docs)
-        # Use top 5 reranked chunks; if empty, fall back to retrieved chunks
-        selected_chunks = reranked[:5] if reranked else retrieved_docs[:5]
-        context = "\n\n".join(selected_chunks)
-        
+        context = retrieval["context"]
+        ranked = retrieval["ranked"]
+        cached = retrieval["cached"]
+
         # Warn if context is very sparse
-        if not context or len(context.strip()) < 100:
+        if not cached and (not context or len(context.strip()) < 100):
             st.warning("Limited relevant context found. Results may be incomplete. Try a different question or check your document.")
 
+        # stream tokens into a live bubble; the full history is re-rendered below
+        llm_metrics = {}
+        live = st.empty()
+        answer = ""
+        last_render = 0.0
         try:
-            answer = ask_llm(context, query, groq_key, model)
+            for event in events:
+                if event["event"] == "done":
+                    answer = event["answer"]
+                    llm_metrics = event["llm"]
+                    st.session_state['query_spans'] = event["spans"]
+                    break
+                if not answer:
+                    typing.empty()
+                answer += event["text"]
+                if time.time() - last_render > 0.05:
+                    last_render = time.time()
+                    live.markdown(
+                        f"<div class='chat-area'><div class='bubble user'>{html.escape(query)}</div>"
+                        f"<div class='bubble bot'>{html.escape(answer)}</div></div>",
+                        unsafe_allow_html=True,
+                    )
         except Exception as e:
             error_msg = str(e).lower()
             if 'connection' in error_msg or 'network' in error_msg or 'timeout' in error_msg:
@@ -308,11 +345,13 @@ if txt_file and groq_key and jina_key:
             else:
                 st.error(f"❌ LLM Error: {str(e)[:200]}")
             answer = f"Error: Unable to generate answer. {str(e)[:100]}"
+
         latency = round(time.time() - start, 2)
 
         # append history and re-render
         st.session_state.history.append((query, answer))
         typing.empty()
+        live.empty()
 
         # update chat area
         # reuse render logic
@@ -323,9 +362,28 @@ if txt_file and groq_key and jina_key:
         chat_html.append("</div>")
         st.markdown("".join(chat_html), unsafe_allow_html=True)
 
-        st.metric("Latency (s)", latency)
+        latency_col, ttft_col, rate_col, llm_col = st.columns(4)
+        latency_col.metric("Latency (s)", latency)
+        ttft_col.metric("First token (s)", round(llm_metrics.get("ttft", 0.0), 2))
+        rate_col.metric("Tokens/s", round(llm_metrics.get("tokens_per_sec", 0.0), 1))
+        llm_col.metric("LLM total (s)", round(llm_metrics.get("total", 0.0), 2))
+        cache_stats = _service().status()["answer_cache"]
+        hit_col, saved_col, _, _ = st.columns(4)
+        hit_col.metric("Answer cache hit rate", f"{cache_stats['hit_rate']:.0%}",
+                       "cached" if cached else None)
+        saved_col.metric("Time saved by cache (s)", round(cache_stats["saved_seconds"], 1))
         with st.expander("Retrieved Context"):
             st.text(context)
+            st.dataframe(ranked)
+
+        with st.expander("Performance (debug)"):
+            # where this request's time went, then process-wide percentiles
+            st.markdown("**This query**")
+            st.dataframe(st.session_state.get('query_spans', []))
+            st.markdown("**Last ingestion**")
+            st.dataframe(st.session_state.get('ingest_spans', []))
+            st.markdown("**All stages (seconds)**")
+            st.dataframe(_service().metrics())
 
         with st.expander("Recent Chat History"):
             for q, a in st.session_state.history[-8:]:
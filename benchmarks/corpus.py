@@ -0,0 +1,82 @@
+"""Deterministic synthetic corpora (text and PDF) and questions about them."""
+import random
+
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qui", "dor", "fen", "gal", "hun", "jor"]
+
+
+def make_vocabulary(size=5000, seed=0):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_pages(n_pages, words_per_page=500, topics=50, seed=0):
+    """Return ``n_pages`` page texts.
+
+    Every page draws most of its words from one of ``topics`` topic
+    vocabularies (Zipf-like weights) and the rest from the whole
+    vocabulary, so related pages share terms as in real documents.
+    """
+    rng = random.Random(seed)
+    vocab = make_vocabulary(seed=seed)
+    topic_words = [rng.sample(vocab, 200) for _ in range(topics)]
+    weights = [1 / (rank + 1) for rank in range(200)]
+    pages = []
+    for _ in range(n_pages):
+        topic = rng.randrange(topics)
+        words = rng.choices(topic_words[topic], weights=weights, k=int(words_per_page * 0.8))
+        words += rng.choices(vocab, k=words_per_page - len(words))
+        rng.shuffle(words)
+        pages.append(" ".join(words))
+    return pages
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages, words_per_line=12):
+    """Build a minimal PDF with one page per text (Helvetica, plain text operators)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, text in enumerate(pages):
+        words = text.split()
+        lines = [" ".join(words[j:j + words_per_line]) for j in range(0, len(words), words_per_line)]
+        ops = " ".join(f"({_escape(line)}) Tj T*" for line in lines)
+        stream = f"BT /F1 6 Tf 7 TL 20 780 Td {ops} ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def make_questions(chunks, n, words=8, seed=0):
+    """Sample ``n`` questions as ``(question, chunk_id)`` from ``{id: text}``.
+
+    Each question is a run of ``words`` consecutive words of its source
+    chunk, so the chunk is the expected top retrieval hit.
+    """
+    rng = random.Random(seed)
+    ids = sorted(chunks)
+    questions = []
+    for _ in range(n):
+        chunk_id = rng.choice(ids)
+        tokens = chunks[chunk_id].split()
+        start = rng.randrange(max(1, len(tokens) - words))
+        questions.append(("What about " + " ".join(tokens[start:start + words]) + "?", chunk_id))
+    return questions
@@ -0,0 +1,207 @@
+"""Local stand-ins for the Jina embeddings and Groq chat endpoints.
+
+Both servers answer on any path, add configurable latency and enforce an
+optional requests-per-second limit (answering 429 with ``Retry-After``
+like the real APIs), so the pipeline can be benchmarked offline.
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from RAG.reranker import tokenize
+
+
+class _RateLimiter:
+    """Token bucket allowing ``rate`` requests per second with bursts of ``burst``."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token; returns 0 on success or the seconds until one is free."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class MockServer:
+    """Threaded HTTP server base; subclasses implement ``respond(handler, body)``."""
+
+    def __init__(self, latency=0.05, jitter=0.0, rate_limit=None, burst=None, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.limiter = _RateLimiter(rate_limit, burst) if rate_limit else None
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        return {"requests": self.requests, "rate_limited": self.rate_limited}
+
+    def delay(self):
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                wait = server.limiter.acquire() if server.limiter else 0.0
+                if wait:
+                    with server._lock:
+                        server.rate_limited += 1
+                    self.send_json(429, {"error": {"message": "rate limit exceeded"}},
+                                   {"Retry-After": f"{wait:.3f}"})
+                    return
+                server.respond(self, body)
+
+            def send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def respond(self, handler, body):
+        raise NotImplementedError
+
+
+def hashed_embedding(text, dim=256):
+    """Deterministic bag-of-words vector: texts sharing words end up close."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for token in tokenize(text):
+        h = zlib.crc32(token.encode("utf-8"))
+        vec[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class MockJinaServer(MockServer):
+    """Jina ``/v1/embeddings`` stand-in returning ``hashed_embedding`` vectors.
+
+    ``per_item`` seconds are added per input text on top of ``latency``.
+    """
+
+    def __init__(self, dim=256, per_item=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.dim = dim
+        self.per_item = per_item
+        self.items = 0
+
+    def respond(self, handler, body):
+        texts = body.get("input") or []
+        with self._lock:
+            self.items += len(texts)
+        self.delay()
+        time.sleep(self.per_item * len(texts))
+        data = [{"object": "embedding", "index": i, "embedding": hashed_embedding(t, self.dim).tolist()}
+                for i, t in enumerate(texts)]
+        tokens = sum(len(tokenize(t)) for t in texts)
+        handler.send_json(200, {"model": body.get("model"), "object": "list", "data": data,
+                                "usage": {"total_tokens": tokens, "prompt_tokens": tokens}})
+
+    def stats(self):
+        return dict(super().stats(), items=self.items)
+
+
+class MockGroqServer(MockServer):
+    """OpenAI-compatible Groq chat completions stand-in.
+
+    ``latency`` is the time to first token; the answer of ``answer_tokens``
+    tokens is then produced at ``tokens_per_sec``, streamed as server-sent
+    events when the request asks for ``stream``.
+    """
+
+    def __init__(self, tokens_per_sec=500.0, answer_tokens=64, **kwargs):
+        super().__init__(**kwargs)
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_tokens = answer_tokens
+
+    def _answer_tokens(self, body):
+        prompt = " ".join(str(m.get("content")) for m in body.get("messages", []))
+        words = tokenize(prompt) or ["answer"]
+        return [" " + words[i % len(words)] for i in range(self.answer_tokens)], len(words)
+
+    def respond(self, handler, body):
+        tokens, prompt_tokens = self._answer_tokens(body)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        base = {"id": "mock", "created": int(time.time()), "model": body.get("model", "mock")}
+        self.delay()
+        if not body.get("stream"):
+            time.sleep(len(tokens) / self.tokens_per_sec)
+            handler.send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "".join(tokens).strip()},
+            }]))
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def send(payload):
+            data = b"data: " + (payload if isinstance(payload, bytes) else json.dumps(payload).encode()) + b"\n\n"
+            handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            handler.wfile.flush()
+
+        chunk = dict(base, object="chat.completion.chunk")
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(1 / self.tokens_per_sec)
+            send(dict(chunk, choices=[{"index": 0, "delta": {"content": token}, "finish_reason": None}]))
+        send(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                  x_groq={"id": "mock", "usage": usage}))
+        send(b"[DONE]")
+        handler.wfile.write(b"0\r\n\r\n")
@@ -0,0 +1,310 @@
+"""Offline end-to-end benchmark of ingestion, querying and retrieval recall.
+
+Starts local mock Jina and Groq servers (see ``mock_servers``), then for
+each corpus size generates a synthetic PDF, ingests it through
+``RAGService`` and asks generated questions about it. Each size runs in a
+fresh process so the reported peak memory belongs to that size alone.
+
+Usage::
+
+    python -m benchmarks.run --sizes 10,100,1000 --output bench.json
+    python -m benchmarks.run --baseline bench.json   # exit 1 on regressions
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+from RAG.providers import PROVIDERS, embed_texts
+from RAG.retriever import INDEX_KINDS, benchmark_index_kinds
+from RAG.service import RAGService
+
+from .corpus import make_pages, make_pdf, make_questions
+from .mock_servers import MockGroqServer, MockJinaServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentiles(values, scale=1000.0):
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    p50, p95, p99 = np.percentile(np.asarray(values) * scale, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+            "mean_ms": float(np.mean(values) * scale)}
+
+
+def _stage_totals(spans):
+    totals = {}
+    for s in spans:
+        totals[s["stage"]] = totals.get(s["stage"], 0.0) + s["seconds"]
+    return totals
+
+
+def run_size(n_pages, settings):
+    """Benchmark one corpus size; runs inside a fresh worker process."""
+    cfg = SimpleNamespace(**settings)
+    cache_dir = tempfile.mkdtemp(prefix="rag-bench-")
+    try:
+        service = RAGService(SimpleNamespace(
+            CACHE_DIR=cache_dir,
+            JINA_EMBEDDING_URL=cfg.jina_url,
+            EMBEDDING_PROVIDER=cfg.embedding_provider,
+            INDEX_KIND=cfg.index_kind,
+            PDF_WORKERS=cfg.pdf_workers,
+            EMBED_BATCH_SIZE=cfg.batch_size,
+            PIPELINE_CONCURRENCY=cfg.pipeline_concurrency,
+            RATE_LIMITS=cfg.rate_limits,
+        ))
+        pages = make_pages(n_pages, cfg.words_per_page, seed=cfg.seed)
+        if cfg.format == "pdf":
+            document, filename = make_pdf(pages), "corpus.pdf"
+        else:
+            document, filename = "\n".join(pages).encode("utf-8"), "corpus.txt"
+
+        start = time.perf_counter()
+        ingested = service.ingest(document, filename, "bench-jina-key")
+        ingest_seconds = time.perf_counter() - start
+
+        retriever = service.retriever
+        chunks = {i: meta["text"] for i, meta in retriever.metadata.items()}
+        questions = make_questions(chunks, cfg.queries, seed=cfg.seed)
+
+        def ask(item):
+            question, source = item
+            start = time.perf_counter()
+            ttft = None
+            ranked = []
+            try:
+                for event in service.stream_query(question, "bench-jina-key", "bench-groq-key", cfg.model):
+                    if event["event"] == "context":
+                        ranked = event["ranked"]
+                    elif event["event"] == "delta" and ttft is None:
+                        ttft = time.perf_counter() - start
+            except Exception as e:
+                return {"error": str(e)}
+            top = [r["id"] for r in ranked[:cfg.top_k]]
+            return {"seconds": time.perf_counter() - start, "ttft": ttft, "hit": source in top}
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=cfg.concurrency) as pool:
+            answers = list(pool.map(ask, questions))
+        query_wall = time.perf_counter() - start
+        ok = [a for a in answers if "error" not in a]
+
+        # recall of each backend against exact search on the same vectors
+        ids = np.fromiter(sorted(retriever.metadata), dtype="int64")
+        vectors = retriever.reconstruct(ids)
+        query_vectors = embed_texts([q for q, _ in questions], service.embedding_provider("bench-jina-key"),
+                                    service.embedding_cache)
+        retrievers = {}
+        for kind in cfg.kinds:
+            try:
+                retrievers[kind] = benchmark_index_kinds(vectors, query_vectors, k=cfg.top_k, kinds=(kind,))[kind]
+            except Exception as e:
+                # e.g. faiss cannot build this backend here
+                retrievers[kind] = {"error": str(e)}
+
+        return {
+            "pages": n_pages,
+            "chunks": len(chunks),
+            "document_bytes": len(document),
+            "ingest": {
+                "seconds": ingest_seconds,
+                "pages_per_sec": n_pages / ingest_seconds,
+                "chunks_per_sec": len(chunks) / ingest_seconds,
+                "index_kind": retriever.kind,
+                "stages": _stage_totals(ingested["spans"]),
+            },
+            "query": dict(
+                _percentiles([a["seconds"] for a in ok]),
+                ttft=_percentiles([a["ttft"] for a in ok if a["ttft"] is not None]),
+                queries=len(answers),
+                errors=len(answers) - len(ok),
+                qps=len(ok) / query_wall if query_wall else None,
+                source_hit_rate=sum(a["hit"] for a in ok) / len(ok) if ok else None,
+            ),
+            "memory": {"peak_rss_mb": peak_rss_mb()},
+            "retrievers": retrievers,
+            "stages": service.metrics(),
+        }
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, tolerance=0.15, recall_drop=0.02):
+    """Return human-readable regressions of ``current`` against ``baseline``."""
+    checks = [
+        (("ingest", "pages_per_sec"), True),
+        (("ingest", "chunks_per_sec"), True),
+        (("query", "p50_ms"), False),
+        (("query", "p95_ms"), False),
+        (("query", "p99_ms"), False),
+        (("memory", "peak_rss_mb"), False),
+    ]
+    previous = {run["pages"]: run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in current["runs"]:
+        base = previous.get(run["pages"])
+        if base is None:
+            continue
+        for (section, name), higher_is_better in checks:
+            new, old = run[section].get(name), base[section].get(name)
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"{run['pages']} pages: {section}.{name} {old:.3f} -> {new:.3f} ({change:+.0%})")
+        for kind, stats in run["retrievers"].items():
+            old = base["retrievers"].get(kind, {}).get("recall")
+            new = stats.get("recall")
+            if old is not None and new is not None and old - new > recall_drop:
+                regressions.append(f"{run['pages']} pages: {kind} recall@k {old:.3f} -> {new:.3f}")
+    return regressions
+
+
+def _print_summary(report):
+    for run in report["runs"]:
+        ingest, query = run["ingest"], run["query"]
+        print(f"{run['pages']:>6} pages {run['chunks']:>7} chunks | ingest {ingest['seconds']:.2f}s "
+              f"({ingest['pages_per_sec']:.1f} pages/s, {ingest['chunks_per_sec']:.1f} chunks/s) | "
+              f"query p50 {query['p50_ms'] or 0:.1f} ms p95 {query['p95_ms'] or 0:.1f} ms "
+              f"p99 {query['p99_ms'] or 0:.1f} ms | peak {run['memory']['peak_rss_mb'] or 0:.0f} MiB")
+        for kind, stats in run["retrievers"].items():
+            if "error" in stats:
+                print(f"{'':>8}{kind:<9} skipped: {stats['error'][:80]}")
+            else:
+                built = stats.get("built", kind)
+                note = f"  (built as {built}: too few vectors to train)" if built != kind else ""
+                print(f"{'':>8}{kind:<9} recall@k {stats['recall']:.3f}  build {stats['build_seconds'] * 1000:.1f} ms  "
+                      f"query {stats['query_ms']:.3f} ms{note}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000", help="comma-separated corpus sizes in pages")
+    parser.add_argument("--words-per-page", type=int, default=500)
+    parser.add_argument("--format", choices=("pdf", "txt"), default="pdf")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent queries")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--kinds", default=",".join(INDEX_KINDS), help="retriever backends to measure recall for")
+    parser.add_argument("--index-kind", default="auto", help="backend used by the service itself")
+    parser.add_argument("--embedding-provider", choices=PROVIDERS, default="jina",
+                        help="'jina' uses the mock server; local providers skip it")
+    parser.add_argument("--pdf-workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--pipeline-concurrency", type=int, default=4)
+    parser.add_argument("--model", default="llama-3.1-8b-instant")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jina-latency", type=float, default=0.05, help="seconds per embeddings request")
+    parser.add_argument("--jina-rate-limit", type=float, default=None, help="requests per second")
+    parser.add_argument("--groq-latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--groq-tokens-per-sec", type=float, default=500.0)
+    parser.add_argument("--groq-rate-limit", type=float, default=None, help="requests per second")
+    parser.add_argument("--output", default=None, help="JSON results path (default benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    jina = MockJinaServer(latency=args.jina_latency, rate_limit=args.jina_rate_limit).start()
+    groq = MockGroqServer(latency=args.groq_latency, tokens_per_sec=args.groq_tokens_per_sec,
+                          rate_limit=args.groq_rate_limit).start()
+    # the Groq SDK reads its endpoint from the environment, which the
+    # worker processes inherit
+    os.environ["GROQ_BASE_URL"] = groq.url
+
+    # pace the client at the mock quotas, as RATE_LIMITS would for the real APIs
+    rate_limits = {name: {"requests_per_min": 60 * rate, "burst": max(1.0, rate)}
+                   for name, rate in (("jina", args.jina_rate_limit), ("groq", args.groq_rate_limit)) if rate}
+    settings = {
+        "jina_url": jina.url + "/v1/embeddings",
+        "rate_limits": rate_limits,
+        "index_kind": args.index_kind,
+        "embedding_provider": args.embedding_provider,
+        "pdf_workers": args.pdf_workers,
+        "batch_size": args.batch_size,
+        "pipeline_concurrency": args.pipeline_concurrency,
+        "words_per_page": args.words_per_page,
+        "format": args.format,
+        "queries": args.queries,
+        "concurrency": args.concurrency,
+        "top_k": args.top_k,
+        "kinds": [k for k in args.kinds.split(",") if k],
+        "model": args.model,
+        "seed": args.seed,
+    }
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "runs": [],
+    }
+    try:
+        context = multiprocessing.get_context("spawn")
+        for size in (int(s) for s in args.sizes.split(",") if s):
+            before = {"jina": jina.stats(), "groq": groq.stats()}
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                run = pool.submit(run_size, size, settings).result()
+            run["mock"] = {name: {k: v - before[name][k] for k, v in server.stats().items()}
+                           for name, server in (("jina", jina), ("groq", groq))}
+            report["runs"].append(run)
+    finally:
+        jina.stop()
+        groq.stop()
+
+    output = args.output or os.path.join("benchmarks", "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    _print_summary(report)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            return 1
+        print("No regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
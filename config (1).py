@@ -1,3 +1,83 @@
 GROQ_MODEL = "llama-3.1-8b-instant"
 JINA_MODEL = "jina-embeddings-v4"
 JINA_EMBEDDING_URL = "https://api.jina.ai/v1/embeddings"
+
+# Embedding backend: "jina" (API), "hashing" (local feature hashing, no
+# network) or "onnx" (local ONNX sentence-embedding model directory at
+# EMBEDDING_MODEL_PATH). EMBEDDING_DIM applies to "hashing"; None workers
+# means one per CPU.
+EMBEDDING_PROVIDER = "jina"
+EMBEDDING_DIM = 768
+EMBEDDING_MODEL_PATH = None
+EMBEDDING_WORKERS = None
+
+# On-disk caches (embeddings, indexes, ...) live under this directory.
+CACHE_DIR = ".rag_cache"
+EMBEDDING_CACHE_MAX_ENTRIES = 200_000
+
+# Vector index backend: "flat", "fp16", "sq8", "ivf_flat", "ivf_sq8", "hnsw",
+# "ivf_pq" or "auto" to choose by corpus size and memory budget (bytes, None
+# for unlimited). "fp16"/"sq8" store 2/1 bytes per dimension instead of 4.
+# An explicit kind is kept as the corpus grows and replaces the kind of an
+# existing index on startup; only "auto" switches kinds by itself. IVF kinds
+# are built as "ivf_flat" or "flat" until the corpus is large enough to train
+# them (about 10k vectors for "ivf_pq").
+INDEX_KIND = "auto"
+INDEX_MEMORY_BUDGET = None
+IVF_NPROBE = 16
+HNSW_EF_SEARCH = 64
+
+# Dense candidates fused with BM25 before the top chunks are kept.
+RERANK_CANDIDATES = 20
+
+# Chunk window and overlap (in words) and chunks per embedding request batch.
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 80
+EMBED_BATCH_SIZE = 64
+
+# Processes used to extract PDF page text (None = one per CPU).
+PDF_WORKERS = None
+
+# Longest image side (pixels) fed to local OCR; larger images are downscaled.
+OCR_MAX_SIDE = 1600
+
+# Longest image side (pixels) sent to the vision model.
+VISION_MAX_SIDE = 1024
+
+# Answer cache: entry lifetime (s), size, and cosine similarity above which
+# a differently worded question reuses a cached answer.
+ANSWER_CACHE_TTL = 3600
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_SIMILARITY = 0.95
+
+# Tokens of retrieved context packed into the prompt, per LLM model.
+CONTEXT_TOKEN_BUDGETS = {
+    "llama-3.1-8b-instant": 3000,
+    "openai/gpt-oss-120b": 6000,
+}
+
+# Blocking calls (embedding batches, vision/OCR) the pipeline runs at once.
+PIPELINE_CONCURRENCY = 4
+
+# Chunks whose estimated word-shingle Jaccard similarity to an indexed chunk
+# (or an earlier chunk of the same upload) reaches this value are not
+# embedded; the indexed chunk records where they occurred. None disables it.
+DEDUP_THRESHOLD = 0.8
+
+# Client-side rate limits shared by every outbound call in the process, per
+# provider or "provider:model". Groq quotas are per model, so each model the
+# app calls has its own entry; the provider entry only covers other models.
+# Each API key is limited separately. Set these to your plan's quotas (the
+# values below are Groq's free tier); None means unlimited. Interactive
+# questions are served ahead of ingestion and bulk runs.
+RATE_LIMITS = {
+    "groq": {"requests_per_min": 30, "tokens_per_min": 6_000},
+    "groq:llama-3.1-8b-instant": {"requests_per_min": 30, "tokens_per_min": 6_000},
+    "groq:openai/gpt-oss-120b": {"requests_per_min": 30, "tokens_per_min": 8_000},
+    "groq:meta-llama/llama-4-scout-17b-16e-instruct": {"requests_per_min": 30, "tokens_per_min": 30_000},
+    "jina": {"requests_per_min": 500, "tokens_per_min": 1_000_000},
+}
+
+# URL of a running RAG API (python -m RAG.server) for the app to use instead
+# of its own in-process service, e.g. "http://127.0.0.1:8765".
+RAG_SERVICE_URL = None
@@ -0,0 +1,100 @@
+"""AnswerCache exact and semantic hits, TTL, LRU and clearing."""
+import threading
+
+import numpy as np
+
+import RAG.answer_cache as answer_cache
+from RAG.answer_cache import AnswerCache
+
+
+def unit(*values):
+    vec = np.asarray(values, dtype="float32")
+    return vec / np.linalg.norm(vec)
+
+
+def test_exact_hits_ignore_case_and_punctuation():
+    cache = AnswerCache()
+    cache.put("v1", "What is RAG?", "retrieval augmented generation", seconds=2.0, context="ctx")
+    entry = cache.lookup("v1", "  what is rag ")
+    assert entry["answer"] == "retrieval augmented generation"
+    assert entry["context"] == "ctx"
+    assert cache.lookup("v2", "what is rag") is None
+    assert cache.stats()["saved_seconds"] == 2.0
+
+
+def test_semantic_hits_need_similar_embeddings_in_the_same_scope():
+    cache = AnswerCache(threshold=0.95)
+    cache.put("v1", "how tall is the tower", "300 m", embedding=unit(1, 0, 0))
+    assert cache.lookup("v1", "what height is the tower", unit(0.99, 0.05, 0))["answer"] == "300 m"
+    assert cache.lookup("v1", "who built the tower", unit(0.5, 0.5, 0)) is None
+    assert cache.lookup("v2", "what height is the tower", unit(0.99, 0.05, 0)) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = AnswerCache(ttl=10)
+    cache.put("v1", "question", "answer", embedding=unit(1, 0))
+    now[0] += 9
+    assert cache.lookup("v1", "question") is not None
+    now[0] += 2
+    assert cache.lookup("v1", "question") is None
+    assert cache.lookup("v1", "question", unit(1, 0)) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entries_are_dropped():
+    cache = AnswerCache(max_entries=2)
+    cache.put("v1", "a", "A", embedding=unit(1, 0, 0))
+    cache.put("v1", "b", "B", embedding=unit(0, 1, 0))
+    cache.lookup("v1", "a")
+    cache.put("v1", "c", "C", embedding=unit(0, 0, 1))
+    assert len(cache) == 2
+    assert cache.lookup("v1", "b") is None
+    assert cache.lookup("v1", "b again", unit(0, 1, 0)) is None
+    assert cache.lookup("v1", "a")["answer"] == "A"
+
+
+def test_putting_the_same_question_replaces_the_answer():
+    cache = AnswerCache()
+    cache.put("v1", "q", "old", embedding=unit(1, 0))
+    cache.put("v1", "q", "new", embedding=unit(1, 0))
+    assert len(cache) == 1
+    assert cache.lookup("v1", "other words", unit(1, 0))["answer"] == "new"
+
+
+def test_clear_drops_entries_but_keeps_counters():
+    cache = AnswerCache()
+    cache.put("v1", "q", "a", seconds=1.5)
+    cache.lookup("v1", "q")
+    cache.lookup("v1", "missing", unit(1, 0))
+    cache.clear()
+    assert len(cache) == 0 and cache.lookup("v1", "q") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["saved_seconds"]) == (1, 1, 1.5)
+
+
+def test_concurrent_puts_and_clears_never_mix_answers():
+    cache = AnswerCache(max_entries=50)
+    errors = []
+
+    def worker(n):
+        for i in range(300):
+            question = f"question {n} {i}"
+            cache.put("v1", question, question)
+            entry = cache.lookup("v1", question)
+            if entry is not None and entry["answer"] != question:
+                errors.append((question, entry["answer"]))
+
+    def clearer():
+        for _ in range(100):
+            cache.clear()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)] + [threading.Thread(target=clearer)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
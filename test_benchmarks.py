@@ -0,0 +1,80 @@
+"""The offline benchmark: synthetic corpora, mock servers and regression checks."""
+import pytest
+import requests
+
+from benchmarks.corpus import make_pages, make_questions, make_vocabulary
+from benchmarks.mock_servers import MockGroqServer, MockJinaServer
+from benchmarks.run import compare, run_size
+
+
+def test_corpora_are_deterministic():
+    pages = make_pages(5, words_per_page=100, seed=3)
+    assert pages == make_pages(5, words_per_page=100, seed=3)
+    assert pages != make_pages(5, words_per_page=100, seed=4)
+    assert all(len(p.split()) == 100 for p in pages)
+    vocab = set(make_vocabulary(seed=3))
+    assert all(set(p.split()) <= vocab for p in pages)
+
+
+def test_questions_quote_their_source_chunk():
+    chunks = dict(enumerate(make_pages(4, words_per_page=50)))
+    questions = make_questions(chunks, 10, words=6)
+    assert len(questions) == 10
+    for question, chunk_id in questions:
+        quoted = question[len("What about "):-1]
+        assert len(quoted.split()) == 6 and quoted in chunks[chunk_id]
+
+
+def test_mock_servers_answer_429_past_their_rate_limit():
+    with MockJinaServer(latency=0.0, rate_limit=1, burst=2) as server:
+        statuses = [requests.post(server.url, json={"input": ["a b"]}, timeout=5) for _ in range(3)]
+        assert [r.status_code for r in statuses] == [200, 200, 429]
+        assert float(statuses[2].headers["Retry-After"]) > 0
+        assert len(statuses[0].json()["data"][0]["embedding"]) == 256
+        assert server.stats() == {"requests": 3, "rate_limited": 1, "items": 2}
+
+
+def test_mock_groq_produces_answer_tokens():
+    with MockGroqServer(latency=0.0, tokens_per_sec=10_000, answer_tokens=5) as server:
+        body = {"model": "m", "messages": [{"role": "user", "content": "alpha beta"}]}
+        reply = requests.post(server.url, json=body, timeout=5).json()
+    assert reply["choices"][0]["message"]["content"] == "alpha beta alpha beta alpha"
+    assert reply["usage"]["completion_tokens"] == 5
+
+
+def run_report(pages, seconds, p95, recall):
+    return {"runs": [{"pages": pages, "ingest": {"pages_per_sec": pages / seconds, "chunks_per_sec": None},
+                      "query": {"p50_ms": 10.0, "p95_ms": p95, "p99_ms": None},
+                      "memory": {"peak_rss_mb": 100.0}, "retrievers": {"hnsw": {"recall": recall}}}]}
+
+
+def test_compare_flags_slowdowns_and_recall_drops():
+    baseline = run_report(100, 10.0, 20.0, 0.95)
+    assert compare(run_report(100, 10.5, 22.0, 0.94), baseline) == []
+    regressions = compare(run_report(100, 20.0, 40.0, 0.80), baseline)
+    assert len(regressions) == 3
+    assert any("ingest.pages_per_sec" in r for r in regressions)
+    assert any("query.p95_ms" in r for r in regressions)
+    assert any("hnsw recall@k 0.950 -> 0.800" in r for r in regressions)
+    assert compare(run_report(10, 20.0, 40.0, 0.80), baseline) == []
+
+
+@pytest.fixture
+def groq_server(monkeypatch):
+    with MockGroqServer(latency=0.0, tokens_per_sec=10_000, answer_tokens=4) as server:
+        monkeypatch.setenv("GROQ_BASE_URL", server.url)
+        yield server
+
+
+def test_run_size_reports_ingest_query_and_recall(groq_server):
+    settings = {"jina_url": None, "rate_limits": None, "index_kind": "flat", "embedding_provider": "hashing",
+                "pdf_workers": 1, "batch_size": 16, "pipeline_concurrency": 2, "words_per_page": 200,
+                "format": "pdf", "queries": 5, "concurrency": 2, "top_k": 5, "kinds": ["flat", "hnsw"],
+                "model": "mock-model", "seed": 0}
+    run = run_size(3, settings)
+    assert run["pages"] == 3 and run["chunks"] > 0
+    assert run["ingest"]["index_kind"] == "flat"
+    assert run["query"]["queries"] == 5 and run["query"]["errors"] == 0
+    assert run["query"]["source_hit_rate"] > 0.5
+    assert run["retrievers"]["flat"]["recall"] == 1.0
+    assert groq_server.stats()["requests"] == 5
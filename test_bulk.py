@@ -0,0 +1,85 @@
+"""The bulk question-answering CLI: input parsing, batching and the JSONL output."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.mock_servers import MockGroqServer
+from RAG.bulk import answer_questions, main, read_questions
+from RAG.service import RAGService
+
+DOCUMENT = " ".join(f"The {animal} lives in the {place} and eats {food}."
+                    for animal, place, food in [("otter", "river", "fish"), ("camel", "desert", "dates")]
+                    for _ in range(20)).encode("utf-8")
+
+
+def test_read_questions_accepts_strings_and_objects():
+    lines = ['"what does the otter eat"', "", '{"question": "where", "id": "q7", "filter_type": "text"}']
+    assert read_questions(lines) == [
+        {"index": 0, "id": 0, "question": "what does the otter eat", "filter_type": None},
+        {"index": 1, "id": "q7", "question": "where", "filter_type": "text"},
+    ]
+
+
+def test_read_questions_reports_bad_lines_by_number():
+    questions = read_questions(['"ok"', "{not json", '{"id": 3}', "42", '{"question": 5}'])
+    assert [q.get("error", "").split(":")[0] for q in questions] == ["", "line 2", "line 3", "line 4", "line 5"]
+    assert "invalid JSON" in questions[1]["error"]
+    assert questions[2]["error"] == 'line 3: missing "question"' and questions[2]["id"] == 3
+
+
+@pytest.fixture
+def groq_server(monkeypatch):
+    with MockGroqServer(latency=0.1, tokens_per_sec=10_000, answer_tokens=4) as server:
+        monkeypatch.setenv("GROQ_BASE_URL", server.url)
+        yield server
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = RAGService(SimpleNamespace(CACHE_DIR=str(tmp_path), EMBEDDING_PROVIDER="hashing", EMBEDDING_DIM=64,
+                                         INDEX_KIND="flat", CHUNK_SIZE=20, CHUNK_OVERLAP=5))
+    service.ingest(DOCUMENT, "animals.txt", None)
+    return service
+
+
+def test_answers_are_concurrent_and_errors_are_records(service, groq_server):
+    questions = read_questions([json.dumps(f"what does the {a} eat, case {i}")
+                                for i in range(8) for a in ("otter", "camel")] + ["{broken"])
+    records = []
+    summary = asyncio.run(answer_questions(service, questions, None, "key-bulk", "mock-model", records.append,
+                                           concurrency=8, batch_size=5))
+    assert summary["questions"] == 17 and summary["errors"] == 1
+    # sixteen LLM calls of 0.1 s, eight at a time
+    assert summary["seconds"] < 16 * 0.1
+    assert sorted(r["index"] for r in records) == list(range(17))
+
+    by_index = {r["index"]: r for r in records}
+    assert by_index[16]["error"].startswith("line 17: invalid JSON") and by_index[16]["answer"] is None
+    for record in (by_index[i] for i in range(16)):
+        assert record["error"] is None and record["answer"]
+        assert record["chunk_ids"]
+        assert {"embed_batch", "search_batch", "llm", "total"} <= set(record["timings"])
+    assert groq_server.stats()["requests"] == 16
+
+
+def test_main_writes_jsonl(tmp_path, monkeypatch, capsys, groq_server):
+    config = tmp_path / "config.py"
+    config.write_text(f"CACHE_DIR = {str(tmp_path / 'cache')!r}\nEMBEDDING_PROVIDER = 'hashing'\n"
+                      "EMBEDDING_DIM = 64\nINDEX_KIND = 'flat'\nGROQ_MODEL = 'mock-model'\n")
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text('"where does the camel live"\n{"id": "x"}\n', encoding="utf-8")
+    output = tmp_path / "answers.jsonl"
+    monkeypatch.delenv("JINA_API_KEY", raising=False)
+    monkeypatch.setenv("GROQ_API_KEY", "key-bulk-main")
+
+    main([str(questions), "-o", str(output), "--config", str(config), "--concurrency", "2"])
+    records = sorted((json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()),
+                     key=lambda r: r["index"])
+    assert [r["error"] for r in records] == [None, 'line 2: missing "question"']
+    assert "2 questions" in capsys.readouterr().err
+
+    monkeypatch.delenv("GROQ_API_KEY")
+    with pytest.raises(SystemExit):
+        main([str(questions), "--config", str(config)])
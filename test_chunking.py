@@ -0,0 +1,61 @@
+"""Streaming chunker: windows, overlap, offsets and page provenance."""
+import io
+
+import pytest
+
+from RAG.chunking import chunk_text, count_tokens, iter_batches, iter_chunks
+
+
+TEXT = " ".join(f"w{i}" for i in range(25))
+
+
+def test_windows_overlap_by_the_requested_words():
+    chunks = list(iter_chunks(TEXT, chunk_size=10, overlap=3))
+    assert [(c["word_start"], c["word_end"]) for c in chunks] == [(0, 10), (7, 17), (14, 24), (21, 25)]
+    assert chunks[1]["text"].split()[:3] == chunks[0]["text"].split()[-3:]
+
+
+def test_offsets_point_back_into_the_document():
+    text = "alpha  beta\tgamma\n\ndelta epsilon zeta"
+    for chunk in iter_chunks(text, chunk_size=3, overlap=1):
+        words = text[chunk["start"]:chunk["end"]].split()
+        assert words == chunk["text"].split()
+
+
+def test_pages_are_recorded_with_offsets_across_pages():
+    pages = ["one two three", "four five", "", "six seven eight"]
+    chunks = list(iter_chunks(pages, chunk_size=4, overlap=1, page_separator="\n"))
+    joined = "\n".join(pages)
+    assert [c["pages"] for c in chunks] == [[1, 2], [2, 4], [4]]
+    for chunk in chunks:
+        assert joined[chunk["start"]:chunk["end"]].split() == chunk["text"].split()
+
+
+def test_streams_are_read_in_blocks_without_splitting_words():
+    text = " ".join(f"word{i}" for i in range(500))
+    from_stream = list(iter_chunks(io.StringIO(text), chunk_size=50, overlap=10, block_size=7))
+    assert from_stream == list(iter_chunks(text, chunk_size=50, overlap=10))
+
+
+def test_no_tail_chunk_made_only_of_overlap():
+    chunks = list(iter_chunks(" ".join(["x"] * 10), chunk_size=5, overlap=2))
+    assert chunks[-1]["word_end"] == 10
+    assert len(chunks) == 3
+
+
+def test_token_sizing_counts_each_word():
+    words = ["a" * 12] * 10  # 3 tokens each
+    chunks = list(iter_chunks(" ".join(words), chunk_size=9, overlap=3, count=count_tokens))
+    assert [c["word_end"] - c["word_start"] for c in chunks] == [3, 3, 3, 3, 2]
+    assert count_tokens("") == 1 and count_tokens("abcde") == 2
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        list(iter_chunks(TEXT, chunk_size=5, overlap=5))
+
+
+def test_helpers():
+    assert list(iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert chunk_text("a b c d", chunk_size=2, overlap=0) == ["a b", "c d"]
+    assert chunk_text("") == []
@@ -0,0 +1,65 @@
+"""Context assembly: overlap merging, MMR, de-duplication and the token budget."""
+import numpy as np
+
+from RAG.chunking import iter_chunks
+from RAG.context import DEFAULT_CONTEXT_TOKENS, assemble_context, context_budget, merge_overlapping, mmr_order
+
+
+def test_overlapping_chunks_of_a_document_are_merged_once():
+    text = " ".join(f"w{i}" for i in range(20))
+    chunks = [dict(c, doc_id="a", id=i, score=1.0 - i / 10)
+              for i, c in enumerate(iter_chunks(text, chunk_size=8, overlap=3))]
+    merged = merge_overlapping(chunks + [{"text": "loose", "id": 99}])
+    passages = [p for p in merged if p.get("doc_id") == "a"]
+    assert len(passages) == 1
+    assert passages[0]["text"] == text
+    assert passages[0]["ids"] == [c["id"] for c in chunks]
+    assert passages[0]["score"] == 1.0
+    assert {"text": "loose", "id": 99, "ids": [99]} in merged
+
+
+def test_separate_runs_stay_separate():
+    chunks = [{"text": "a b", "doc_id": "d", "word_start": 0, "word_end": 2},
+              {"text": "e f", "doc_id": "d", "word_start": 4, "word_end": 6}]
+    assert [p["text"] for p in merge_overlapping(chunks)] == ["a b", "e f"]
+
+
+def test_mmr_prefers_diverse_candidates_and_drops_duplicates():
+    similarity = np.array([[1.0, 0.8, 0.0, 0.95],
+                           [0.8, 1.0, 0.0, 0.8],
+                           [0.0, 0.0, 1.0, 0.0],
+                           [0.95, 0.8, 0.0, 1.0]], dtype=np.float32)
+    order = mmr_order([1.0, 0.9, 0.5, 0.99], similarity, lambda_=0.5, duplicate_threshold=0.9)
+    assert order[:2] == [0, 2]
+    assert 3 not in order
+    assert mmr_order([], np.zeros((0, 0))) == []
+
+
+def test_context_fits_the_budget_and_keeps_the_best_first():
+    chunks = [{"text": f"topic{i} " + " ".join(f"w{i}_{j}" for j in range(30)), "score": 1.0 - i / 10}
+              for i in range(6)]
+    context, used = assemble_context(chunks, budget_tokens=100, count=lambda t: len(t.split()))
+    assert used[0]["text"] == chunks[0]["text"]
+    assert sum(len(p["text"].split()) for p in used) <= 100
+    assert len(used) == 3
+    assert context == "\n\n".join(p["text"] for p in used)
+
+
+def test_near_duplicate_passages_are_dropped():
+    text = " ".join(f"word{i}" for i in range(20))
+    context, used = assemble_context([{"text": text, "score": 1.0}, {"text": text + " today", "score": 0.9},
+                                      {"text": "something else entirely", "score": 0.5}])
+    assert [p["text"] for p in used] == [text, "something else entirely"]
+
+
+def test_the_best_passage_is_trimmed_when_nothing_fits():
+    context, used = assemble_context([{"text": " ".join(["word"] * 100), "score": 1.0}], budget_tokens=10,
+                                     count=lambda t: len(t.split()))
+    assert len(used) == 1 and len(context.split()) == 10
+    assert assemble_context([]) == ("", [])
+
+
+def test_budgets_come_from_the_config():
+    assert context_budget("model-a", {"model-a": 1234}) == 1234
+    assert context_budget("unknown", {"model-a": 1234}) == DEFAULT_CONTEXT_TOKENS
+    assert context_budget("openai/gpt-oss-120b") == 6000
@@ -0,0 +1,86 @@
+"""ChunkStore persistence: save, reload, appends and compaction."""
+import os
+
+import numpy as np
+import pytest
+
+from RAG.corpus_store import TEXTS_FILE, ChunkStore
+
+
+def metas(n, doc="a.pdf", start=0):
+    return [{"type": "text", "text": f"chunk {start + i} ünï", "doc_id": doc, "pages": [1, 2],
+             "start": 10 * i, "end": 10 * i + 9} for i in range(n)]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    store = ChunkStore()
+    items = metas(5) + [{"type": "image", "text": "a chart", "doc_id": "b.png", "pages": [1, 3]}]
+    store.extend(np.arange(6), items)
+    store.set_extra(2, "duplicates", [{"doc_id": "c.pdf", "pages": [4]}])
+    store.save(str(tmp_path))
+
+    loaded = ChunkStore.load(str(tmp_path))
+    assert len(loaded) == 6
+    assert [loaded[i] for i in range(6) if i != 2] == [m for i, m in enumerate(items) if i != 2]
+    assert loaded[2] == dict(items[2], duplicates=[{"doc_id": "c.pdf", "pages": [4]}])
+    assert loaded.ids_of_type("image").tolist() == [5]
+    assert {doc: ids.tolist() for doc, ids in loaded.documents().items()} == {"a.pdf": [0, 1, 2, 3, 4], "b.png": [5]}
+
+
+def test_appends_after_reload(tmp_path):
+    store = ChunkStore()
+    store.extend(np.arange(3), metas(3))
+    store.save(str(tmp_path))
+
+    loaded = ChunkStore.load(str(tmp_path))
+    loaded.extend(np.arange(3, 6), metas(3, doc="b.pdf", start=3))
+    loaded.save(str(tmp_path))
+
+    again = ChunkStore.load(str(tmp_path))
+    assert again.ids().tolist() == list(range(6))
+    assert [again.text(i) for i in range(6)] == [f"chunk {i} ünï" for i in range(6)]
+    assert again.doc_ids("b.pdf").tolist() == [3, 4, 5]
+
+
+def test_ids_must_increase():
+    store = ChunkStore()
+    store.extend(np.arange(3), metas(3))
+    with pytest.raises(ValueError):
+        store.extend([2], metas(1))
+
+
+def test_save_compacts_once_most_rows_are_deleted(tmp_path):
+    store = ChunkStore()
+    store.extend(np.arange(10), metas(10))
+    store.save(str(tmp_path))
+    size = os.path.getsize(os.path.join(tmp_path, TEXTS_FILE))
+
+    store.discard(np.arange(6))
+    store.save(str(tmp_path))
+    assert os.path.getsize(os.path.join(tmp_path, TEXTS_FILE)) < size
+
+    loaded = ChunkStore.load(str(tmp_path))
+    assert loaded.ids().tolist() == [6, 7, 8, 9]
+    assert [loaded.text(i) for i in range(6, 10)] == [f"chunk {i} ünï" for i in range(6, 10)]
+    assert 0 not in loaded
+    with pytest.raises(KeyError):
+        loaded[0]
+
+
+def test_vectors_survive_appends_and_compaction(tmp_path):
+    vectors = np.random.default_rng(0).random((8, 4), dtype="float32")
+    store = ChunkStore()
+    store.extend(np.arange(4), metas(4), vectors=vectors[:4])
+    store.save(str(tmp_path))
+    store.extend(np.arange(4, 8), metas(4, start=4), vectors=vectors[4:])
+    store.save(str(tmp_path))
+
+    loaded = ChunkStore.load(str(tmp_path))
+    np.testing.assert_array_equal(loaded.vectors([7, 0, 5]), vectors[[7, 0, 5]])
+    loaded.discard(np.arange(5))
+    loaded.save(str(tmp_path))
+
+    again = ChunkStore.load(str(tmp_path))
+    np.testing.assert_array_equal(again.vectors(again.ids()), vectors[5:])
+    with pytest.raises(ValueError):
+        again.extend([8], metas(1))
@@ -0,0 +1,84 @@
+"""Near-duplicate detection and removal of documents that share chunks."""
+import numpy as np
+
+from RAG.dedup import Deduplicator, dedup_chunks, source_of
+from RAG.retriever import FAISSRetriever
+
+
+WORDS = ("alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi omicron pi rho "
+         "sigma tau upsilon phi chi psi omega").split()
+
+
+def passage(seed, n=80):
+    rng = np.random.default_rng(seed)
+    return " ".join(rng.choice(WORDS, size=n))
+
+
+def test_finds_near_duplicates_only():
+    dedup = Deduplicator(threshold=0.8)
+    original = passage(1)
+    dedup.add("kept", dedup.signatures([original])[0])
+
+    words = original.split()
+    words[40] = "changed"
+    near, other = dedup.signatures([" ".join(words), passage(2)])
+    assert dedup.find(near) == "kept"
+    assert dedup.find(other) is None
+    assert dedup.find(near, exclude={"kept"}) is None
+
+
+def test_removed_keys_are_not_found():
+    dedup = Deduplicator()
+    signature = dedup.signatures([passage(3)])[0]
+    dedup.add(7, signature)
+    dedup.remove([7, 8])
+    assert len(dedup) == 0
+    assert dedup.find(signature) is None
+
+
+def test_spawned_index_signatures_are_comparable():
+    dedup = Deduplicator()
+    local = dedup.spawn()
+    text = passage(4)
+    local.add(0, dedup.signatures([text])[0])
+    assert len(dedup) == 0
+    assert local.find(local.signatures([text])[0]) == 0
+
+
+def test_dedup_chunks_splits_indexed_local_and_unique():
+    dedup = Deduplicator()
+    indexed = passage(5)
+    dedup.add(42, dedup.signatures([indexed])[0])
+    fresh = passage(6)
+    chunks = [{"text": indexed, "doc_id": "b.txt", "pages": [2]}, {"text": fresh}, {"text": fresh}]
+
+    unique, signatures, duplicates = dedup_chunks(chunks, dedup, dedup.spawn(), offset=10)
+    assert unique == [chunks[1]]
+    assert len(signatures) == 1
+    assert [d["of"] for d in duplicates] == [("id", 42), ("local", 10)]
+    assert source_of(duplicates[0]["source"]) == {"doc_id": "b.txt", "pages": [2]}
+
+
+def test_remove_document_moves_chunks_other_documents_share():
+    vectors = np.random.default_rng(0).random((3, 8), dtype="float32")
+    retriever = FAISSRetriever(kind="flat")
+    ids = retriever.add_document("a.txt", vectors[:2], [{"type": "text", "text": "shared"},
+                                                          {"type": "text", "text": "own"}])
+    retriever.add_document("c.txt", vectors[2:], [{"type": "text", "text": "other"}])
+    shared = int(ids[0])
+    retriever.add_duplicates({shared: [{"doc_id": "b.txt", "pages": [3], "start": 0, "end": 6},
+                                       {"doc_id": "d.txt", "pages": [1]}]})
+
+    assert retriever.remove_document("a.txt") == 1
+    assert int(ids[1]) not in retriever.metadata
+    meta = retriever.metadata[shared]
+    assert (meta["doc_id"], meta["pages"], meta["start"], meta["end"]) == ("b.txt", [3], 0, 6)
+    assert meta["duplicates"] == [{"doc_id": "d.txt", "pages": [1]}]
+    assert meta["text"] == "shared"
+    assert len(retriever) == 2
+
+    # dropping a document that only referenced the chunk leaves it in place
+    assert retriever.remove_document("d.txt") == 0
+    assert "duplicates" not in retriever.metadata[shared]
+    assert retriever.remove_document("b.txt") == 1
+    assert retriever.metadata.ids().tolist() == [2]
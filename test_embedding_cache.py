@@ -0,0 +1,93 @@
+"""EmbeddingCache lookups, LRU eviction and persistence."""
+import numpy as np
+
+from RAG.embedding_cache import EmbeddingCache, cached_embeddings
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).random((n, dim), dtype="float32")
+
+
+def keys(*texts):
+    return [EmbeddingCache.key(t) for t in texts]
+
+
+def test_put_then_get(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    vecs = vectors(3)
+    cache.put_many(keys("a", "b", "c"), vecs)
+    found, hits = cache.get_many(keys("c", "missing", "a"))
+    cache.close()
+    assert hits.tolist() == [True, False, True]
+    np.testing.assert_array_equal(found[[0, 2]], vecs[[2, 0]])
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model", max_entries=3, initial_capacity=1)
+    vecs = vectors(4)
+    cache.put_many(keys("a", "b", "c"), vecs[:3])
+    cache.get_many(keys("a"))  # "b" is now the oldest
+    cache.put_many(keys("d"), vecs[3:])
+    found, hits = cache.get_many(keys("a", "b", "c", "d"))
+    cache.close()
+    assert len(cache) == 3
+    assert hits.tolist() == [True, False, True, True]
+    np.testing.assert_array_equal(found[[0, 2, 3]], vecs[[0, 2, 3]])
+
+
+def test_entries_survive_reload_and_eviction(tmp_path):
+    vecs = vectors(50)
+    cache = EmbeddingCache(str(tmp_path), "model", max_entries=20)
+    for i in range(50):
+        cache.put_many(keys(f"text {i}"), vecs[i:i + 1])
+    cache.close()
+
+    reloaded = EmbeddingCache(str(tmp_path), "model", max_entries=20)
+    found, hits = reloaded.get_many(keys(*(f"text {i}" for i in range(50))))
+    reloaded.close()
+    assert len(reloaded) == 20
+    assert hits.tolist() == [False] * 30 + [True] * 20
+    np.testing.assert_array_equal(found[30:], vecs[30:])
+
+
+def test_instances_sharing_a_directory_see_each_others_writes(tmp_path):
+    first = EmbeddingCache(str(tmp_path), "model")
+    second = EmbeddingCache(str(tmp_path), "model")
+    vecs = vectors(2)
+    first.put_many(keys("a"), vecs[:1])
+    second.put_many(keys("b"), vecs[1:])
+    found, hits = first.get_many(keys("a", "b"))
+    assert hits.all()
+    np.testing.assert_array_equal(found, vecs)
+    found, hits = second.get_many(keys("a", "b"))
+    first.close()
+    second.close()
+    assert hits.all()
+    np.testing.assert_array_equal(found, vecs)
+
+
+def test_models_are_cached_separately(tmp_path):
+    one = EmbeddingCache(str(tmp_path), "jina/v4")
+    one.put_many(keys("a"), vectors(1))
+    other = EmbeddingCache(str(tmp_path), "hashing-768")
+    found, hits = other.get_many(keys("a"))
+    one.close()
+    other.close()
+    assert found is None and not hits.any()
+
+
+def test_cached_embeddings_only_embeds_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return np.stack([np.full(4, len(t), dtype="float32") for t in texts])
+
+    first = cached_embeddings(["a", "bb", "a"], embed, cache)
+    second = cached_embeddings(["bb", "ccc"], embed, cache)
+    cache.close()
+    assert calls == [["a", "bb"], ["ccc"]]
+    assert first[:, 0].tolist() == [1, 2, 1]
+    assert second[:, 0].tolist() == [2, 3]
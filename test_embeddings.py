@@ -0,0 +1,57 @@
+"""JinaEmbeddingClient against the local mock Jina server (no network)."""
+import numpy as np
+
+from benchmarks.mock_servers import MockJinaServer, hashed_embedding
+from RAG.embeddings import JinaEmbeddingClient
+
+
+def expected(texts, dim):
+    return np.stack([hashed_embedding(t, dim) for t in texts])
+
+
+def test_batches_by_count_and_chars():
+    client = JinaEmbeddingClient("key-batches", url="http://127.0.0.1:9", batch_size=2, max_batch_chars=10)
+    try:
+        batches = list(client.batches(["aaaa", "bbbb", "cccc", "dddddddd", "ee"]))
+    finally:
+        client.close()
+    assert batches == [(0, ["aaaa", "bbbb"]), (2, ["cccc"]), (3, ["dddddddd", "ee"])]
+
+
+def test_embed_posts_one_request_per_batch():
+    texts = [f"chunk number {i} about topic {i % 3}" for i in range(10)]
+    with MockJinaServer(latency=0.0) as server:
+        client = JinaEmbeddingClient("key-count", url=server.url, batch_size=3)
+        try:
+            out = client.embed(texts)
+        finally:
+            client.close()
+        assert server.stats()["requests"] == 4
+        assert server.stats()["items"] == len(texts)
+    np.testing.assert_allclose(out, expected(texts, server.dim), atol=1e-6)
+
+
+def test_embed_keeps_input_order_when_batches_finish_out_of_order():
+    texts = [f"text {i} " + "word " * i for i in range(12)]
+    with MockJinaServer(latency=0.02, jitter=0.02) as server:
+        client = JinaEmbeddingClient("key-order", url=server.url, batch_size=1, max_workers=6)
+        try:
+            out = client.embed(texts)
+        finally:
+            client.close()
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out, expected(texts, server.dim), atol=1e-6)
+
+
+def test_embed_retries_rate_limited_batches():
+    texts = [f"rate limited text {i}" for i in range(4)]
+    with MockJinaServer(latency=0.0, rate_limit=5, burst=1) as server:
+        client = JinaEmbeddingClient("key-retry", url=server.url, batch_size=1, max_workers=4)
+        try:
+            out = client.embed(texts)
+        finally:
+            client.close()
+        stats = server.stats()
+    assert stats["rate_limited"] > 0
+    assert stats["requests"] == len(texts) + stats["rate_limited"]
+    np.testing.assert_allclose(out, expected(texts, server.dim), atol=1e-6)
@@ -0,0 +1,113 @@
+"""Index backends, automatic selection and retraining."""
+import numpy as np
+import pytest
+
+from RAG.retriever import (
+    FLAT_MAX_VECTORS, INDEX_KINDS, IVF_PQ_MIN_TRAIN, FAISSRetriever, build_index, choose_index_kind,
+    estimate_index_bytes, recall_at_k, trainable_kind,
+)
+
+
+def vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).random((n, dim), dtype="float32")
+
+
+def metas(n):
+    return [{"type": "text", "text": f"chunk {i}"} for i in range(n)]
+
+
+@pytest.mark.parametrize("kind", INDEX_KINDS)
+def test_every_kind_adds_searches_removes_and_reloads(kind, tmp_path):
+    vecs = vectors(2000)
+    retriever = FAISSRetriever(kind=kind, nprobe=8)
+    retriever.add_document("a.pdf", vecs[:1000], metas(1000))
+    retriever.add_document("b.pdf", vecs[1000:], metas(1000))
+    assert retriever.kind == trainable_kind(kind, 1000)
+
+    exact = FAISSRetriever(vecs, metas(2000)).search_batch(vecs[:20], 10)[0]
+    assert recall_at_k(retriever.search_batch(vecs[:20], 10)[0], exact) > 0.6
+
+    retriever.remove_document("a.pdf")
+    assert len(retriever) == 1000
+    ids, _ = retriever.search_batch(vecs[:20], 10)
+    assert ids.min() >= 1000
+    retriever.save(str(tmp_path))
+    loaded = FAISSRetriever.load(str(tmp_path))
+    assert loaded.kind == retriever.kind and len(loaded) == 1000
+
+
+def test_small_corpora_stay_exact_and_shrink_to_fit_the_budget():
+    dim = 64
+    assert choose_index_kind(1000, dim) == "flat"
+    flat = estimate_index_bytes("flat", 1000, dim)
+    assert choose_index_kind(1000, dim, memory_budget=flat - 1) == "fp16"
+    assert choose_index_kind(1000, dim, memory_budget=1) == "sq8"
+
+
+def test_large_corpora_move_to_approximate_kinds():
+    dim = 64
+    n = FLAT_MAX_VECTORS * 10
+    assert choose_index_kind(n, dim) == "hnsw"
+    hnsw = estimate_index_bytes("hnsw", n, dim)
+    assert choose_index_kind(n, dim, memory_budget=hnsw - 1) == "ivf_flat"
+    assert choose_index_kind(n, dim, memory_budget=1) == "ivf_pq"
+
+
+def test_kinds_fall_back_until_they_can_be_trained():
+    assert trainable_kind("ivf_pq", IVF_PQ_MIN_TRAIN - 1) == "ivf_flat"
+    assert trainable_kind("ivf_pq", IVF_PQ_MIN_TRAIN) == "ivf_pq"
+    assert trainable_kind("ivf_sq8", 10) == "flat"
+    assert trainable_kind("hnsw", 1) == "hnsw"
+    with pytest.raises(ValueError):
+        build_index("ivf_pq", 16, vectors(100))
+    with pytest.raises(ValueError):
+        build_index("ivf_flat", 16)
+
+
+def test_explicit_kind_is_kept_and_reached_once_trainable():
+    vecs = vectors(IVF_PQ_MIN_TRAIN + 100)
+    retriever = FAISSRetriever(kind="ivf_pq")
+    retriever.add_document("a", vecs[:100], metas(100))
+    assert (retriever.kind, retriever.requested_kind) == ("ivf_flat", "ivf_pq")
+    retriever.add_document("b", vecs[100:], metas(len(vecs) - 100))
+    assert retriever.auto_tune()
+    assert retriever.kind == "ivf_pq"
+
+    flat = FAISSRetriever(kind="flat")
+    flat.add_document("a", vecs[:5000], metas(5000))
+    assert not flat.auto_tune(memory_budget=1)
+    assert flat.kind == "flat"
+
+
+def test_auto_switches_kind_as_the_corpus_outgrows_it(monkeypatch):
+    monkeypatch.setattr("RAG.retriever.FLAT_MAX_VECTORS", 500)
+    vecs = vectors(1200)
+    retriever = FAISSRetriever(kind="auto")
+    retriever.add_document("a", vecs[:100], metas(100))
+    assert retriever.kind == "flat"
+    retriever.add_document("b", vecs[100:], metas(1100))
+    assert retriever.auto_tune()
+    assert retriever.kind == "hnsw"
+    assert retriever.search(vecs[700][None, :], top_k=1) == [700]
+
+
+def test_trained_kinds_are_retrained_as_the_corpus_grows():
+    vecs = vectors(1000)
+    retriever = FAISSRetriever(kind="ivf_flat")
+    retriever.add_document("a", vecs[:100], metas(100))
+    nlist = retriever.index.nlist
+    retriever.add_document("b", vecs[100:], metas(900))
+    assert retriever.auto_tune()
+    assert retriever.index.nlist > nlist
+    assert retriever.trained_size == 1000
+
+
+def test_load_applies_the_configured_kind_and_search_params(tmp_path):
+    retriever = FAISSRetriever(kind="ivf_flat")
+    retriever.add_document("a", vectors(2000), metas(2000))
+    retriever.save(str(tmp_path))
+
+    tuned = FAISSRetriever.load(str(tmp_path), nprobe=3)
+    assert tuned.kind == "ivf_flat" and tuned.index.nprobe == 3
+    switched = FAISSRetriever.load(str(tmp_path), kind="flat")
+    assert switched.kind == "flat" and len(switched) == 2000
@@ -0,0 +1,80 @@
+"""Lazy heavy imports and skipping uploads whose content is already indexed."""
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from RAG.lazy import LazyModule
+from RAG.service import RAGService, content_digest
+
+
+def test_lazy_module_imports_on_first_use():
+    json = LazyModule("json")
+    assert json._module is None
+    assert json.loads("[1]") == [1]
+    assert json._module is sys.modules["json"]
+
+
+def test_missing_modules_fail_on_use_with_an_install_hint():
+    missing = LazyModule("no_such_module_here", "no-such-package")
+    with pytest.raises(ModuleNotFoundError, match="pip install no-such-package"):
+        missing.anything
+
+
+def loaded_after(statement):
+    code = (f"import sys; {statement}; "
+            "print(','.join(m for m in ('numpy', 'faiss', 'pypdf', 'easyocr', 'groq') if m in sys.modules))")
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split()
+
+
+def test_heavy_packages_are_not_imported_up_front():
+    assert loaded_after("import RAG.settings") == []
+    assert set(loaded_after("import RAG.service")[0].split(",")) == {"numpy"}
+
+
+def test_the_digest_covers_document_images_and_image_mode():
+    base = content_digest(b"doc", [b"img"], "vision")
+    assert content_digest(b"doc", [b"img"], "vision") == base
+    assert base not in {content_digest(b"doc2", [b"img"], "vision"), content_digest(b"doc", [b"img2"], "vision"),
+                        content_digest(b"doc", [b"img"], "ocr"), content_digest(b"doc", [], "vision")}
+    # the image mode is irrelevant without images
+    assert content_digest(b"doc", [], "ocr") == content_digest(b"doc", [], "vision")
+
+
+def local_service(cache_dir):
+    return RAGService(SimpleNamespace(CACHE_DIR=str(cache_dir), EMBEDDING_PROVIDER="hashing", EMBEDDING_DIM=32,
+                                      INDEX_KIND="flat", CHUNK_SIZE=10, CHUNK_OVERLAP=2))
+
+
+DOCUMENT = " ".join(f"sentence number {i} about rivers and otters." for i in range(20)).encode("utf-8")
+
+
+def test_unchanged_uploads_are_skipped_across_restarts(tmp_path):
+    service = local_service(tmp_path)
+    first = service.ingest(DOCUMENT, "doc.txt", None)
+    version = service.retriever.version
+    again = service.ingest(DOCUMENT, "doc.txt", None)
+    assert not first["skipped"] and again["skipped"]
+    assert again["chunks"] == first["chunks"]
+    assert service.retriever.version == version
+
+    reopened = local_service(tmp_path)
+    assert reopened.ingest(DOCUMENT, "doc.txt", None)["skipped"]
+    assert not reopened.ingest(DOCUMENT + b" One more.", "doc.txt", None)["skipped"]
+    assert not reopened.ingest(DOCUMENT, "copy.txt", None)["skipped"]
+
+
+def test_uploads_with_failed_images_are_retried(tmp_path):
+    service = local_service(tmp_path)
+    calls = []
+
+    def describe(image):
+        calls.append(image)
+        raise RuntimeError("vision unavailable")
+
+    service.describer = lambda image_mode, groq_key=None: (describe, "Image description: ")
+    first = service.ingest(DOCUMENT, "doc.txt", None, images=[b"png"])
+    assert [str(e) for e in first["errors"]] == ["vision unavailable"]
+    assert not service.ingest(DOCUMENT, "doc.txt", None, images=[b"png"])["skipped"]
+    assert len(calls) == 2
@@ -0,0 +1,49 @@
+"""Groq answers, streamed and not, against the local mock Groq server."""
+import pytest
+
+from benchmarks.mock_servers import MockGroqServer
+from RAG.clients import get_groq_client
+from RAG.llm import ask_llm, build_prompt, stream_llm
+from RAG.reranker import tokenize
+
+
+@pytest.fixture
+def groq_server(monkeypatch):
+    # the Groq SDK reads its endpoint from the environment
+    with MockGroqServer(latency=0.05, tokens_per_sec=200, answer_tokens=8) as server:
+        monkeypatch.setenv("GROQ_BASE_URL", server.url)
+        yield server
+
+
+def expected_answer(context, question, n=8):
+    words = tokenize(build_prompt(context, question))
+    return " ".join(words[i % len(words)] for i in range(n))
+
+
+def test_prompt_contains_context_and_question():
+    prompt = build_prompt("Paris is in France.", "Where is Paris?")
+    assert "Paris is in France." in prompt and "Question: Where is Paris?" in prompt
+
+
+def test_ask_llm_returns_the_answer(groq_server):
+    answer = ask_llm("the sky is blue", "what colour is the sky", "key-ask", "mock-model")
+    assert answer == expected_answer("the sky is blue", "what colour is the sky")
+    assert groq_server.stats()["requests"] == 1
+
+
+def test_stream_llm_yields_deltas_and_reports_metrics(groq_server):
+    metrics = {}
+    deltas = list(stream_llm("grass is green", "what colour is grass", "key-stream", "mock-model",
+                             metrics=metrics))
+    assert len(deltas) == 8
+    assert "".join(deltas).strip() == expected_answer("grass is green", "what colour is grass")
+    assert metrics["tokens"] == 8
+    assert 0.05 <= metrics["ttft"] < metrics["total"]
+    assert metrics["tokens_per_sec"] > 0
+
+
+def test_clients_are_reused_per_key_and_settings(groq_server):
+    client = get_groq_client("key-reuse", max_retries=0)
+    assert get_groq_client("key-reuse", max_retries=0) is client
+    assert get_groq_client("key-other", max_retries=0) is not client
+    assert get_groq_client("key-reuse", max_retries=1) is not client
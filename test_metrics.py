@@ -0,0 +1,82 @@
+"""Per-stage metrics: spans, percentiles, traces and the Prometheus text format."""
+import asyncio
+
+import pytest
+
+from RAG.metrics import MetricsRegistry, span, trace
+
+
+def test_spans_record_counts_errors_and_counters():
+    registry = MetricsRegistry()
+    with span("embed", items=3, nbytes=30, registry=registry) as s:
+        s.tokens = 12
+    with pytest.raises(RuntimeError):
+        with span("embed", items=1, registry=registry):
+            raise RuntimeError("boom")
+    (row,) = registry.snapshot()
+    assert row["stage"] == "embed"
+    assert (row["count"], row["errors"], row["items"], row["bytes"], row["tokens"]) == (2, 1, 4, 30, 12)
+    assert row["total"] >= 0 and row["mean"] == row["total"] / 2
+
+
+def test_percentiles_cover_the_recent_window():
+    registry = MetricsRegistry(window=100)
+    for seconds in range(1, 201):
+        registry.observe("search", seconds / 1000)
+    (row,) = registry.snapshot()
+    assert row["count"] == 200
+    assert row["p50"] == pytest.approx(0.1505)
+    assert row["p99"] == pytest.approx(0.19901)
+    assert row["total"] == pytest.approx(sum(range(1, 201)) / 1000)
+
+
+def test_abandoned_generators_are_not_errors():
+    registry = MetricsRegistry()
+
+    def stream():
+        with span("llm.stream", registry=registry):
+            yield 1
+            yield 2
+
+    gen = stream()
+    next(gen)
+    gen.close()
+    assert registry.snapshot()[0]["errors"] == 0
+
+
+def test_trace_collects_this_contexts_spans_only():
+    registry = MetricsRegistry()
+
+    async def request(name):
+        with trace() as spans:
+            await asyncio.to_thread(registry.observe, name, 0.01)
+            await asyncio.sleep(0)
+            registry.observe(name + ".after", 0.02)
+        return spans
+
+    async def both():
+        return await asyncio.gather(request("a"), request("b"))
+
+    a, b = asyncio.run(both())
+    assert [s["stage"] for s in a] == ["a", "a.after"]
+    assert [s["stage"] for s in b] == ["b", "b.after"]
+    registry.observe("outside", 0.01)
+    assert len(registry.snapshot()) == 5
+
+
+def test_prometheus_rendering_and_dump(tmp_path):
+    registry = MetricsRegistry()
+    registry.observe("index.add", 0.5, items=10, nbytes=100)
+    text = registry.render_prometheus(prefix="t")
+    assert "# TYPE t_stage_seconds summary" in text
+    assert 't_stage_seconds{stage="index.add",quantile="0.5"} 0.500000' in text
+    assert 't_stage_seconds_count{stage="index.add"} 1' in text
+    assert 't_stage_items_total{stage="index.add"} 10' in text
+    assert text.endswith("\n")
+
+    path = str(tmp_path / "rag.prom")
+    registry.dump(path, prefix="t")
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == text
+    registry.reset()
+    assert registry.snapshot() == []
@@ -0,0 +1,79 @@
+"""OCR engine reuse, image loading and batched reads (EasyOCR replaced by a fake)."""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import RAG.ocr as ocr
+
+
+class FakeReader:
+    created = 0
+
+    def __init__(self, languages, gpu=False):
+        FakeReader.created += 1
+        self.languages = languages
+        self.shapes = []
+
+    def readtext(self, pixels):
+        self.shapes.append(pixels.shape)
+        return [([0, 0], "hello", 0.9), ([1, 1], "world", 0.8)]
+
+
+class FakeEasyOCR:
+    Reader = FakeReader
+
+
+@pytest.fixture
+def fake_easyocr(monkeypatch):
+    FakeReader.created = 0
+    monkeypatch.setattr(ocr, "easyocr", FakeEasyOCR)
+    monkeypatch.setattr(ocr, "_engines", {})
+
+
+def png(width, height):
+    out = io.BytesIO()
+    Image.new("RGBA", (width, height), (255, 0, 0, 128)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_load_image_accepts_every_input_and_downscales(tmp_path):
+    data = png(400, 200)
+    path = tmp_path / "image.png"
+    path.write_bytes(data)
+    for source in (data, str(path), Image.open(io.BytesIO(data))):
+        pixels = ocr.load_image(source, max_side=100)
+        assert pixels.shape == (50, 100, 3)
+    array = np.zeros((10, 20, 3), dtype=np.uint8)
+    assert ocr.load_image(array) is array
+    assert ocr.load_image(data).shape == (200, 400, 3)
+
+
+def test_engine_is_built_and_warmed_up_once(fake_easyocr):
+    first = ocr.get_ocr_engine()
+    assert ocr.get_ocr_engine() is first
+    assert FakeReader.created == 1
+    assert first.reader.shapes == [(64, 256, 3)]
+    assert ocr.get_ocr_engine(max_side=800) is not first
+    assert FakeReader.created == 2
+
+
+def test_read_joins_detected_text_after_downscaling(fake_easyocr):
+    engine = ocr.OCREngine(max_side=100)
+    assert engine.read(png(1000, 500)) == "hello world"
+    assert engine.reader.shapes[-1] == (50, 100, 3)
+
+
+def test_read_batch_times_each_image(fake_easyocr):
+    results = ocr.OCREngine().read_batch([png(10, 10), png(20, 20)])
+    assert [r["text"] for r in results] == ["hello world"] * 2
+    assert all(r["seconds"] >= 0 for r in results)
+
+
+def test_extract_text_from_image_reuses_the_engine(fake_easyocr, tmp_path):
+    path = tmp_path / "scan.png"
+    path.write_bytes(png(30, 30))
+    assert ocr.extract_text_from_image(str(path)) == "hello world"
+    assert ocr.extract_text_from_image(str(path)) == "hello world"
+    assert FakeReader.created == 1
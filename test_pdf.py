@@ -0,0 +1,37 @@
+"""PDF page extraction, serial and in a process pool."""
+import pytest
+
+from benchmarks.corpus import make_pages, make_pdf
+from RAG.pdf import iter_pdf_pages
+
+
+PAGES = make_pages(9, words_per_page=60)
+PDF = make_pdf(PAGES)
+
+
+def words(text):
+    return text.split()
+
+
+def test_serial_extraction_keeps_page_order():
+    texts = list(iter_pdf_pages(PDF, workers=1))
+    assert len(texts) == len(PAGES)
+    assert [words(t) for t in texts] == [words(p) for p in PAGES]
+
+
+def test_pool_extraction_matches_serial_and_reports_stats():
+    stats = {}
+    texts = list(iter_pdf_pages(PDF, workers=2, pages_per_task=2, stats=stats))
+    assert texts == list(iter_pdf_pages(PDF, workers=1))
+    assert stats["pages"] == stats["total_pages"] == len(PAGES)
+    assert stats["seconds"] > 0
+    assert stats["pages_per_sec"] == pytest.approx(stats["pages"] / stats["seconds"])
+
+
+def test_pages_are_yielded_as_they_are_ready():
+    stats = {}
+    pages = iter_pdf_pages(PDF, workers=2, pages_per_task=2, stats=stats)
+    first = next(pages)
+    assert words(first) == words(PAGES[0])
+    assert stats["pages"] < len(PAGES)
+    pages.close()
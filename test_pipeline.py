@@ -0,0 +1,151 @@
+"""The asyncio ingest/query pipeline with local embeddings and the mock Groq server."""
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks.mock_servers import MockGroqServer
+from RAG.answer_cache import AnswerCache
+from RAG.pipeline import embed_document, ingest, query, retrieve, retrieve_batch, run
+from RAG.providers import HashingProvider
+from RAG.reranker import BM25Index
+from RAG.retriever import FAISSRetriever
+
+DOCUMENT = " ".join(f"The {animal} lives in the {place} and eats {food}."
+                    for animal, place, food in [("otter", "river", "fish"), ("camel", "desert", "dates"),
+                                                ("panda", "forest", "bamboo"), ("puffin", "cliffs", "sprats")]
+                    for _ in range(20)).encode("utf-8")
+
+
+class SlowProvider(HashingProvider):
+    """Local embeddings with a fixed delay per call, counting calls in flight."""
+
+    def __init__(self, delay=0.05, fail=False):
+        super().__init__(dim=64)
+        self.delay = delay
+        self.fail = fail
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._count_lock = threading.Lock()
+
+    def embed(self, texts):
+        with self._count_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("embedding service down")
+            return super().embed(texts)
+        finally:
+            with self._count_lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def groq_server(monkeypatch):
+    with MockGroqServer(latency=0.01, tokens_per_sec=1000, answer_tokens=6) as server:
+        monkeypatch.setenv("GROQ_BASE_URL", server.url)
+        yield server
+
+
+def test_text_batches_and_images_are_embedded_concurrently():
+    provider = SlowProvider()
+
+    def describe(image):
+        time.sleep(0.1)
+        if image == b"broken":
+            raise ValueError("unreadable image")
+        return f"a picture of {image.decode()}"
+
+    start = time.perf_counter()
+    prepared = run(embed_document(DOCUMENT, "animals.txt", None, images=[b"otter", b"broken", b"camel"],
+                                  describe=describe, provider=provider, chunk_size=20, overlap=5,
+                                  batch_size=2, concurrency=4))
+    elapsed = time.perf_counter() - start
+
+    kinds = [m["type"] for m in prepared["metadata"]]
+    assert kinds[:2] == ["image", "image"] and set(kinds[2:]) == {"text"}
+    assert prepared["chunks"][0] == "Image description: a picture of otter"
+    assert prepared["embeddings"].shape == (len(prepared["chunks"]), 64)
+    assert [str(e) for e in prepared["errors"]] == ["unreadable image"]
+    assert len(prepared["image_seconds"]) == 3
+    assert provider.max_in_flight > 1
+    # the serial sum of the stages would be well above this
+    serial = 3 * 0.1 + (len(prepared["chunks"]) - 2 + 1) // 2 * provider.delay
+    assert elapsed < serial
+
+
+def test_a_failing_text_stage_raises_the_original_error():
+    with pytest.raises(RuntimeError, match="embedding service down"):
+        run(embed_document(DOCUMENT, "animals.txt", None, provider=SlowProvider(fail=True)))
+
+
+def test_empty_documents_are_rejected():
+    with pytest.raises(ValueError, match="No text"):
+        run(embed_document(b"   ", "empty.txt", None, provider=HashingProvider(dim=64)))
+
+
+def test_ingest_then_query_answers_and_caches(groq_server):
+    provider = HashingProvider(dim=64)
+    retriever = FAISSRetriever(dim=64)
+    bm25 = BM25Index()
+    result = run(ingest(DOCUMENT, "animals.txt", retriever, None, bm25=bm25, provider=provider,
+                        chunk_size=20, overlap=5))
+    assert len(result["ids"]) == len(retriever) == len(result["chunks"])
+    assert {"parse", "text", "embed_total", "index", "total"} <= set(result["timings"])
+
+    cache = AnswerCache()
+    kwargs = dict(retriever=retriever, jina_key=None, groq_key="key-pipeline", model="mock-model",
+                  bm25=bm25, answer_cache=cache, provider=provider)
+    first = run(query("What does the panda eat?", **kwargs))
+    assert not first["cached"]
+    assert "bamboo" in first["context"]
+    assert "panda" in retriever.metadata[first["ranked"][0]["id"]]["text"]
+    assert first["answer"]
+    assert {"embed", "retrieve", "llm", "total"} <= set(first["timings"])
+
+    second = run(query("what does the panda eat", **kwargs))
+    assert second["cached"] and second["answer"] == first["answer"]
+    assert groq_server.stats()["requests"] == 1
+
+
+def test_queries_run_concurrently_on_one_loop(groq_server):
+    groq_server.latency = 0.2
+    provider = HashingProvider(dim=64)
+    retriever = FAISSRetriever(dim=64)
+    run(ingest(DOCUMENT, "animals.txt", retriever, None, provider=provider, chunk_size=20, overlap=5))
+
+    async def many():
+        return await asyncio.gather(*(query(f"where does the {a} live", retriever, None, "key-concurrent",
+                                            "mock-model", provider=provider)
+                                      for a in ("otter", "camel", "panda", "puffin")))
+
+    start = time.perf_counter()
+    results = run(many())
+    assert len(results) == 4
+    assert time.perf_counter() - start < 4 * 0.2
+
+
+def test_run_works_inside_a_running_loop():
+    async def outer():
+        return run(asyncio.sleep(0, result="done"))
+
+    assert asyncio.run(outer()) == "done"
+
+
+def test_batched_retrieval_matches_single_questions():
+    provider = HashingProvider(dim=64)
+    retriever = FAISSRetriever(dim=64)
+    bm25 = BM25Index()
+    run(ingest(DOCUMENT, "animals.txt", retriever, None, bm25=bm25, provider=provider, chunk_size=20, overlap=5))
+    questions = ["what does the otter eat", "where does the camel live"]
+    embeddings = provider.embed(questions)
+    batched = retrieve_batch(questions, embeddings, retriever, bm25, top_k=5)
+    for question, embedding, (context, ranked) in zip(questions, embeddings, batched):
+        single_context, single_ranked = retrieve(question, embedding[None, :], retriever, bm25, top_k=5)
+        assert context == single_context
+        assert [r["id"] for r in ranked] == [r["id"] for r in single_ranked]
+    assert np.isfinite([r["score"] for r in batched[0][1]]).all()
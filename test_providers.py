@@ -0,0 +1,77 @@
+"""Local embedding providers and the provider registry."""
+import importlib.util
+
+import numpy as np
+import pytest
+
+from RAG.embedding_cache import EmbeddingCache
+from RAG.providers import EmbeddingProvider, HashingProvider, embed_texts, get_embedding_provider
+
+TEXTS = ["the otter eats fish in the river", "an otter eats fish by the river",
+         "the camel crosses the desert", ""]
+
+
+def test_hashing_vectors_are_unit_length_and_deterministic():
+    provider = HashingProvider(dim=128)
+    vectors = provider.embed(TEXTS)
+    assert vectors.shape == (4, 128) and vectors.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vectors[:3], axis=1), 1.0, rtol=1e-5)
+    assert not vectors[3].any()
+    np.testing.assert_array_equal(vectors, HashingProvider(dim=128).embed(TEXTS))
+    assert provider.name == "hashing-128-bigrams"
+    assert HashingProvider(dim=128, bigrams=False).name == "hashing-128"
+
+
+def test_texts_sharing_words_are_closer():
+    vectors = HashingProvider(dim=256).embed(TEXTS[:3])
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+def test_process_pool_batches_match_the_serial_result():
+    texts = [f"document {i} about topic {i % 7}" for i in range(50)]
+    provider = HashingProvider(dim=64, workers=2, batch_size=8, parallel_threshold=10)
+    try:
+        parallel = provider.embed(texts)
+    finally:
+        provider.close()
+    np.testing.assert_allclose(parallel, HashingProvider(dim=64, workers=1).embed(texts), rtol=1e-6)
+
+
+def test_local_providers_are_shared_per_settings():
+    provider = get_embedding_provider("hashing", dim=32)
+    assert get_embedding_provider("hashing", dim=32) is provider
+    assert get_embedding_provider("hashing", dim=48) is not provider
+    assert not provider.remote
+    with pytest.raises(ValueError, match="Unknown embedding provider"):
+        get_embedding_provider("word2vec")
+    with pytest.raises(ValueError, match="model_path"):
+        get_embedding_provider("onnx")
+
+
+@pytest.mark.skipif(all(importlib.util.find_spec(m) for m in ("onnxruntime", "tokenizers")),
+                    reason="onnxruntime and tokenizers are installed")
+def test_onnx_reports_missing_dependencies(tmp_path):
+    with pytest.raises(ModuleNotFoundError, match="pip install onnxruntime tokenizers"):
+        get_embedding_provider("onnx", model_path=str(tmp_path))
+
+
+class CountingProvider(EmbeddingProvider):
+    name = "counting"
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return HashingProvider(dim=16).embed(texts)
+
+
+def test_embed_texts_only_computes_cache_misses(tmp_path):
+    provider = CountingProvider()
+    cache = EmbeddingCache(str(tmp_path), provider.name)
+    first = embed_texts(TEXTS[:2], provider, cache)
+    second = embed_texts(TEXTS[:3], provider, cache)
+    assert provider.embedded == TEXTS[:3]
+    np.testing.assert_array_equal(first, second[:2])
+    assert embed_texts(TEXTS[:1], provider).shape == (1, 16)
+    cache.close()
@@ -0,0 +1,88 @@
+"""BM25 scoring, reciprocal rank fusion and hybrid reranking."""
+import math
+
+import numpy as np
+import pytest
+
+from RAG.reranker import BM25Index, hybrid_rerank, reciprocal_rank_fusion, simple_rerank, tokenize
+
+
+DOCS = {
+    10: "the cat sat on the mat",
+    11: "dogs chase cats in the park",
+    12: "financial report for the third quarter",
+    13: "the cat and the cat food",
+}
+
+
+def index():
+    bm25 = BM25Index()
+    bm25.add(list(DOCS), list(DOCS.values()))
+    return bm25
+
+
+def test_tokenize_lowercases_whole_words():
+    assert tokenize("The Cat's mat, 3rd-quarter!") == ["the", "cat", "s", "mat", "3rd", "quarter"]
+
+
+def test_scores_match_okapi_bm25():
+    bm25 = BM25Index(k1=1.5, b=0.75)
+    bm25.add([1, 2], ["a a b", "b c"])
+    n, k1, b, avg = 2, 1.5, 0.75, 2.5
+
+    def term(tf, df, length):
+        idf = math.log1p((n - df + 0.5) / (df + 0.5))
+        return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg))
+
+    scores = bm25.scores("a b")
+    assert scores[0] == pytest.approx(term(2, 1, 3) + term(1, 2, 3), rel=1e-5)
+    assert scores[1] == pytest.approx(term(1, 2, 2), rel=1e-5)
+
+
+def test_top_k_and_scores_for_ids():
+    bm25 = index()
+    ids, scores = bm25.top_k("cat", k=5)
+    assert ids.tolist() == [13, 10]
+    assert scores[0] > scores[1] > 0
+    assert bm25.scores("cat", ids=[12, 10, 99]).tolist()[::2] == [0.0, 0.0]
+    assert bm25.top_k("unknown", k=3)[0].tolist() == []
+
+
+def test_removed_and_replaced_documents_are_rescored():
+    bm25 = index()
+    bm25.remove([13])
+    assert bm25.top_k("cat")[0].tolist() == [10]
+    bm25.add([13], ["quarterly cat report"])
+    assert 13 in bm25.top_k("report")[0].tolist()
+    assert len(bm25) == 4
+
+
+def test_from_metadata_indexes_chunks_with_text():
+    bm25 = BM25Index.from_metadata({1: {"type": "text", "text": "hello world"}, 2: {"type": "image"}})
+    assert len(bm25) == 1
+    assert bm25.top_k("world")[0].tolist() == [1]
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert fused[1] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[3] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[2] == pytest.approx(1 / 62)
+    assert max(fused, key=fused.get) == 1
+
+
+def test_hybrid_rerank_promotes_lexical_matches():
+    bm25 = index()
+    # dense order: 12, 11, 10, 13 -- the two chunks about "cat" come last
+    ranked = hybrid_rerank("cat mat", [12, 11, 10, 13], np.array([0.1, 0.2, 0.3, 0.4]), bm25)
+    assert [r["id"] for r in ranked][:1] == [10]
+    by_id = {r["id"]: r for r in ranked}
+    assert by_id[12]["bm25"] == 0.0 and by_id[10]["bm25"] > 0
+    assert by_id[11]["distance"] == pytest.approx(0.2)
+    assert hybrid_rerank("cat", [], [], bm25) == []
+
+
+def test_simple_rerank_orders_by_relevance():
+    docs = list(DOCS.values())
+    assert simple_rerank("cat food", docs)[0] == DOCS[13]
+    assert simple_rerank("cat", []) == []
@@ -0,0 +1,128 @@
+"""FAISSRetriever persistence and per-document add/remove."""
+import os
+
+import numpy as np
+import pytest
+
+from RAG.retriever import INDEX_FILE, FAISSRetriever
+
+
+def vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).random((n, dim), dtype="float32")
+
+
+def metas(n, prefix="chunk"):
+    return [{"type": "text", "text": f"{prefix} {i}"} for i in range(n)]
+
+
+def nearest(retriever, query):
+    return retriever.search(query[None, :], top_k=1)[0]
+
+
+def test_ids_are_stable_across_removal_and_reload(tmp_path):
+    vecs = vectors(30)
+    retriever = FAISSRetriever()
+    a = retriever.add_document("a.pdf", vecs[:10], metas(10, "a"))
+    b = retriever.add_document("b.pdf", vecs[10:20], metas(10, "b"))
+    assert a.tolist() == list(range(10)) and b.tolist() == list(range(10, 20))
+
+    assert retriever.remove_document("a.pdf") == 10
+    c = retriever.add_document("c.pdf", vecs[20:], metas(10, "c"))
+    assert c.tolist() == list(range(20, 30))
+    retriever.save(str(tmp_path))
+
+    loaded = FAISSRetriever.load(str(tmp_path))
+    assert len(loaded) == 20
+    assert sorted(loaded.documents) == ["b.pdf", "c.pdf"]
+    assert loaded.metadata[25] == {"type": "text", "text": "c 5", "doc_id": "c.pdf"}
+    assert nearest(loaded, vecs[15]) == 15
+    assert loaded.add(vecs[:1], metas(1)).tolist() == [30]
+
+
+def test_add_document_replaces_the_previous_version():
+    vecs = vectors(8)
+    retriever = FAISSRetriever()
+    retriever.add_document("a.pdf", vecs[:4], metas(4, "old"))
+    ids = retriever.add_document("a.pdf", vecs[4:], metas(4, "new"))
+    assert len(retriever) == 4
+    assert retriever.documents["a.pdf"].tolist() == ids.tolist()
+    assert retriever.metadata[int(ids[0])]["text"] == "new 0"
+    assert nearest(retriever, vecs[0]) in ids
+
+
+def test_version_changes_with_the_corpus():
+    retriever = FAISSRetriever()
+    start = retriever.version
+    retriever.add_document("a.pdf", vectors(2), metas(2))
+    after_add = retriever.version
+    retriever.remove_document("a.pdf")
+    assert start < after_add < retriever.version
+    before = retriever.version
+    assert retriever.remove_document("missing.pdf") == 0
+    assert retriever.version == before
+
+
+def test_memory_mapped_load_copies_the_index_before_writing(tmp_path):
+    vecs = vectors(20)
+    retriever = FAISSRetriever()
+    retriever.add_document("a.pdf", vecs[:10], metas(10))
+    retriever.save(str(tmp_path))
+    saved = os.path.getmtime(os.path.join(tmp_path, INDEX_FILE))
+
+    loaded = FAISSRetriever.load(str(tmp_path), mmap=True)
+    assert loaded._mmapped
+    loaded.add_document("b.pdf", vecs[10:], metas(10))
+    assert not loaded._mmapped
+    assert os.path.getmtime(os.path.join(tmp_path, INDEX_FILE)) == saved
+    assert len(FAISSRetriever.load(str(tmp_path))) == 10
+
+    loaded.save()
+    assert len(FAISSRetriever.load(str(tmp_path), mmap=False)) == 20
+
+
+def test_open_starts_empty_without_a_saved_index(tmp_path):
+    retriever = FAISSRetriever.open(str(tmp_path / "index"), kind="flat")
+    assert len(retriever) == 0
+    assert retriever.search(vectors(1)[0][None, :], top_k=3) == []
+    retriever.add_document("a.pdf", vectors(3), metas(3))
+    retriever.save()
+    assert len(FAISSRetriever.open(str(tmp_path / "index"))) == 3
+
+
+def test_mismatched_metadata_is_rejected():
+    with pytest.raises(ValueError):
+        FAISSRetriever().add(vectors(3), metas(2))
+
+
+def test_hnsw_removals_are_hidden_without_rebuilding(tmp_path):
+    vecs = vectors(400)
+    retriever = FAISSRetriever(kind="hnsw")
+    for d in range(4):
+        retriever.add_document(f"d{d}", vecs[d * 100:(d + 1) * 100], metas(100))
+    index = retriever.index
+    retriever.add_document("d0", vecs[:50], metas(50))
+    assert retriever.index is index
+    assert len(retriever) == 350
+
+    ids, _ = retriever.search_batch(vecs[:100], top_k=5)
+    assert not np.isin(ids, np.arange(100)).any()
+    retriever.save(str(tmp_path))
+    assert len(FAISSRetriever.load(str(tmp_path))._deleted) == 100
+
+    retriever.remove_document("d1")
+    assert retriever.index is not index
+    assert len(retriever._deleted) == 0
+    assert retriever.index.ntotal == len(retriever) == 250
+
+
+def test_lossy_kinds_rebuild_from_the_original_vectors(tmp_path):
+    vecs = vectors(300)
+    retriever = FAISSRetriever(kind="sq8")
+    retriever.add_document("a.pdf", vecs, metas(300))
+    retriever.save(str(tmp_path))
+
+    loaded = FAISSRetriever.load(str(tmp_path))
+    np.testing.assert_array_equal(loaded.original_vectors([0, 299]), vecs[[0, 299]])
+    loaded.rebuild("flat")
+    assert not loaded.metadata.has_vectors
+    np.testing.assert_allclose(loaded.reconstruct([7]), vecs[[7]], atol=1e-6)
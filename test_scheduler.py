@@ -0,0 +1,114 @@
+"""RateLimiter priority, Retry-After pauses and single-flight merging."""
+import threading
+import time
+
+import pytest
+
+from RAG.scheduler import BULK, INTERACTIVE, RateLimiter, RetryableError, get_limiter
+
+
+def test_interactive_calls_go_before_waiting_bulk_calls():
+    limiter = RateLimiter("test.priority", requests_per_min=120, burst=1)
+    limiter.acquire()  # use up the burst so both waiters queue
+    order = []
+
+    def wait(level):
+        limiter.acquire(priority=level)
+        order.append(level)
+
+    bulk = threading.Thread(target=wait, args=(BULK,))
+    bulk.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=wait, args=(INTERACTIVE,))
+    interactive.start()
+    bulk.join(5)
+    interactive.join(5)
+    assert order == [INTERACTIVE, BULK]
+
+
+def test_retry_after_pauses_before_retrying():
+    limiter = RateLimiter("test.retry", backoff=0.01)
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RetryableError("rate limited", status=429, retry_after=0.2)
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.2
+
+
+def test_errors_that_are_not_retryable_are_raised_at_once():
+    limiter = RateLimiter("test.fatal", backoff=0.01)
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.call(broken)
+    assert len(calls) == 1
+
+
+def test_retries_stop_after_max_retries():
+    limiter = RateLimiter("test.exhausted", max_retries=2, backoff=0.01)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RetryableError("unavailable", status=503)
+
+    with pytest.raises(RetryableError):
+        limiter.call(failing)
+    assert len(calls) == 3
+
+
+def test_calls_with_the_same_key_share_one_request():
+    limiter = RateLimiter("test.single_flight")
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def slow(value):
+        calls.append(value)
+        started.set()
+        release.wait(5)
+        return {"value": value}
+
+    def run(key):
+        results.append(limiter.call(slow, key, key=key))
+
+    owner = threading.Thread(target=run, args=("a",))
+    owner.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=run, args=("a",)) for _ in range(3)]
+    for t in waiters:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [owner] + waiters:
+        t.join(5)
+    assert calls == ["a"]
+    assert len(results) == 4 and all(r is results[0] for r in results)
+
+    assert limiter.call(slow, "b", key="b") == {"value": "b"}
+    assert calls == ["a", "b"]
+
+
+def test_limiters_are_separate_per_api_key():
+    assert get_limiter("groq", "m", "key-1") is get_limiter("groq", "m", "key-1")
+    assert get_limiter("groq", "m", "key-1") is not get_limiter("groq", "m", "key-2")
+    assert get_limiter("groq", "m", "key-1") is not get_limiter("groq", "other", "key-1")
+
+
+def test_changing_limits_does_not_refill_the_buckets():
+    limiter = RateLimiter("test.reconfigure", requests_per_min=60, burst=3)
+    for _ in range(3):
+        limiter.acquire()
+    limiter.set_limits(requests_per_min=60, burst=3)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.5
@@ -0,0 +1,59 @@
+"""Filtered, batched and scored search in FAISSRetriever."""
+import numpy as np
+import pytest
+
+from RAG.retriever import FAISSRetriever
+
+
+def corpus(n_text=300, n_image=20, dim=16, seed=0):
+    vecs = np.random.default_rng(seed).random((n_text + n_image, dim), dtype="float32")
+    metas = ([{"type": "text", "text": f"t{i}"} for i in range(n_text)]
+             + [{"type": "image", "text": f"i{i}"} for i in range(n_image)])
+    return vecs, metas
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw", "ivf_flat"])
+def test_filter_returns_top_k_of_the_requested_type(kind):
+    vecs, metas = corpus()
+    retriever = FAISSRetriever(vecs, metas, kind=kind)
+    ids, scores = retriever.search_batch(vecs[:5], top_k=10, filter_type="image")
+    assert ids.shape == (5, 10)
+    assert (ids >= 300).all()
+
+    images = vecs[300:]
+    for row, query in enumerate(vecs[:5]):
+        expected = np.argsort(((images - query) ** 2).sum(axis=1))[:10] + 300
+        assert set(ids[row].tolist()) == set(expected.tolist())
+        assert (np.diff(scores[row]) >= 0).all()
+
+
+def test_filter_pads_when_fewer_chunks_match():
+    vecs, metas = corpus(n_image=3)
+    retriever = FAISSRetriever(vecs, metas)
+    ids, _ = retriever.search_batch(vecs[:2], top_k=5, filter_type="image")
+    assert sorted(ids[0][:3].tolist()) == [300, 301, 302]
+    assert (ids[:, 3:] == -1).all()
+    assert retriever.search(vecs[:1], top_k=5, filter_type="audio") == []
+
+
+def test_batch_rows_match_single_searches():
+    vecs, metas = corpus()
+    retriever = FAISSRetriever(vecs, metas)
+    ids, scores = retriever.search_batch(vecs[10:14], top_k=4)
+    for row in range(4):
+        single, single_scores = retriever.search(vecs[10 + row][None, :], top_k=4, return_scores=True)
+        assert single == ids[row].tolist()
+        np.testing.assert_allclose(single_scores, scores[row], rtol=1e-5)
+    assert ids[:, 0].tolist() == [10, 11, 12, 13]
+    assert np.allclose(scores[:, 0], 0, atol=1e-5)
+
+
+def test_filter_follows_corpus_changes():
+    vecs, metas = corpus()
+    retriever = FAISSRetriever()
+    retriever.add_document("a", vecs[:300], metas[:300])
+    assert retriever.search(vecs[:1], top_k=3, filter_type="image") == []
+    retriever.add_document("b", vecs[300:], metas[300:])
+    assert len(retriever.search(vecs[:1], top_k=3, filter_type="image")) == 3
+    retriever.remove_document("b")
+    assert retriever.search(vecs[:1], top_k=3, filter_type="image") == []
@@ -0,0 +1,125 @@
+"""RAGService shared by many sessions, and the HTTP server and client over it."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.mock_servers import MockGroqServer
+from RAG.server import RAGClient, make_server
+from RAG.service import RAGService, get_service
+
+DOCUMENTS = {
+    f"{animal}.txt": " ".join(f"The {animal} lives in the {place} and eats {food}, sentence {i}."
+                              for i in range(30)).encode("utf-8")
+    for animal, place, food in [("otter", "river", "fish"), ("camel", "desert", "dates"),
+                                ("panda", "forest", "bamboo")]
+}
+
+
+def local_config(cache_dir, **overrides):
+    settings = dict(CACHE_DIR=str(cache_dir), EMBEDDING_PROVIDER="hashing", EMBEDDING_DIM=64,
+                    INDEX_KIND="flat", CHUNK_SIZE=20, CHUNK_OVERLAP=5, GROQ_MODEL="mock-model")
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+@pytest.fixture
+def groq_server(monkeypatch):
+    with MockGroqServer(latency=0.01, tokens_per_sec=2000, answer_tokens=6) as server:
+        monkeypatch.setenv("GROQ_BASE_URL", server.url)
+        yield server
+
+
+@pytest.fixture
+def service(tmp_path):
+    return RAGService(local_config(tmp_path))
+
+
+def test_concurrent_sessions_share_one_corpus(service, groq_server):
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(lambda item: service.ingest(item[1], item[0], None), DOCUMENTS.items()))
+        results = list(pool.map(lambda q: service.query(q, None, "key-service", "mock-model"),
+                                ["what does the otter eat", "what does the camel eat",
+                                 "what does the panda eat"] * 3))
+
+    status = service.status()
+    assert status["documents"] == sorted(DOCUMENTS)
+    assert status["requires_jina_key"] is False
+    assert status["chunks"] == status["index"]["vectors"] > 0
+    for result, food in zip(results, ["fish", "dates", "bamboo"] * 3):
+        assert food in result["context"]
+        assert result["cached"] or any(s["stage"] == "llm" for s in result["spans"])
+    # repeats are answered from the cache, or share the request in flight
+    cached = sum(r["cached"] for r in results)
+    assert cached > 0
+    assert 3 <= groq_server.stats()["requests"] <= 9 - cached
+
+
+def test_ingest_invalidates_cached_answers(service, groq_server):
+    service.ingest(DOCUMENTS["otter.txt"], "otter.txt", None)
+    assert not service.query("what does the otter eat", None, "key-invalidate", "mock-model")["cached"]
+    assert service.query("what does the otter eat", None, "key-invalidate", "mock-model")["cached"]
+    service.ingest(DOCUMENTS["camel.txt"], "camel.txt", None)
+    assert not service.query("what does the otter eat", None, "key-invalidate", "mock-model")["cached"]
+
+
+def test_stream_query_yields_context_deltas_and_done(service, groq_server):
+    service.ingest(DOCUMENTS["panda.txt"], "panda.txt", None)
+    events = list(service.stream_query("what does the panda eat", None, "key-stream-service", "mock-model"))
+    assert events[0]["event"] == "context" and "bamboo" in events[0]["context"]
+    deltas = [e["text"] for e in events if e["event"] == "delta"]
+    assert len(deltas) == 6
+    assert events[-1]["event"] == "done"
+    assert events[-1]["answer"] == "".join(deltas).strip()
+    assert events[-1]["llm"]["tokens"] == 6
+
+
+def test_the_index_persists_across_processes(tmp_path):
+    RAGService(local_config(tmp_path)).ingest(DOCUMENTS["otter.txt"], "otter.txt", None)
+    reopened = RAGService(local_config(tmp_path))
+    assert reopened.status()["documents"] == ["otter.txt"]
+    context, _ = reopened.retrieve_batch(["what does the otter eat"],
+                                         reopened.embedding_provider().embed(["what does the otter eat"]),
+                                         "mock-model")[0]
+    assert "fish" in context
+
+
+def test_get_service_is_one_instance_per_cache_dir(tmp_path):
+    first = get_service(local_config(tmp_path / "a"))
+    assert get_service(local_config(tmp_path / "a")) is first
+    assert get_service(local_config(tmp_path / "b")) is not first
+
+
+@pytest.fixture
+def client(service):
+    server = make_server(service, port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield RAGClient(f"http://127.0.0.1:{server.server_port}", timeout=30)
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_round_trip_over_http(client, groq_server):
+    result = client.ingest(DOCUMENTS["camel.txt"], "camel.txt", None)
+    assert result["chunks"] > 0 and result["errors"] == []
+
+    answer = client.query("where does the camel live", None, "key-http", "mock-model")
+    assert "desert" in answer["context"] and not answer["cached"]
+    events = list(client.stream_query("where does the camel live", None, "key-http", "mock-model"))
+    assert events[0]["event"] == "context" and events[-1]["event"] == "done"
+    assert events[-1]["cached"] and events[-1]["answer"] == answer["answer"]
+
+    assert client.status()["documents"] == ["camel.txt"]
+    assert any(row["stage"] == "llm" for row in client.metrics())
+
+
+def test_bad_requests_are_reported(client, monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="400.*'question' is required"):
+        client.query("", None, "key", "mock-model")
+    with pytest.raises(RuntimeError, match="400.*X-Groq-Key"):
+        client.query("what", None, None, "mock-model")
+    response = client.session.post(client.base_url + "/unknown", json={})
+    assert response.status_code == 404
@@ -0,0 +1,79 @@
+"""Image preparation, the description cache and describe_image."""
+import io
+import time
+
+import pytest
+from PIL import Image
+
+from benchmarks.mock_servers import MockGroqServer
+from RAG.vision import DescriptionCache, describe_image, describe_images, prepare_image
+
+
+def encode(image, fmt):
+    out = io.BytesIO()
+    image.save(out, format=fmt)
+    return out.getvalue()
+
+
+def noise(width, height, mode="RGB"):
+    return Image.effect_noise((width, height), 64).convert(mode)
+
+
+@pytest.fixture
+def groq_server(monkeypatch):
+    with MockGroqServer(latency=0.0, answer_tokens=4) as server:
+        monkeypatch.setenv("GROQ_BASE_URL", server.url)
+        yield server
+
+
+def test_small_supported_images_are_sent_unchanged():
+    data = encode(noise(100, 80), "PNG")
+    assert prepare_image(data, max_side=200) == (data, "image/png")
+
+
+def test_large_or_unsupported_images_are_downscaled_to_jpeg():
+    data, mime = prepare_image(encode(noise(800, 400), "PNG"), max_side=200)
+    assert mime == "image/jpeg"
+    assert Image.open(io.BytesIO(data)).size == (200, 100)
+
+    data, mime = prepare_image(encode(noise(50, 50, "RGBA"), "GIF"), max_side=200)
+    assert mime == "image/jpeg"
+    assert Image.open(io.BytesIO(data)).mode == "RGB"
+
+
+def test_quality_is_lowered_to_fit_max_bytes():
+    image = encode(noise(600, 600), "PNG")
+    default, _ = prepare_image(image, max_side=600, max_bytes=10_000_000)
+    smaller, mime = prepare_image(image, max_side=600, max_bytes=150_000)
+    assert mime == "image/jpeg"
+    assert len(smaller) <= 150_000 < len(default)
+    # the lowest quality is returned even when it still does not fit
+    assert len(prepare_image(image, max_side=600, max_bytes=1000)[0]) < len(smaller)
+
+
+def test_description_cache_round_trip(tmp_path):
+    cache = DescriptionCache(str(tmp_path))
+    key = DescriptionCache.key(b"image", "model-a")
+    assert key != DescriptionCache.key(b"image", "model-b")
+    assert cache.get(key) is None
+    cache.put(key, "a red square")
+    assert DescriptionCache(str(tmp_path)).get(key) == "a red square"
+
+
+def test_cached_images_are_not_sent_again(groq_server, tmp_path):
+    cache = DescriptionCache(str(tmp_path))
+    image = encode(noise(40, 40), "PNG")
+    first = describe_image(image, "key-vision", cache=cache)
+    assert first
+    assert describe_image(image, "key-vision", cache=cache) == first
+    assert groq_server.stats()["requests"] == 1
+
+
+def test_describe_images_keeps_input_order(monkeypatch):
+    def describe(image, api_key, cache=None, **kwargs):
+        time.sleep(0.01 * (3 - len(image)))
+        return f"image of {len(image)} bytes"
+
+    monkeypatch.setattr("RAG.vision.describe_image", describe)
+    descriptions = describe_images([b"x", b"xy", b"xyz"], "key", max_workers=3)
+    assert descriptions == ["image of 1 bytes", "image of 2 bytes", "image of 3 bytes"]